@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark for action parsing over synthetic model responses.
+
+Compares src.actions.extract_action with the per-call regex extraction that
+OllamaProvider used before, and checks that both agree on every response.
+"""
+
+import argparse
+import random
+import re
+import time
+
+from src.actions import actions_match, classify_error, extract_action
+
+ELEMENTS = ["Apps", "Search", "Battery", "Camera", "Send", "Text Input", "Wi-Fi", "Display", "New Message"]
+TEXTS = ["Hello John!", "weather today", "7:00 AM", "alice@example.com", ""]
+
+def legacy_extract_action(response_text):
+    """Action extraction as previously done in OllamaProvider._extract_action."""
+    click_pattern = r'CLICK\s*\(\s*"([^"]+)"\s*\)'
+    type_pattern = r'TYPE\s*\(\s*"([^"]+)"\s*,\s*"([^"]*)"\s*\)'
+
+    click_match = re.search(click_pattern, response_text, re.IGNORECASE)
+    if click_match:
+        return f'CLICK("{click_match.group(1)}")'
+    type_match = re.search(type_pattern, response_text, re.IGNORECASE)
+    if type_match:
+        return f'TYPE("{type_match.group(1)}", "{type_match.group(2)}")'
+    quoted_match = re.search(r'"([^"]+)"', response_text)
+    if quoted_match:
+        return f'CLICK("{quoted_match.group(1)}")'
+    return "CLICK(\"Unknown\")"
+
+def synthetic_responses(count, seed=0):
+    """Generate a mix of clean, chatty, lower-case and malformed responses."""
+    rng = random.Random(seed)
+    responses = []
+    for _ in range(count):
+        element = rng.choice(ELEMENTS)
+        text = rng.choice(TEXTS)
+        shape = rng.random()
+        if shape < 0.45:
+            responses.append(f'CLICK("{element}")')
+        elif shape < 0.65:
+            responses.append(f'TYPE("{element}", "{text}")')
+        elif shape < 0.8:
+            responses.append(f'Sure! The next action is: click( "{element}" ) to continue.')
+        elif shape < 0.9:
+            responses.append(f'I would tap "{element}" here.')
+        else:
+            responses.append("I am not sure what to do next.")
+    return responses
+
+def time_it(label, func, responses):
+    start = time.perf_counter()
+    outputs = [func(r) for r in responses]
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:>7.2f} s  {elapsed / len(responses) * 1e9:>7.0f} ns/response")
+    return outputs
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark action parsing on synthetic responses.")
+    parser.add_argument("--responses", type=int, default=1_000_000, help="Number of synthetic responses (default: 1000000)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic corpus (default: 0)")
+    args = parser.parse_args()
+
+    responses = synthetic_responses(args.responses, args.seed)
+    ground_truths = [f'CLICK("{ELEMENTS[i % len(ELEMENTS)]}")' for i in range(len(responses))]
+    print(f"Parsing {len(responses):,} synthetic responses ({len(set(responses)):,} distinct)")
+
+    legacy = time_it("legacy per-call regex", legacy_extract_action, responses)
+    uncached = extract_action.__wrapped__
+    time_it("extract_action (no memo)", lambda r: uncached(r).format(), responses)
+    parsed = time_it("extract_action", lambda r: extract_action(r).format(), responses)
+    mismatches = sum(1 for a, b in zip(legacy, parsed) if a != b)
+    print(f"Mismatches vs. legacy extraction: {mismatches}")
+
+    start = time.perf_counter()
+    for predicted, ground_truth in zip(parsed, ground_truths):
+        if not actions_match(predicted, ground_truth):
+            classify_error(predicted, ground_truth)
+    elapsed = time.perf_counter() - start
+    print(f"{'score + classify':<28} {elapsed:>7.2f} s  {elapsed / len(responses) * 1e9:>7.0f} ns/response")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the src package and the entry points.
+
+Imports each module in a fresh interpreter with `python -X importtime`, reports
+its cumulative import time, and checks that no heavy dependency (vendor SDKs,
+pandas, plotting libraries) was loaded on the way. Exits non-zero if a module
+is over the budget or pulls in a heavy dependency, so it can run in CI.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+MODULES = ["src.agent", "src.evaluation", "src.parallel", "run_evaluation", "test_enhanced_agent"]
+# Modules that should only be imported when a provider, a DataFrame or a plot is actually needed
+HEAVY_MODULES = ["openai", "anthropic", "ollama", "httpx", "pandas", "matplotlib", "seaborn"]
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def import_time_ms(module):
+    """Cumulative import time of `module` in a fresh interpreter, in milliseconds."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    for line in reversed(result.stderr.splitlines()):
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"No import time reported for {module}")
+
+def heavy_imports(module):
+    """Heavy modules present in sys.modules after importing `module`."""
+    code = (f"import json, sys; import {module}; "
+            f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import times and check for eagerly loaded heavy dependencies.")
+    parser.add_argument("modules", nargs="*", default=MODULES, help=f"Modules to import (default: {' '.join(MODULES)})")
+    parser.add_argument("--budget-ms", type=float, default=300.0,
+                        help="Maximum cumulative import time per module, in milliseconds (default: 300)")
+    parser.add_argument("--repeat", type=int, default=3, help="Imports per module; the fastest counts (default: 3)")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':<22} {'ms':>8}  heavy imports")
+    for module in args.modules:
+        elapsed = min(import_time_ms(module) for _ in range(args.repeat))
+        heavy = heavy_imports(module)
+        over_budget = elapsed > args.budget_ms
+        failed = failed or over_budget or bool(heavy)
+        status = "❌" if over_budget or heavy else "✅"
+        print(f"{module:<22} {elapsed:>8.1f}  {', '.join(heavy) or '-'} {status}")
+
+    if failed:
+        print(f"\n❌ Import budget of {args.budget_ms:.0f} ms exceeded or heavy dependencies imported eagerly")
+        sys.exit(1)
+    print(f"\n✅ All modules import within {args.budget_ms:.0f} ms without heavy dependencies")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark for the evaluation pipeline.
+
+Runs synthetic episodes through AndroidWorldAgent.run_episode with a
+deterministic fake model, then computes metrics, writes the report and draws
+the visualizations, at several scales (1k, 100k and 1M steps by default).
+Each scale runs in a fresh process and reports steps/sec, time per stage
+(render, provider, parse, score, collect, metrics, report, visualization) and
+peak memory. Results are written as JSON so runs can be compared across
+commits with --compare.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from datetime import datetime
+from multiprocessing import get_context
+
+# Plots are only written to files
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from src.actions import extract_action
+from src.agent import AndroidWorldAgent, Episode, LLMProvider
+from src.evaluation import EvaluationAnalyzer
+from src.offline import heuristic_action
+from src.synthetic import SyntheticConfig, synthetic_episodes
+
+STAGES = ["episodes", "render", "provider", "parse", "score", "collect", "metrics", "metrics_recompute",
+          "report", "visualization"]
+
+class StageTimer:
+    """Accumulates wall time per stage and the peak RSS seen after each stage."""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.peak_rss_mb = {}
+
+    def add(self, stage, elapsed):
+        self.seconds[stage] += elapsed
+
+    def wrap(self, stage, func):
+        perf_counter = time.perf_counter
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.seconds[stage] += perf_counter() - start
+        return timed
+
+    def checkpoint(self, stage):
+        self.peak_rss_mb[stage] = peak_rss_mb()
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+class FakeModelProvider(LLMProvider):
+    """Deterministic stand-in for a model: heuristic answers, phrased like a chatty model every third call.
+
+    The raw response is parsed back with extract_action as the real providers
+    do, so the parse stage is measured on realistic text.
+    """
+
+    def __init__(self, timer):
+        self.model = "fake"
+        self.timer = timer
+        self.calls = 0
+
+    def generate_action(self, goal, observation, prompt_template):
+        perf_counter = time.perf_counter
+        start = perf_counter()
+        response = heuristic_action(goal, tuple(observation.get("ui_elements", [])))
+        self.calls += 1
+        if self.calls % 3 == 0:
+            response = f"Sure! The next action is: {response}"
+        parsed = perf_counter()
+        action = extract_action(response).format()
+        end = perf_counter()
+        self.timer.add("provider", parsed - start)
+        self.timer.add("parse", end - parsed)
+        return action
+
+def run_scale(steps, config, seed, keep_results, visualizations):
+    """Benchmark one scale in this process; returns the result record."""
+    timer = StageTimer()
+    start = time.perf_counter()
+    episodes = [Episode(**e) for e in synthetic_episodes(config=config, seed=seed, total_steps=steps)]
+    timer.add("episodes", time.perf_counter() - start)
+    timer.checkpoint("episodes")
+    total_steps = sum(len(e.observations) for e in episodes)
+
+    agent = AndroidWorldAgent(FakeModelProvider(timer), prompt_template="enhanced")
+    # Instance attributes shadow the methods that step() calls through self
+    agent._render = timer.wrap("render", agent._render)
+    agent._record_step = timer.wrap("score", agent._record_step)
+    analyzer = EvaluationAnalyzer(keep_results=keep_results)
+    add_result = timer.wrap("collect", analyzer.add_episode_result)
+
+    run_start = time.perf_counter()
+    for episode in episodes:
+        add_result(agent.run_episode(episode))
+    run_seconds = time.perf_counter() - run_start - timer.seconds["collect"]
+    for stage in ("render", "provider", "parse", "score", "collect"):
+        timer.checkpoint(stage)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        metrics = timer.wrap("metrics", analyzer.calculate_metrics)()
+        timer.checkpoint("metrics")
+        if keep_results:
+            timer.wrap("metrics_recompute", analyzer.calculate_metrics)(recompute=True)
+            timer.checkpoint("metrics_recompute")
+        timer.wrap("report", analyzer.generate_report)(os.path.join(output_dir, "report.md"))
+        timer.checkpoint("report")
+        if visualizations:
+            timer.wrap("visualization", analyzer.create_visualizations)(output_dir)
+            timer.checkpoint("visualization")
+
+    return {
+        "steps": total_steps,
+        "episodes": len(episodes),
+        "run_episode_seconds": run_seconds,
+        "steps_per_second": total_steps / run_seconds if run_seconds > 0 else None,
+        "total_seconds": time.perf_counter() - start,
+        "stage_seconds": {stage: timer.seconds[stage] for stage in STAGES if stage in timer.seconds},
+        "peak_rss_mb": timer.peak_rss_mb,
+        "step_accuracy": metrics.step_accuracy
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_result(result):
+    stages = result["stage_seconds"]
+    print(f"\n{result['steps']:,} steps ({result['episodes']:,} episodes): "
+          f"{result['steps_per_second']:,.0f} steps/s in run_episode, "
+          f"peak RSS {max(result['peak_rss_mb'].values()):,.0f} MB")
+    for stage, seconds in stages.items():
+        per_step = seconds / result["steps"] * 1e6
+        print(f"  {stage:<18} {seconds:>9.3f} s  {per_step:>9.2f} us/step  {result['peak_rss_mb'][stage]:>8,.0f} MB")
+
+def print_comparison(baseline, current):
+    """Print the speed of each scale and stage relative to a previous benchmark file."""
+    print(f"\nSpeedup over {baseline.get('commit') or 'baseline'} ({baseline.get('timestamp')}), >1 is faster:")
+    previous = {r["steps"]: r for r in baseline["results"]}
+    for result in current["results"]:
+        old = previous.get(result["steps"])
+        if old is None:
+            continue
+        print(f"  {result['steps']:>10,} steps: {result['steps_per_second'] / old['steps_per_second']:.2f}x steps/s")
+        for stage, seconds in result["stage_seconds"].items():
+            if old["stage_seconds"].get(stage) and seconds > 0:
+                print(f"    {stage:<18} {old['stage_seconds'][stage] / seconds:>6.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the evaluation pipeline end to end on synthetic episodes.")
+    parser.add_argument("--steps", type=int, nargs="+", default=[1_000, 100_000, 1_000_000],
+                        help="Step counts to measure (default: 1000 100000 1000000)")
+    parser.add_argument("--steps-median", type=float, default=8.0, help="Median synthetic episode length (default: 8)")
+    parser.add_argument("--ui-elements-median", type=float, default=12.0,
+                        help="Median UI elements per synthetic screen (default: 12)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic episodes (default: 0)")
+    parser.add_argument("--no-keep-results", action="store_true",
+                        help="Keep only running metrics, as long runs do (skips the recomputed metrics)")
+    parser.add_argument("--no-visualizations", action="store_true", help="Skip create_visualizations")
+    parser.add_argument("--output", default="benchmark_pipeline.json",
+                        help="JSON file to write the results to (default: benchmark_pipeline.json)")
+    parser.add_argument("--compare", default=None, help="Previous JSON results to compare against")
+    args = parser.parse_args()
+
+    config = SyntheticConfig(steps_median=args.steps_median, ui_elements_median=args.ui_elements_median)
+    report = {
+        "benchmark": "pipeline",
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"synthetic": asdict(config), "seed": args.seed,
+                   "keep_results": not args.no_keep_results, "visualizations": not args.no_visualizations},
+        "results": []
+    }
+    for steps in args.steps:
+        # A fresh process per scale, so peak memory is not carried over from the previous one
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            result = executor.submit(run_scale, steps, config, args.seed,
+                                     not args.no_keep_results, not args.no_visualizations).result()
+        report["results"].append(result)
+        print_result(result)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for per-step prompt rendering cost.
+
+Compares the compiled templates in src.prompts against the previous approach of
+rebuilding the few-shot block and re-formatting the whole template every step.
+"""
+
+import argparse
+import timeit
+
+from src.prompts import (
+    COT_PROMPT_TEMPLATE, DEFAULT_PROMPT_TEMPLATE, ENHANCED_PROMPT_TEMPLATE,
+    format_few_shot_examples, get_compiled_template
+)
+
+GOAL = "Uninstall the Slack app"
+OBSERVATION = {"app": "Settings", "ui_elements": ["Apps", "Search", "Battery", "Display", "Sound"]}
+
+def render_uncompiled(goal, observation, template):
+    """Per-step rendering as done before templates were compiled."""
+    values = {
+        "goal": goal,
+        "app": observation.get("app", "Unknown"),
+        "ui_elements": observation.get("ui_elements", [])
+    }
+    if template == "enhanced":
+        return ENHANCED_PROMPT_TEMPLATE.format(examples=format_few_shot_examples(), **values)
+    elif template == "cot":
+        return COT_PROMPT_TEMPLATE.format(**values)
+    return DEFAULT_PROMPT_TEMPLATE.format(**values)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-step prompt rendering.")
+    parser.add_argument("--steps", type=int, default=200_000, help="Renders per measurement (default: 200000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements per variant; the best is reported (default: 5)")
+    args = parser.parse_args()
+
+    print(f"Per-step render cost over {args.steps:,} steps (best of {args.repeat})")
+    print(f"{'template':<10} {'uncompiled':>14} {'compiled':>14} {'speedup':>9}")
+    for name in ("enhanced", "cot", "simple"):
+        compiled = get_compiled_template(name)
+        assert compiled.render(GOAL, OBSERVATION) == render_uncompiled(GOAL, OBSERVATION, name)
+
+        uncompiled_s = min(timeit.repeat(
+            lambda: render_uncompiled(GOAL, OBSERVATION, name), number=args.steps, repeat=args.repeat
+        ))
+        compiled_s = min(timeit.repeat(
+            lambda: compiled.render(GOAL, OBSERVATION), number=args.steps, repeat=args.repeat
+        ))
+        uncompiled_us = uncompiled_s / args.steps * 1e6
+        compiled_us = compiled_s / args.steps * 1e6
+        print(f"{name:<10} {uncompiled_us:>11.2f} us {compiled_us:>11.2f} us {uncompiled_us / compiled_us:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
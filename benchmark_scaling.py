@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for the multi-process evaluation runner.
+
+Runs the same synthetic episodes with 1..N worker processes using the offline
+HeuristicProvider, so the measurement covers only the Python-side pipeline
+(prompt rendering, parsing, scoring, reflection bookkeeping and metrics).
+"""
+
+import argparse
+import os
+import time
+
+from src.offline import HeuristicProvider
+from src.parallel import AgentSpec, ProcessEpisodeRunner
+from src.synthetic import SyntheticConfig, synthetic_episodes
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure multi-process evaluation throughput from 1 to N processes.")
+    parser.add_argument("--episodes", type=int, default=2000, help="Number of synthetic episodes (default: 2000)")
+    parser.add_argument("--steps", type=int, default=8, help="Steps per episode (default: 8)")
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count() or 1,
+                        help="Largest process count to measure (default: CPU count)")
+    parser.add_argument("--threads", type=int, default=1, help="Runner threads per process (default: 1)")
+    parser.add_argument("--reflection", action="store_true", help="Enable self-reflection (doubles provider calls)")
+    args = parser.parse_args()
+
+    # Fixed-length episodes, so every process count runs exactly the same steps
+    episodes = list(synthetic_episodes(args.episodes, SyntheticConfig(steps_median=args.steps, steps_sigma=0,
+                                                                      steps_max=args.steps)))
+    spec = AgentSpec(HeuristicProvider, enable_reflection=args.reflection)
+    total_steps = args.episodes * args.steps
+    print(f"{args.episodes:,} episodes x {args.steps} steps on up to {args.max_processes} process(es)")
+    print(f"{'processes':>9} {'seconds':>9} {'steps/s':>11} {'speedup':>8} {'efficiency':>10}")
+
+    baseline = None
+    for processes in range(1, args.max_processes + 1):
+        runner = ProcessEpisodeRunner(spec, processes=processes, threads_per_process=args.threads, keep_results=False)
+        start = time.perf_counter()
+        metrics = runner.run(episodes=episodes).calculate_metrics()
+        elapsed = time.perf_counter() - start
+        assert metrics.total_steps == total_steps
+        baseline = baseline or elapsed
+        speedup = baseline / elapsed
+        print(f"{processes:>9} {elapsed:>9.2f} {total_steps / elapsed:>11,.0f} {speedup:>7.2f}x {speedup / processes:>9.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ Debug script to test Ollama response parsing and accuracy calculation.
 
 from src.agent import OllamaProvider, AndroidWorldAgent
 from src.prompts import render_prompt
+from src.actions import actions_match
 
 def test_single_prediction():
     """Test a single prediction to debug accuracy issues."""
@@ -40,7 +41,7 @@ def test_single_prediction():
             print(f"Raw Response: {prediction}")
             
             # Check accuracy
-            is_correct = prediction.strip() == ground_truth.strip()
+            is_correct = actions_match(prediction, ground_truth)
             print(f"Correct: {is_correct}")
             print(f"Expected: {ground_truth}")
             print(f"Got: {prediction}")
@@ -48,7 +49,7 @@ def test_single_prediction():
             # Test the extraction method
             extracted = provider._extract_action(prediction)
             print(f"Extracted: {extracted}")
-            extracted_correct = extracted.strip() == ground_truth.strip()
+            extracted_correct = actions_match(extracted, ground_truth)
             print(f"Extracted Correct: {extracted_correct}")
             
     except Exception as e:
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Generate a seeded synthetic episode corpus as JSONL.
+"""
+
+import argparse
+import sys
+import time
+
+from src.synthetic import APPS, SyntheticConfig, synthetic_episodes, write_jsonl
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream synthetic episodes in the episode JSON schema to a JSONL file.")
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument("--episodes", type=int, help="Number of episodes to generate")
+    size.add_argument("--steps", type=int, help="Total number of steps to generate")
+    parser.add_argument("-o", "--output", default="-", help="JSONL file to write, or - for stdout (default: -)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument("--apps", nargs="+", default=APPS, help="App names to draw from (default: 20 common apps)")
+    parser.add_argument("--app-weights", type=float, nargs="+", default=None,
+                        help="Relative frequency of each app in --apps (default: uniform)")
+    parser.add_argument("--app-switch-rate", type=float, default=0.3,
+                        help="Probability that a step moves to another app (default: 0.3)")
+    parser.add_argument("--steps-median", type=float, default=8.0, help="Median episode length (default: 8)")
+    parser.add_argument("--steps-sigma", type=float, default=0.5,
+                        help="Log-normal sigma of episode lengths; 0 for fixed lengths (default: 0.5)")
+    parser.add_argument("--steps-max", type=int, default=50, help="Longest episode (default: 50)")
+    parser.add_argument("--ui-elements-median", type=float, default=12.0,
+                        help="Median UI elements per screen (default: 12)")
+    parser.add_argument("--ui-elements-sigma", type=float, default=0.8,
+                        help="Log-normal sigma of UI element counts (default: 0.8)")
+    parser.add_argument("--ui-elements-max", type=int, default=400, help="Most UI elements on a screen (default: 400)")
+    parser.add_argument("--type-ratio", type=float, default=0.2,
+                        help="Fraction of TYPE ground-truth actions; the rest are CLICK (default: 0.2)")
+    parser.add_argument("--tasks", type=int, default=116, help="Number of distinct task names (default: 116)")
+    args = parser.parse_args()
+
+    config = SyntheticConfig(
+        apps=args.apps, app_weights=args.app_weights, app_switch_rate=args.app_switch_rate,
+        steps_median=args.steps_median, steps_sigma=args.steps_sigma, steps_max=args.steps_max,
+        ui_elements_median=args.ui_elements_median, ui_elements_sigma=args.ui_elements_sigma,
+        ui_elements_max=args.ui_elements_max, type_ratio=args.type_ratio, task_count=args.tasks
+    )
+    episodes = synthetic_episodes(args.episodes, config, seed=args.seed, total_steps=args.steps)
+
+    start = time.perf_counter()
+    if args.output == "-":
+        episode_count, step_count = write_jsonl(sys.stdout, episodes)
+    else:
+        with open(args.output, "w", encoding="utf-8", buffering=1 << 20) as f:
+            episode_count, step_count = write_jsonl(f, episodes)
+    elapsed = time.perf_counter() - start
+    # Progress goes to stderr so stdout can be piped
+    print(f"✅ Generated {episode_count:,} episodes ({step_count:,} steps) in {elapsed:.1f}s "
+          f"({step_count / max(elapsed, 1e-9) * 60 / 1e6:.1f}M steps/min)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,9 @@ from PIL import Image as PILImage
 from reportlab.lib.enums import TA_CENTER
 from dataclasses import asdict
 
+from src.agent import AgentStep
+from src.sink import read_log
+
 def find_latest_results_dir():
     base = "results"
     if not os.path.exists(base):
@@ -32,6 +35,31 @@ def get_next_test_number(c_reports_dir):
     nums = [int(os.path.basename(f).split("_")[-1].split(".")[0]) for f in pdfs if f.split("_")[-1].split(".")[0].isdigit()]
     return max(nums, default=0) + 1
 
+def find_result_logs(results_dir):
+    """Result logs of a run: the "Data:" path of its execution log, else data/results*.jsonl."""
+    log_path = os.path.join(results_dir, "logs", "execution_log.txt")
+    if os.path.exists(log_path):
+        with open(log_path) as f:
+            for line in f:
+                if line.startswith("Data: "):
+                    # A glob when the run was split across worker processes
+                    paths = sorted(glob.glob(line[len("Data: "):].strip()))
+                    if paths:
+                        return paths
+    return sorted(glob.glob(os.path.join(results_dir, "data", "results*.jsonl")))
+
+def iter_episode_results(results_dir):
+    """Stream a run's episode results from its result logs, or from metrics.json for older runs."""
+    logs = find_result_logs(results_dir)
+    if logs:
+        for path in logs:
+            for _, result in read_log(path):
+                yield result
+        return
+    with open(os.path.join(results_dir, "data", "metrics.json")) as f:
+        episodes = json.load(f)
+    yield from episodes if isinstance(episodes, list) else [episodes]
+
 def add_plain_summary(story, metrics, styles):
     summary_lines = [
         f"Total Episodes: {metrics.get('total_episodes', 0)}",
@@ -61,14 +89,9 @@ def add_visualizations(story, viz_dir, styles):
         story.append(Image(img_path, width=5.5*inch, height=3.5*inch))
         story.append(Spacer(1, 0.2*inch))
 
-def add_plain_episode_details(story, results_path, styles):
-    import json
+def add_plain_episode_details(story, episodes, styles):
     from reportlab.platypus import Table, TableStyle, KeepTogether
     from reportlab.lib import colors
-    with open(results_path) as f:
-        episodes = json.load(f)
-    if not isinstance(episodes, list):
-        episodes = [episodes]
     for ep in episodes:
         # Build the episode log as a list of Paragraphs
         ep_story = []
@@ -88,8 +111,18 @@ def add_plain_episode_details(story, results_path, styles):
                 pred = pred_match.group(1) if pred_match else ''
                 gt = gt_match.group(1) if gt_match else ''
                 is_corr = corr_match.group(1) == 'True' if corr_match else False
+            elif isinstance(step, AgentStep):
+                # Results read from a result log
+                obs = step.observation
+                pred = step.predicted_action
+                gt = step.ground_truth_action
+                is_corr = step.is_correct
             else:
-                obs = step.get('observation', {})
+                # Structured results reference the episode's observation table by index
+                if 'observation_id' in step:
+                    obs = ep.get('observations', [])[step['observation_id']]
+                else:
+                    obs = step.get('observation', {})
                 pred = step.get('predicted_action', '')
                 gt = step.get('ground_truth_action', '')
                 is_corr = step.get('is_correct', False)
@@ -157,7 +190,7 @@ def main():
     add_visualizations(story, viz_dir, styles)
 
     # Per-episode details (plain, boxed)
-    add_plain_episode_details(story, metrics_path, styles)
+    add_plain_episode_details(story, iter_episode_results(results_dir), styles)
 
     # Add full markdown report as appendix
     story.append(PageBreak())
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Pack JSON and JSONL episode files into a memory-mapped episode dataset.
+"""
+
+import argparse
+import time
+
+from src.datasets import EpisodeStore, pack_episodes
+from src.sources import iter_episodes
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack episodes into an indexed, memory-mapped dataset file.")
+    parser.add_argument("inputs", nargs="+",
+                        help="Episode JSON, JSONL or packed files, or directories of them (e.g. generate_episodes.py output)")
+    parser.add_argument("-o", "--output", required=True, help="Path of the packed dataset to write")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = pack_episodes(iter_episodes(args.inputs), args.output)
+    elapsed = time.perf_counter() - start
+    print(f"📦 Packed {count} episodes into {args.output} in {elapsed:.2f}s")
+
+    with EpisodeStore(args.output) as store:
+        if len(store):
+            print(f"✅ Verified: first episode '{store[0].task_name}', last episode '{store[-1].task_name}'")
+
+if __name__ == "__main__":
+    main()
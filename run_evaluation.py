@@ -3,12 +3,82 @@
 Main script to run Android World agent evaluation with organized results.
 """
 
+import argparse
 import os
 import sys
 from datetime import datetime
 
-def main():
+from src.providers import provider_names
+from src.sources import parse_shard
+
+def shard_arg(spec):
+    """argparse type for --shard that reports parse_shard errors verbatim."""
+    try:
+        return parse_shard(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def parse_args(argv=None):
+    """Parse command-line options for the evaluation pipeline."""
+    parser = argparse.ArgumentParser(description="Run the Android World agent evaluation pipeline.")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Number of episodes kept in flight at once (default: 4)")
+    parser.add_argument("--backend", choices=["thread", "asyncio", "batch"], default="thread",
+                        help="Concurrency backend for the episode runner; \"batch\" sends micro-batches of --workers steps (default: thread)")
+    parser.add_argument("--cache", default=".cache/llm_responses.sqlite",
+                        help="Path of the on-disk LLM response cache (default: .cache/llm_responses.sqlite)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always query the model instead of reusing cached responses")
+    parser.add_argument("--prompt-layout", choices=["standard", "prefix"], default="standard",
+                        help="\"prefix\" puts static instructions first so Ollama can reuse its KV cache (default: standard)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream model output and stop generating once a complete action is parsed")
+    parser.add_argument("--results-log", default=None,
+                        help="JSONL log each finished episode is appended to (default: data/results.jsonl in the run directory)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip episodes already recorded in --results-log")
+    parser.add_argument("--episodes", nargs="+", default=None,
+                        help="Episode JSON/JSONL/packed files or directories (default: built-in test episodes)")
+    parser.add_argument("--shard", type=shard_arg, default=None,
+                        help="Run only shard i of N (0-based, e.g. 0/4) so several processes can split the episodes")
+    parser.add_argument("--task", action="append", dest="tasks", default=None,
+                        help="Only run episodes with this task_name (repeatable)")
+    parser.add_argument("--app", action="append", dest="apps", default=None,
+                        help="Only run episodes that visit this app (repeatable)")
+    parser.add_argument("--provider", choices=provider_names(), default="ollama",
+                        help="\"heuristic\" answers offline without a model, for pipeline testing (default: ollama)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Worker processes to partition episodes across; per-worker logs go next to --results-log (default: 1)")
+    parser.add_argument("--max-retries", type=int, default=3,
+                        help="Retries per provider call on throttling and transient errors (default: 3)")
+    parser.add_argument("--rpm", type=float, default=None,
+                        help="Provider requests-per-minute limit, per process (default: unlimited)")
+    parser.add_argument("--tpm", type=float, default=None,
+                        help="Provider tokens-per-minute limit, per process (default: unlimited)")
+    parser.add_argument("--ollama-host", action="append", dest="ollama_hosts", default=None,
+                        help="Ollama server URL to send requests to; repeat to load-balance over several (default: http://localhost:11434)")
+    parser.add_argument("--reflection-workers", type=int, default=2,
+                        help="Background threads generating reflections, per process (default: 2)")
+    parser.add_argument("--reflection-sample-rate", type=float, default=1.0,
+                        help="Fraction of steps to reflect on, from 0 to 1 (default: 1.0)")
+    parser.add_argument("--reflect-only-incorrect", action="store_true",
+                        help="Only reflect on incorrectly predicted steps")
+    parser.add_argument("--record-trace", default=None,
+                        help="Record every model call to this trace file (.jsonl or .jsonl.gz) for later replay")
+    parser.add_argument("--replay-trace", action="append", dest="replay_traces", default=None,
+                        help="Serve model responses from this recorded trace instead of a model (repeatable)")
+    parser.add_argument("--replay-latency", action="store_true",
+                        help="Wait the recorded latency on every replayed call")
+    args = parser.parse_args(argv)
+    if args.resume and not args.results_log:
+        parser.error("--resume requires --results-log")
+    if args.provider == "replay" and not args.replay_traces:
+        parser.error("--provider replay requires --replay-trace")
+    return args
+
+def main(argv=None):
     """Run the complete evaluation pipeline."""
+    args = parse_args(argv)
     
     print("🚀 Android World Agent - Complete Evaluation Pipeline")
     print("=" * 60)
@@ -40,13 +110,39 @@ def main():
     print("\n📊 Step 3: Running comprehensive evaluation...")
     try:
         from test_enhanced_agent import run_comprehensive_evaluation
-        analyzer = run_comprehensive_evaluation()
+        analyzer = run_comprehensive_evaluation(
+            max_workers=args.workers,
+            backend=args.backend,
+            cache_path=None if args.no_cache else args.cache,
+            prompt_layout=args.prompt_layout,
+            stream=args.stream,
+            results_log=args.results_log,
+            resume=args.resume,
+            episode_sources=args.episodes,
+            shard=args.shard,
+            task_names=args.tasks,
+            apps=args.apps,
+            provider=args.provider,
+            processes=args.processes,
+            max_retries=args.max_retries,
+            requests_per_minute=args.rpm,
+            tokens_per_minute=args.tpm,
+            ollama_hosts=args.ollama_hosts,
+            reflection_workers=args.reflection_workers,
+            reflection_sample_rate=args.reflection_sample_rate,
+            reflect_only_incorrect=args.reflect_only_incorrect,
+            record_trace=args.record_trace,
+            replay_traces=args.replay_traces,
+            replay_latency=args.replay_latency
+        )
         
         if analyzer:
             metrics = analyzer.calculate_metrics()
             print(f"\n🎯 Final Results:")
             print(f"  Total Episodes: {metrics.total_episodes}")
             print(f"  Overall Accuracy: {metrics.step_accuracy:.2%}")
+            if metrics.failed_steps:
+                print(f"  Failed Steps (not scored): {metrics.failed_steps}")
             print(f"  Episode Success Rate: {metrics.episode_success_rate:.2%}")
             print(f"  Average Steps per Episode: {metrics.average_steps_per_episode:.1f}")
             
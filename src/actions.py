@@ -0,0 +1,122 @@
+"""
+Structured parsing, comparison and error classification of agent actions.
+"""
+
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+CLICK = "CLICK"
+TYPE = "TYPE"
+
+# One alternation covers both action kinds, so a response is scanned in a single pass
+ACTION_PATTERN = re.compile(
+    r'(CLICK)\s*\(\s*"([^"]+)"\s*\)|(TYPE)\s*\(\s*"([^"]+)"\s*,\s*"([^"]*)"\s*\)',
+    re.IGNORECASE
+)
+CLICK_PATTERN = re.compile(r'CLICK\s*\(\s*"([^"]+)"\s*\)', re.IGNORECASE)
+QUOTED_PATTERN = re.compile(r'"([^"]+)"')
+
+# Error pattern labels reported by EvaluationAnalyzer
+WRONG_ELEMENT = "Wrong Element Clicked"
+WRONG_TEXT = "Wrong Text Typed"
+CLICK_INSTEAD_OF_TYPE = "Wrong Action Type (Click vs Type)"
+TYPE_INSTEAD_OF_CLICK = "Wrong Action Type (Type vs Click)"
+FORMAT_ERROR = "Format Error"
+
+class Action(NamedTuple):
+    """A parsed agent action; `text` is None for CLICK actions."""
+    kind: str
+    element: str
+    text: Optional[str] = None
+
+    def format(self) -> str:
+        """Render the action in the canonical CLICK("...") / TYPE("...", "...") form."""
+        if self.kind == TYPE:
+            return f'TYPE("{self.element}", "{self.text}")'
+        return f'CLICK("{self.element}")'
+
+    def normalized(self) -> "Action":
+        """Return a copy with surrounding whitespace stripped from element and text."""
+        return Action(self.kind, self.element.strip(), None if self.text is None else self.text.strip())
+
+UNKNOWN_ACTION = Action(CLICK, "Unknown")
+
+def action_from_match(match: "re.Match") -> Action:
+    """Build an Action from an ACTION_PATTERN match."""
+    if match.group(1):
+        return Action(CLICK, match.group(2))
+    return Action(TYPE, match.group(4), match.group(5))
+
+def find_action(text: str) -> Optional[Action]:
+    """Find a well-formed action anywhere in free-form model output.
+
+    A CLICK is preferred over a TYPE, matching the original extraction order.
+    The scan stops at the first action; only when that is a TYPE is the rest of
+    the response checked for a later CLICK.
+    """
+    match = ACTION_PATTERN.search(text)
+    if match is None:
+        return None
+    if match.group(1):
+        return Action(CLICK, match.group(2))
+    later_click = CLICK_PATTERN.search(text, match.end())
+    if later_click:
+        return Action(CLICK, later_click.group(1))
+    return Action(TYPE, match.group(4), match.group(5))
+
+@lru_cache(maxsize=65536)
+def parse_action(text: str) -> Optional[Action]:
+    """Parse text that should consist of exactly one action, or return None."""
+    match = ACTION_PATTERN.fullmatch(text.strip())
+    return action_from_match(match) if match else None
+
+@lru_cache(maxsize=65536)
+def extract_action(text: str) -> Action:
+    """Extract the most plausible action from model output, never failing.
+
+    Falls back to clicking the first quoted string, then to UNKNOWN_ACTION.
+    Models repeat the same answers constantly, so results are memoized.
+    """
+    action = find_action(text)
+    if action is not None:
+        return action
+    quoted = QUOTED_PATTERN.search(text)
+    if quoted:
+        return Action(CLICK, quoted.group(1))
+    return UNKNOWN_ACTION
+
+def actions_match(predicted: str, ground_truth: str) -> bool:
+    """Compare two action strings structurally.
+
+    Both sides must parse as a single action; the kind is case-insensitive and
+    whitespace around element and text is ignored. Anything that does not parse
+    falls back to comparing the stripped strings.
+    """
+    predicted_key = _comparison_key(predicted)
+    ground_truth_key = _comparison_key(ground_truth)
+    if predicted_key is None or ground_truth_key is None:
+        return predicted.strip() == ground_truth.strip()
+    return predicted_key == ground_truth_key
+
+@lru_cache(maxsize=65536)
+def _comparison_key(text: str) -> Optional[Action]:
+    action = parse_action(text)
+    return action.normalized() if action is not None else None
+
+def classify_error(predicted: str, ground_truth: str) -> str:
+    """Classify an incorrect prediction into one of the error pattern labels."""
+    predicted_kind = _action_kind(predicted)
+    ground_truth_kind = _action_kind(ground_truth)
+    if predicted_kind is None or ground_truth_kind is None:
+        return FORMAT_ERROR
+    if predicted_kind == ground_truth_kind:
+        return WRONG_ELEMENT if predicted_kind == CLICK else WRONG_TEXT
+    if predicted_kind == CLICK:
+        return CLICK_INSTEAD_OF_TYPE
+    return TYPE_INSTEAD_OF_CLICK
+
+@lru_cache(maxsize=65536)
+def _action_kind(text: str) -> Optional[str]:
+    action = find_action(text)
+    return action.kind if action is not None else None
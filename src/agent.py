@@ -1,24 +1,26 @@
 import os
-from typing import Dict, List, Optional, Any
+import sys
+import asyncio
+import contextvars
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Any, Union
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 import json
-from datetime import datetime
-
-# Optional: import openai and anthropic if you plan to use them
-try:
-    import openai
-except ImportError:
-    openai = None
-try:
-    from anthropic import Anthropic
-except ImportError:
-    Anthropic = None
-
-try:
-    import ollama
-except ImportError:
-    ollama = None
+
+from .actions import actions_match, extract_action
+from .lazy import lazy_import
+from .telemetry import CallTelemetry, estimate_text_tokens, measure, record_usage
+
+# Vendor SDKs are optional and slow to import, so they load when a provider first uses them
+openai = lazy_import("openai")
+anthropic = lazy_import("anthropic")
+ollama = lazy_import("ollama")
 
 @dataclass
 class Episode:
@@ -29,244 +31,1083 @@ class Episode:
     task_name: str
     params: Dict[str, Any]
 
-@dataclass
+@dataclass(slots=True)
 class AgentStep:
-    """Represents a single agent step with observation and action."""
+    """Represents a single agent step with observation and action.
+    
+    Steps are slotted and refer to the episode's observation dict instead of
+    copying it. Action strings are interned because the same few actions repeat
+    across a run.
+    """
     observation: Dict[str, Any]
     predicted_action: str
     ground_truth_action: str
     is_correct: bool
+    # Set when the provider call failed; such steps are not scored
+    error: Optional[str] = None
+    # Telemetry of the provider call (see src.telemetry); seconds, tokens and USD
+    latency: Optional[float] = None
+    queue_time: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cost: Optional[float] = None
+
+    def __post_init__(self):
+        self.predicted_action = sys.intern(self.predicted_action)
+        self.ground_truth_action = sys.intern(self.ground_truth_action)
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+def intern_observations(observations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Return copies of the observations with app names and UI element labels interned.
+    
+    The labels repeat across episodes; the caller's dicts are left untouched.
+    """
+    interned = []
+    for observation in observations:
+        copy = dict(observation)
+        app = copy.get("app")
+        if isinstance(app, str):
+            copy["app"] = sys.intern(app)
+        elements = copy.get("ui_elements")
+        if isinstance(elements, list):
+            copy["ui_elements"] = [sys.intern(e) if isinstance(e, str) else e for e in elements]
+        interned.append(copy)
+    return interned
+
+def episode_from_dict(data: Dict[str, Any]) -> Episode:
+    """Build an Episode from the JSON episode schema."""
+    return Episode(
+        goal=data["goal"],
+        observations=intern_observations(data["observations"]),
+        ground_truth_actions=[sys.intern(a) for a in data["ground_truth_actions"]],
+        task_name=data.get("task_name", "unknown"),
+        params=data.get("params", {})
+    )
+
+class ProviderError(Exception):
+    """A provider call that failed without producing an action.
+    
+    The agent records the step as failed instead of scoring a made-up action as
+    wrong. Raise it `from` the underlying exception so retry logic can inspect
+    the cause; the flags are used when there is no cause to inspect.
+    """
+    
+    def __init__(self, message: str, retryable: bool = False, throttled: bool = False,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.throttled = throttled
+        self.retry_after = retry_after
+
+@dataclass
+class ActionRequest:
+    """A single pending action request, as submitted in a provider batch."""
+    goal: str
+    observation: Dict[str, Any]
+    prompt: str
+
+# Set while generating free text such as reflections, which must not be cut down to an action
+_free_text = contextvars.ContextVar("free_text", default=False)
+
+@contextmanager
+def free_text():
+    """Within this block, providers return the whole completion.
+    
+    Streaming providers otherwise stop at the first complete action, and Ollama
+    responses are reduced to their action. Reflections are generated inside it.
+    """
+    token = _free_text.set(True)
+    try:
+        yield
+    finally:
+        _free_text.reset(token)
 
 class LLMProvider(ABC):
     """Abstract base class for LLM providers."""
+    # Action returned in place of a failed call, if the provider swallows errors
+    FALLBACK_ACTION: Optional[str] = None
+    # Requests from one batch the backend can serve at the same time
+    max_batch_concurrency: int = 1
+
     @abstractmethod
     def generate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
         pass
 
+    def describe_request(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> Dict[str, Any]:
+        """Describe the full request this provider would send, for cache keys and tracing.
+        
+        Providers override this to include the model, rendered messages and
+        sampling options so that any change to them yields a different description.
+        """
+        return {
+            "provider": type(self).__name__,
+            "model": getattr(self, "model", None),
+            "goal": goal,
+            "observation": observation,
+            "prompt": prompt_template
+        }
+
+    def generate_actions_batch(self, requests: List[ActionRequest]) -> List[Union[str, ProviderError]]:
+        """Generate actions for several requests, returning outcomes in request order.
+        
+        Chat backends have no multi-prompt endpoint, but they batch requests that
+        arrive together (Ollama's parallel slots, cloud server-side batching). Up to
+        `max_batch_concurrency` requests of the batch are therefore kept in flight
+        at once; the base provider sends them one after another.
+        
+        Every request is answered exactly once: a failed request yields its
+        ProviderError in place of the action and does not affect the others.
+        Other exceptions propagate.
+        """
+        if not requests:
+            return []
+        workers = min(self.max_batch_concurrency, len(requests))
+        if workers <= 1:
+            return [self._batch_outcome(r) for r in requests]
+        # Each request runs in a copy of the caller's context so telemetry reaches the caller's scope
+        contexts = [contextvars.copy_context() for _ in requests]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda context, r: context.run(self._batch_outcome, r), contexts, requests))
+
+    async def agenerate_actions_batch(self, requests: List[ActionRequest]) -> List[Union[str, ProviderError]]:
+        """Coroutine variant of generate_actions_batch."""
+        return list(await asyncio.gather(*(self._abatch_outcome(r) for r in requests)))
+
+    def _batch_outcome(self, request: ActionRequest) -> Union[str, ProviderError]:
+        try:
+            return self.generate_action(request.goal, request.observation, request.prompt)
+        except ProviderError as e:
+            return e
+
+    async def _abatch_outcome(self, request: ActionRequest) -> Union[str, ProviderError]:
+        try:
+            return await self.agenerate_action(request.goal, request.observation, request.prompt)
+        except ProviderError as e:
+            return e
+
+    async def agenerate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        """Coroutine variant of generate_action.
+        
+        Providers with a native async client override this. The default runs the
+        blocking call in a worker thread so every provider can be awaited.
+        """
+        return await asyncio.to_thread(self.generate_action, goal, observation, prompt_template)
+
+    def _early_stop(self) -> bool:
+        """Whether this call streams and stops at the first complete action."""
+        return getattr(self, "stream", False) and not _free_text.get()
+
+    def _record_cut_off_usage(self, messages: List[Dict[str, str]], completion: str,
+                              prompt_tokens: Optional[int] = None, cost: Optional[float] = None):
+        """Report estimated usage of a stream cancelled before the server reported its usage."""
+        if prompt_tokens is None:
+            prompt_tokens = estimate_text_tokens("".join(m["content"] for m in messages))
+        record_usage(prompt_tokens, estimate_text_tokens(completion), model=getattr(self, "model", None), cost=cost)
+
+    async def aclose(self):
+        """Close the async clients bound to the running event loop.
+        
+        Call it before the loop ends (runners do); a client left open is only
+        closed when the provider is next awaited from another loop.
+        """
+        if getattr(self, "_async_client_loop", None) is asyncio.get_running_loop():
+            client = self._async_client
+            self._async_client = self._async_client_loop = None
+            await _close_async_clients(client)
+
+    def _loop_bound_client(self, factory):
+        """Return an async client bound to the running event loop, creating it on first use.
+        
+        Async HTTP clients cannot be shared across event loops, so a new client
+        is built whenever the provider is awaited from a different loop, and the
+        previous loop's client is closed.
+        """
+        loop = asyncio.get_running_loop()
+        previous_loop = getattr(self, "_async_client_loop", None)
+        if previous_loop is not loop:
+            if previous_loop is not None:
+                _discard_async_clients(self._async_client, previous_loop, loop)
+            self._async_client = factory()
+            self._async_client_loop = loop
+        return self._async_client
+
+class ProviderWrapper(LLMProvider):
+    """Base of providers that add behaviour around another provider's calls.
+    
+    Requests are described, closed and fall back as the wrapped provider's, and
+    other attributes resolve on it. Batches go through the wrapper's own
+    generate_action unless a subclass overrides generate_actions_batch.
+    """
+
+    def __init__(self, provider: LLMProvider):
+        self.provider = provider
+
+    def __getattr__(self, name: str):
+        # Expose the wrapped provider's attributes (model, prompt_evals, check_health, ...)
+        if name == "provider":
+            raise AttributeError(name)
+        return getattr(self.provider, name)
+
+    @property
+    def FALLBACK_ACTION(self) -> Optional[str]:
+        return self.provider.FALLBACK_ACTION
+
+    @property
+    def max_batch_concurrency(self) -> int:
+        return self.provider.max_batch_concurrency
+
+    def describe_request(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> Dict[str, Any]:
+        return self.provider.describe_request(goal, observation, prompt_template)
+
+    async def aclose(self):
+        await self.provider.aclose()
+
+async def _close_async_clients(clients: Any, quiet: bool = False):
+    """Close an async SDK client, or every client of a dict of them."""
+    for client in (clients.values() if isinstance(clients, dict) else [clients]):
+        try:
+            await client.close()
+        except RuntimeError:
+            # Connections of a closed loop cannot be shut down cleanly; their sockets are freed on collection
+            if not quiet:
+                raise
+
+# Close tasks of stale clients, referenced until they finish
+_closing_tasks: set = set()
+
+def _discard_async_clients(clients: Any, client_loop: asyncio.AbstractEventLoop, loop: asyncio.AbstractEventLoop):
+    """Close clients bound to another event loop, on that loop if it still runs."""
+    if client_loop.is_running():
+        asyncio.run_coroutine_threadsafe(_close_async_clients(clients), client_loop)
+        return
+    task = loop.create_task(_close_async_clients(clients, quiet=True))
+    _closing_tasks.add(task)
+    task.add_done_callback(_closing_tasks.discard)
+
 class OpenAIProvider(LLMProvider):
     """OpenAI GPT-4 provider."""
-    def __init__(self, model: str = "gpt-4-turbo-preview", api_key: Optional[str] = None):
-        if openai is None:
+    max_batch_concurrency = 8
+    def __init__(self, model: str = "gpt-4-turbo-preview", api_key: Optional[str] = None, stream: bool = False,
+                 base_url: Optional[str] = None):
+        if not openai.available:
             raise ImportError("openai package is not installed.")
         self.model = model
-        self.client = openai.OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        # Another server speaking the same API, e.g. a mock_server.MockLLMServer
+        self.base_url = base_url
+        # Retries are left to ResilientProvider, which must see throttling to adapt its limits
+        self.client = openai.OpenAI(api_key=self.api_key, base_url=base_url, max_retries=0)
+        # Stream tokens and stop as soon as a complete action has been parsed
+        self.stream = stream
+    def _build_messages(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> List[Dict[str, str]]:
+        # The agent passes rendered prompts; formatting again would fail on the braces of reflection prompts
+        prompt = prompt_template
+        return [
+            {"role": "system", "content": "You are an Android agent that can perform actions on mobile apps."},
+            {"role": "user", "content": prompt}
+        ]
+    def _request_options(self) -> Dict[str, Any]:
+        return {"temperature": 0.1, "max_tokens": 100}
+    def describe_request(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> Dict[str, Any]:
+        description = {
+            "provider": "openai",
+            "model": self.model,
+            "messages": self._build_messages(goal, observation, prompt_template),
+            "options": self._request_options()
+        }
+        if self._early_stop():
+            # Early-stopped answers can differ from the full completion
+            description["stream"] = True
+        return description
     def generate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
-        prompt = prompt_template.format(
-            goal=goal,
-            app=observation.get("app", "Unknown"),
-            ui_elements=observation.get("ui_elements", [])
-        )
+        try:
+            return self._complete(goal, observation, prompt_template)
+        except openai.APIError as e:
+            raise ProviderError(f"Error calling OpenAI: {e}") from e
+    def _complete(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        if self._early_stop():
+            return self._generate_streaming(goal, observation, prompt_template)
         response = self.client.chat.completions.create(
             model=self.model,
-            messages=[
-                {"role": "system", "content": "You are an Android agent that can perform actions on mobile apps."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1,
-            max_tokens=100
+            messages=self._build_messages(goal, observation, prompt_template),
+            **self._request_options()
         )
+        self._record_usage(response)
         return response.choices[0].message.content.strip()
+    def _record_usage(self, response: Any):
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            record_usage(usage.prompt_tokens, usage.completion_tokens, model=self.model)
+    def _generate_streaming(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        from .streaming import StreamingActionParser
+        parser = StreamingActionParser()
+        messages = self._build_messages(goal, observation, prompt_template)
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            stream=True,
+            # The last chunk of a completed stream then carries the usage
+            stream_options={"include_usage": True},
+            **self._request_options()
+        )
+        try:
+            for chunk in stream:
+                self._record_usage(chunk)
+                if chunk.choices and parser.feed(chunk.choices[0].delta.content):
+                    # Cancelled before the usage chunk arrives
+                    self._record_cut_off_usage(messages, parser.buffer)
+                    return parser.action
+        finally:
+            # Closing the response cancels the rest of the generation
+            stream.close()
+        return parser.buffer.strip()
+    async def agenerate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        try:
+            return await self._acomplete(goal, observation, prompt_template)
+        except openai.APIError as e:
+            raise ProviderError(f"Error calling OpenAI: {e}") from e
+    async def _acomplete(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        client = self._loop_bound_client(lambda: openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0))
+        if self._early_stop():
+            return await self._agenerate_streaming(client, goal, observation, prompt_template)
+        response = await client.chat.completions.create(
+            model=self.model,
+            messages=self._build_messages(goal, observation, prompt_template),
+            **self._request_options()
+        )
+        self._record_usage(response)
+        return response.choices[0].message.content.strip()
+    async def _agenerate_streaming(self, client: Any, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        from .streaming import StreamingActionParser
+        parser = StreamingActionParser()
+        messages = self._build_messages(goal, observation, prompt_template)
+        stream = await client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            **self._request_options()
+        )
+        try:
+            async for chunk in stream:
+                self._record_usage(chunk)
+                if chunk.choices and parser.feed(chunk.choices[0].delta.content):
+                    self._record_cut_off_usage(messages, parser.buffer)
+                    return parser.action
+        finally:
+            await stream.close()
+        return parser.buffer.strip()
 
 class AnthropicProvider(LLMProvider):
     """Anthropic Claude provider."""
-    def __init__(self, model: str = "claude-3-sonnet-20240229", api_key: Optional[str] = None):
-        if Anthropic is None:
+    max_batch_concurrency = 8
+    def __init__(self, model: str = "claude-3-sonnet-20240229", api_key: Optional[str] = None, stream: bool = False,
+                 base_url: Optional[str] = None):
+        if not anthropic.available:
             raise ImportError("anthropic package is not installed.")
         self.model = model
-        self.client = Anthropic(api_key=api_key or os.getenv("ANTHROPIC_API_KEY"))
+        self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+        # Another server speaking the same API, e.g. a mock_server.MockLLMServer
+        self.base_url = base_url
+        # Retries are left to ResilientProvider, which must see throttling to adapt its limits
+        self.client = anthropic.Anthropic(api_key=self.api_key, base_url=base_url, max_retries=0)
+        # Stream tokens and stop as soon as a complete action has been parsed
+        self.stream = stream
+    def _build_messages(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> List[Dict[str, str]]:
+        # The agent passes rendered prompts; formatting again would fail on the braces of reflection prompts
+        prompt = prompt_template
+        return [{"role": "user", "content": prompt}]
+    def _request_options(self) -> Dict[str, Any]:
+        return {"max_tokens": 100}
+    def describe_request(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> Dict[str, Any]:
+        description = {
+            "provider": "anthropic",
+            "model": self.model,
+            "messages": self._build_messages(goal, observation, prompt_template),
+            "options": self._request_options()
+        }
+        if self._early_stop():
+            # Early-stopped answers can differ from the full completion
+            description["stream"] = True
+        return description
     def generate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
-        prompt = prompt_template.format(
-            goal=goal,
-            app=observation.get("app", "Unknown"),
-            ui_elements=observation.get("ui_elements", [])
-        )
+        try:
+            return self._complete(goal, observation, prompt_template)
+        except anthropic.APIError as e:
+            raise ProviderError(f"Error calling Anthropic: {e}") from e
+    def _complete(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        if self._early_stop():
+            from .streaming import StreamingActionParser
+            parser = StreamingActionParser()
+            messages = self._build_messages(goal, observation, prompt_template)
+            # Leaving the stream context closes the connection and cancels generation
+            with self.client.messages.stream(
+                model=self.model,
+                messages=messages,
+                **self._request_options()
+            ) as stream:
+                for text in stream.text_stream:
+                    if parser.feed(text):
+                        # message_start reported the prompt tokens; output tokens only come at the end
+                        self._record_cut_off_usage(messages, parser.buffer,
+                                                   prompt_tokens=stream.current_message_snapshot.usage.input_tokens)
+                        return parser.action
+                self._record_usage(stream.get_final_message())
+            return parser.buffer.strip()
         response = self.client.messages.create(
             model=self.model,
-            max_tokens=100,
-            messages=[{"role": "user", "content": prompt}]
+            messages=self._build_messages(goal, observation, prompt_template),
+            **self._request_options()
+        )
+        self._record_usage(response)
+        return response.content[0].text.strip()
+    def _record_usage(self, response: Any):
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            record_usage(usage.input_tokens, usage.output_tokens, model=self.model)
+    async def agenerate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        try:
+            return await self._acomplete(goal, observation, prompt_template)
+        except anthropic.APIError as e:
+            raise ProviderError(f"Error calling Anthropic: {e}") from e
+    async def _acomplete(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        client = self._loop_bound_client(lambda: anthropic.AsyncAnthropic(api_key=self.api_key, base_url=self.base_url, max_retries=0))
+        if self._early_stop():
+            from .streaming import StreamingActionParser
+            parser = StreamingActionParser()
+            messages = self._build_messages(goal, observation, prompt_template)
+            async with client.messages.stream(
+                model=self.model,
+                messages=messages,
+                **self._request_options()
+            ) as stream:
+                async for text in stream.text_stream:
+                    if parser.feed(text):
+                        self._record_cut_off_usage(messages, parser.buffer,
+                                                   prompt_tokens=stream.current_message_snapshot.usage.input_tokens)
+                        return parser.action
+                self._record_usage(await stream.get_final_message())
+            return parser.buffer.strip()
+        response = await client.messages.create(
+            model=self.model,
+            messages=self._build_messages(goal, observation, prompt_template),
+            **self._request_options()
         )
+        self._record_usage(response)
         return response.content[0].text.strip()
 
+class PromptEvalTracker:
+    """Per-step prompt evaluation counters reported by Ollama.
+    
+    Ollama's `prompt_eval_count` counts only the prompt tokens it had to evaluate;
+    tokens reused from the KV cache are not included. The full prompt length is
+    estimated from the highest tokens-per-character ratio seen so far (i.e. the
+    least cached call), which yields an estimate of cached tokens for each step.
+    """
+    
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+        self._tokens_per_char = 0.0
+        self._lock = threading.Lock()
+    
+    def record(self, messages: List[Dict[str, str]], response: Any) -> Optional[Dict[str, Any]]:
+        evaluated = response.get("prompt_eval_count")
+        if evaluated is None:
+            return None
+        # Local models cost nothing per token
+        record_usage(evaluated, response.get("eval_count"), cost=0.0)
+        prompt_chars = sum(len(m["content"]) for m in messages)
+        with self._lock:
+            if prompt_chars:
+                self._tokens_per_char = max(self._tokens_per_char, evaluated / prompt_chars)
+            estimated_total = max(round(self._tokens_per_char * prompt_chars), evaluated)
+            record = {
+                "prompt_chars": prompt_chars,
+                "prompt_eval_tokens": evaluated,
+                "cached_tokens": estimated_total - evaluated,
+                "prompt_eval_ms": (response.get("prompt_eval_duration") or 0) / 1e6,
+                "timestamp": time.time()
+            }
+            self.records.append(record)
+        return record
+    
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            records = list(self.records)
+        evaluated = sum(r["prompt_eval_tokens"] for r in records)
+        cached = sum(r["cached_tokens"] for r in records)
+        total = evaluated + cached
+        return {
+            "steps": len(records),
+            "prompt_eval_tokens": evaluated,
+            "cached_tokens": cached,
+            "cached_ratio": cached / total if total > 0 else 0.0,
+            "prompt_eval_ms": sum(r["prompt_eval_ms"] for r in records)
+        }
+
 class OllamaProvider(LLMProvider):
-    """Ollama local model provider."""
-    def __init__(self, model: str = "gemma3:12b-it-qat", base_url: str = "http://localhost:11434"):
-        if ollama is None:
+    """Ollama local model provider.
+    
+    Requests go through pooled, keep-alive HTTP clients bound to `base_url`, one
+    per endpoint. Pass several URLs to spread requests round-robin over multiple
+    Ollama servers; an endpoint whose connection fails is skipped for
+    `health_ttl` seconds. Nothing is contacted until the first request (or an
+    explicit `check_health`).
+    
+    Failed calls raise ProviderError; wrap the provider in
+    middleware.ResilientProvider to retry them.
+    """
+    # Matches the default OLLAMA_NUM_PARALLEL; every request shares the system prompt
+    max_batch_concurrency = 4
+
+    def __init__(self, model: str = "gemma3:12b-it-qat", base_url: Union[str, List[str]] = "http://localhost:11434",
+                 keep_alive: Optional[str] = "30m", stream: bool = False, timeout: Optional[float] = 120.0,
+                 pool_size: int = 8, health_ttl: float = 30.0):
+        if not ollama.available:
             raise ImportError("ollama package is not installed.")
         self.model = model
-        self.base_url = base_url
-        # Test connection
-        try:
-            ollama.list()
-        except Exception as e:
-            raise ConnectionError(f"Could not connect to Ollama at {base_url}. Make sure Ollama is running.")
+        self.endpoints = [base_url] if isinstance(base_url, str) else list(base_url)
+        if not self.endpoints:
+            raise ValueError("At least one Ollama base_url is required.")
+        self.base_url = self.endpoints[0]
+        # Keeping the model loaded between steps keeps its prompt KV cache warm
+        self.keep_alive = keep_alive
+        self.prompt_evals = PromptEvalTracker()
+        # Stream tokens and stop as soon as a complete action has been parsed
+        self.stream = stream
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.health_ttl = health_ttl
+        # Every endpoint serves its own parallel slots
+        self.max_batch_concurrency = OllamaProvider.max_batch_concurrency * len(self.endpoints)
+        self._clients: Dict[str, Any] = {}
+        # Endpoint -> monotonic time its last connection failure was seen
+        self._unhealthy: Dict[str, float] = {}
+        self._next_endpoint = itertools.count()
+        self._endpoint_lock = threading.Lock()
+    
+    def _client_options(self) -> Dict[str, Any]:
+        # Extra keyword arguments are passed through to the underlying httpx client
+        import httpx
+        return {
+            "timeout": self.timeout,
+            "limits": httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+        }
+    
+    def _client(self, endpoint: str) -> Any:
+        client = self._clients.get(endpoint)
+        if client is None:
+            with self._endpoint_lock:
+                client = self._clients.get(endpoint)
+                if client is None:
+                    client = self._clients[endpoint] = ollama.Client(host=endpoint, **self._client_options())
+        return client
+    
+    def _async_clients(self) -> Dict[str, Any]:
+        return self._loop_bound_client(lambda: {
+            endpoint: ollama.AsyncClient(host=endpoint, **self._client_options()) for endpoint in self.endpoints
+        })
+    
+    def _pick_endpoint(self) -> str:
+        """Next endpoint in round-robin order, skipping ones that failed within health_ttl."""
+        now = time.monotonic()
+        with self._endpoint_lock:
+            healthy = [endpoint for endpoint in self.endpoints
+                       if now - self._unhealthy.get(endpoint, -self.health_ttl) >= self.health_ttl]
+            # If every endpoint failed recently, keep rotating over all of them rather than giving up
+            candidates = healthy or self.endpoints
+            return candidates[next(self._next_endpoint) % len(candidates)]
+    
+    def _record_outcome(self, endpoint: str, error: Optional[Exception] = None):
+        with self._endpoint_lock:
+            if error is None:
+                self._unhealthy.pop(endpoint, None)
+            elif not isinstance(error, ollama.ResponseError):
+                # The server answered with an error, so only transport failures mark it down
+                self._unhealthy[endpoint] = time.monotonic()
+    
+    def check_health(self) -> Dict[str, bool]:
+        """Probe every endpoint now and return which ones are reachable."""
+        health = {}
+        for endpoint in self.endpoints:
+            try:
+                self._client(endpoint).list()
+            except Exception as e:
+                self._record_outcome(endpoint, e)
+                health[endpoint] = False
+            else:
+                self._record_outcome(endpoint)
+                health[endpoint] = True
+        return health
+    
+    def _build_messages(self, prompt: str) -> List[Dict[str, str]]:
+        return [
+            {
+                "role": "system", 
+                "content": "You are an Android agent. You must respond with EXACTLY one action in this format: CLICK(\"element_name\") or TYPE(\"element_name\", \"text\"). Do not add any explanation or extra text."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    
+    def _request_options(self) -> Dict[str, Any]:
+        return {
+            "temperature": 0.0,  # More deterministic
+            "num_predict": 30
+        }
+    
+    def describe_request(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> Dict[str, Any]:
+        description = {
+            "provider": "ollama",
+            "model": self.model,
+            "messages": self._build_messages(prompt_template),
+            "options": self._request_options()
+        }
+        if self._early_stop():
+            # Early-stopped answers can differ from the full completion
+            description["stream"] = True
+        return description
+    
+    def prompt_cache_summary(self) -> Dict[str, Any]:
+        """Totals of evaluated vs. (estimated) KV-cached prompt tokens so far."""
+        return self.prompt_evals.summary()
     
     def generate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
         # prompt_template is now already formatted, so use it directly
         prompt = prompt_template
+        endpoint = self._pick_endpoint()
+        client = self._client(endpoint)
         
         try:
-            response = ollama.chat(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are an Android agent. You must respond with EXACTLY one action in this format: CLICK(\"element_name\") or TYPE(\"element_name\", \"text\"). Do not add any explanation or extra text."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                options={
-                    "temperature": 0.0,  # More deterministic
-                    "num_predict": 30
-                }
-            )
-            response_text = response['message']['content'].strip()
-            
-            # Clean up the response to extract just the action
-            return self._extract_action(response_text)
+            # The system message is identical on every call, so the rendered chat
+            # prompt shares its prefix with the previous step
+            messages = self._build_messages(prompt)
+            if self._early_stop():
+                action = self._generate_streaming(client, messages)
+            else:
+                response = client.chat(
+                    model=self.model,
+                    messages=messages,
+                    options=self._request_options(),
+                    keep_alive=self.keep_alive
+                )
+                self.prompt_evals.record(messages, response)
+                response_text = response['message']['content'].strip()
+                
+                # Clean up the response to extract just the action
+                action = response_text if _free_text.get() else self._extract_action(response_text)
             
         except Exception as e:
-            print(f"Error calling Ollama: {e}")
-            return "CLICK(\"Unknown\")"  # Fallback response
+            self._record_outcome(endpoint, e)
+            raise ProviderError(f"Error calling Ollama at {endpoint}: {e}") from e
+        self._record_outcome(endpoint)
+        return action
+    
+    async def agenerate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        endpoint = self._pick_endpoint()
+        client = self._async_clients()[endpoint]
+        try:
+            messages = self._build_messages(prompt_template)
+            if self._early_stop():
+                action = await self._agenerate_streaming(client, messages)
+            else:
+                response = await client.chat(
+                    model=self.model,
+                    messages=messages,
+                    options=self._request_options(),
+                    keep_alive=self.keep_alive
+                )
+                self.prompt_evals.record(messages, response)
+                response_text = response['message']['content'].strip()
+                action = response_text if _free_text.get() else self._extract_action(response_text)
+        except Exception as e:
+            self._record_outcome(endpoint, e)
+            raise ProviderError(f"Error calling Ollama at {endpoint}: {e}") from e
+        self._record_outcome(endpoint)
+        return action
+    
+    def _generate_streaming(self, client: Any, messages: List[Dict[str, str]]) -> str:
+        """Consume a streamed completion and cancel it once a complete action is parsed."""
+        from .streaming import StreamingActionParser
+        parser = StreamingActionParser()
+        stream = client.chat(
+            model=self.model,
+            messages=messages,
+            options=self._request_options(),
+            keep_alive=self.keep_alive,
+            stream=True
+        )
+        try:
+            for chunk in stream:
+                # Token counts only arrive on the final chunk of a completed stream
+                if chunk.get('done'):
+                    self.prompt_evals.record(messages, chunk)
+                if parser.feed(chunk['message']['content']):
+                    # Local models cost nothing per token
+                    self._record_cut_off_usage(messages, parser.buffer, cost=0.0)
+                    return parser.action
+        finally:
+            # Closing the response makes Ollama stop generating
+            stream.close()
+        return self._extract_action(parser.buffer.strip())
+    
+    async def _agenerate_streaming(self, client: Any, messages: List[Dict[str, str]]) -> str:
+        from .streaming import StreamingActionParser
+        parser = StreamingActionParser()
+        stream = await client.chat(
+            model=self.model,
+            messages=messages,
+            options=self._request_options(),
+            keep_alive=self.keep_alive,
+            stream=True
+        )
+        try:
+            async for chunk in stream:
+                if chunk.get('done'):
+                    self.prompt_evals.record(messages, chunk)
+                if parser.feed(chunk['message']['content']):
+                    self._record_cut_off_usage(messages, parser.buffer, cost=0.0)
+                    return parser.action
+        finally:
+            await stream.aclose()
+        return self._extract_action(parser.buffer.strip())
     
     def _extract_action(self, response_text: str) -> str:
         """Extract the action from the response text."""
-        import re
-        
-        # Look for CLICK or TYPE patterns
-        click_pattern = r'CLICK\s*\(\s*"([^"]+)"\s*\)'
-        type_pattern = r'TYPE\s*\(\s*"([^"]+)"\s*,\s*"([^"]*)"\s*\)'
-        
-        # Try to find CLICK first
-        click_match = re.search(click_pattern, response_text, re.IGNORECASE)
-        if click_match:
-            element = click_match.group(1)
-            return f'CLICK("{element}")'
-        
-        # Try to find TYPE
-        type_match = re.search(type_pattern, response_text, re.IGNORECASE)
-        if type_match:
-            element = type_match.group(1)
-            text = type_match.group(2)
-            return f'TYPE("{element}", "{text}")'
-        
-        # If no pattern found, try to extract any quoted text
-        quoted_match = re.search(r'"([^"]+)"', response_text)
-        if quoted_match:
-            element = quoted_match.group(1)
-            return f'CLICK("{element}")'
-        
-        # Last resort - return first available element or unknown
-        return "CLICK(\"Unknown\")"
+        return extract_action(response_text).format()
 
 class AndroidWorldAgent:
-    """Main agent class for Android World evaluation."""
-    def __init__(self, llm_provider: LLMProvider, prompt_template: str = "enhanced", enable_reflection: bool = False):
+    """Main agent class for Android World evaluation.
+    
+    With a `reflection_pipeline` (see src.reflection), reflections are generated
+    in the background instead of inline after each step, and are collected by
+    the pipeline rather than in `reflection_history`. Passing one implies
+    `enable_reflection`.
+    """
+    def __init__(self, llm_provider: LLMProvider, prompt_template: str = "enhanced", enable_reflection: bool = False,
+                 prompt_layout: str = "standard", reflection_pipeline: Optional[Any] = None):
         self.llm_provider = llm_provider
         self.prompt_template = prompt_template
-        self.enable_reflection = enable_reflection
+        self.enable_reflection = enable_reflection or reflection_pipeline is not None
+        self.reflection_pipeline = reflection_pipeline
+        # "prefix" puts static instructions first so the server can reuse its KV cache
+        self.prompt_layout = prompt_layout
         self.step_history: List[AgentStep] = []
         self.reflection_history: List[Dict[str, Any]] = []
-    def load_episode(self, episode_data: Dict[str, Any]) -> Episode:
-        return Episode(
-            goal=episode_data["goal"],
-            observations=episode_data["observations"],
-            ground_truth_actions=episode_data["ground_truth_actions"],
-            task_name=episode_data.get("task_name", "unknown"),
-            params=episode_data.get("params", {})
+        # Tags reflections submitted to the pipeline with the running episode
+        self._episode_id: Optional[str] = None
+        # Resolve the compiled template once instead of on every step
+        from .prompts import get_compiled_template
+        self._compiled_prompt = get_compiled_template(prompt_template, prompt_layout)
+    def clone(self) -> "AndroidWorldAgent":
+        """Return a fresh agent sharing this agent's provider and settings but not its histories."""
+        return AndroidWorldAgent(
+            self.llm_provider,
+            prompt_template=self.prompt_template,
+            enable_reflection=self.enable_reflection,
+            prompt_layout=self.prompt_layout,
+            reflection_pipeline=self.reflection_pipeline
         )
+    def load_episode(self, episode_data: Dict[str, Any]) -> Episode:
+        return episode_from_dict(episode_data)
     def step(self, goal: str, observation: Dict[str, Any], ground_truth_action: str) -> AgentStep:
         # Render the prompt using the appropriate template
-        from .prompts import render_prompt
-        formatted_prompt = render_prompt(goal, observation, self.prompt_template)
+        formatted_prompt = self._render(goal, observation)
         
-        predicted_action = self.llm_provider.generate_action(
-            goal=goal,
+        with measure() as call:
+            try:
+                predicted_action = self.llm_provider.generate_action(
+                    goal=goal,
+                    observation=observation,
+                    prompt_template=formatted_prompt
+                )
+            except ProviderError as e:
+                error = e
+            else:
+                error = None
+        if error is not None:
+            return self._record_failure(observation, ground_truth_action, error, call)
+        step = self._record_step(observation, predicted_action, ground_truth_action, call)
+        
+        # Add self-reflection if enabled
+        if self.reflection_pipeline is not None:
+            self.reflection_pipeline.submit(goal, observation, step, len(self.step_history) - 1, self._episode_id)
+        elif self.enable_reflection:
+            reflection = self._generate_reflection(goal, observation, step)
+            self.reflection_history.append(reflection)
+        
+        return step
+    
+    async def astep(self, goal: str, observation: Dict[str, Any], ground_truth_action: str) -> AgentStep:
+        """Coroutine variant of step that awaits the provider instead of blocking."""
+        formatted_prompt = self._render(goal, observation)
+        
+        with measure() as call:
+            try:
+                predicted_action = await self.llm_provider.agenerate_action(
+                    goal=goal,
+                    observation=observation,
+                    prompt_template=formatted_prompt
+                )
+            except ProviderError as e:
+                error = e
+            else:
+                error = None
+        if error is not None:
+            return self._record_failure(observation, ground_truth_action, error, call)
+        step = self._record_step(observation, predicted_action, ground_truth_action, call)
+        
+        if self.reflection_pipeline is not None:
+            args = (goal, observation, step, len(self.step_history) - 1, self._episode_id)
+            # Only wait on a full queue off the event loop
+            if not self.reflection_pipeline.submit(*args, block=False):
+                await asyncio.to_thread(self.reflection_pipeline.submit, *args)
+        elif self.enable_reflection:
+            reflection = await self._agenerate_reflection(goal, observation, step)
+            self.reflection_history.append(reflection)
+        
+        return step
+    
+    def _record_step(self, observation: Dict[str, Any], predicted_action: str, ground_truth_action: str,
+                     call: Optional[CallTelemetry] = None) -> AgentStep:
+        """Score a predicted action and append the resulting step to the history."""
+        is_correct = actions_match(predicted_action, ground_truth_action)
+        step = AgentStep(
             observation=observation,
-            prompt_template=formatted_prompt
+            predicted_action=predicted_action,
+            ground_truth_action=ground_truth_action,
+            is_correct=is_correct,
+            **(call.fields() if call is not None else {})
         )
-        is_correct = predicted_action.strip() == ground_truth_action.strip()
+        self.step_history.append(step)
+        return step
+    
+    def _record_failure(self, observation: Dict[str, Any], ground_truth_action: str, error: Exception,
+                        call: Optional[CallTelemetry] = None) -> AgentStep:
+        """Append a failed, unscored step for a provider call that produced no action."""
         step = AgentStep(
             observation=observation,
-            predicted_action=predicted_action,
+            predicted_action="",
             ground_truth_action=ground_truth_action,
-            is_correct=is_correct
+            is_correct=False,
+            error=str(error),
+            **(call.fields() if call is not None else {})
         )
         self.step_history.append(step)
-        
-        # Add self-reflection if enabled
-        if self.enable_reflection:
-            reflection = self._generate_reflection(goal, observation, step)
-            self.reflection_history.append(reflection)
-        
         return step
     
     def _generate_reflection(self, goal: str, observation: Dict[str, Any], step: AgentStep) -> Dict[str, Any]:
         """Generate self-reflection on the agent's decision."""
+        reflection_prompt = self._reflection_prompt(goal, observation, step)
+        
+        with measure() as call, free_text():
+            try:
+                reflection_response = self.llm_provider.generate_action(
+                    goal=goal,
+                    observation=observation,
+                    prompt_template=reflection_prompt
+                )
+            except Exception as e:
+                reflection_response = f"Reflection generation failed: {e}"
+        
+        return self._reflection_record(reflection_response, step, len(self.step_history) - 1, call)
+    
+    async def _agenerate_reflection(self, goal: str, observation: Dict[str, Any], step: AgentStep) -> Dict[str, Any]:
+        """Coroutine variant of _generate_reflection."""
+        reflection_prompt = self._reflection_prompt(goal, observation, step)
+        
+        with measure() as call, free_text():
+            try:
+                reflection_response = await self.llm_provider.agenerate_action(
+                    goal=goal,
+                    observation=observation,
+                    prompt_template=reflection_prompt
+                )
+            except Exception as e:
+                reflection_response = f"Reflection generation failed: {e}"
+        
+        return self._reflection_record(reflection_response, step, len(self.step_history) - 1, call)
+    
+    def _reflection_prompt(self, goal: str, observation: Dict[str, Any], step: AgentStep) -> str:
         from .prompts import render_reflection_prompt
         
-        reflection_prompt = render_reflection_prompt(
+        return render_reflection_prompt(
             goal=goal,
             observation=observation,
             action_taken=step.predicted_action,
             ground_truth=step.ground_truth_action,
             was_correct=step.is_correct
         )
+    
+    def _reflection_record(self, reflection_response: str, step: AgentStep, step_index: int,
+                           call: Optional[CallTelemetry] = None) -> Dict[str, Any]:
+        from .reflection import reflection_record
+        return reflection_record(reflection_response, step, step_index, call)
+    def reflection_episode_id(self, episode: Episode) -> Optional[str]:
+        """Log key of `episode` (see src.sink), which tags and samples its reflections.
         
-        try:
-            reflection_response = self.llm_provider.generate_action(
-                goal=goal,
-                observation=observation,
-                prompt_template=reflection_prompt
-            )
-        except Exception as e:
-            reflection_response = f"Reflection generation failed: {e}"
-        
-        return {
-            'step_index': len(self.step_history) - 1,
-            'reflection': reflection_response,
-            'was_correct': step.is_correct,
-            'timestamp': datetime.now().isoformat()
-        }
+        Task names repeat across episodes, so they cannot tell reflections apart.
+        None when this agent does not reflect, to skip hashing the episode.
+        """
+        if self.reflection_pipeline is None and not self.enable_reflection:
+            return None
+        from .sink import episode_key
+        return episode_key(episode)
     def run_episode(self, episode: Episode) -> Dict[str, Any]:
         self.step_history = []
-        correct_steps = 0
-        total_steps = len(episode.observations)
+        self._episode_id = self.reflection_episode_id(episode)
+        for observation, ground_truth_action in zip(episode.observations, episode.ground_truth_actions):
+            self.step(episode.goal, observation, ground_truth_action)
+        return self._episode_result(episode)
+    async def arun_episode(self, episode: Episode) -> Dict[str, Any]:
+        """Coroutine variant of run_episode; many episodes can share one event loop."""
+        self.step_history = []
+        self._episode_id = self.reflection_episode_id(episode)
         for observation, ground_truth_action in zip(episode.observations, episode.ground_truth_actions):
-            step = self.step(episode.goal, observation, ground_truth_action)
-            if step.is_correct:
-                correct_steps += 1
+            await self.astep(episode.goal, observation, ground_truth_action)
+        return self._episode_result(episode)
+    def run_episodes_batched(self, episodes: List[Episode], batch_size: int = 8,
+                             on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """Run several episodes, sending their pending steps to the provider in micro-batches.
+        
+        Steps are collected round-robin across episodes into batches of up to
+        `batch_size` and answered by `generate_actions_batch`. Observations are
+        prerecorded and prompts do not depend on earlier predictions, so later steps
+        of an episode may share a batch with earlier ones. Each episode keeps its
+        own step history; results come back in input order and reflections are
+        appended to this agent's `reflection_history` tagged with their episode.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        workers = [self.clone() for _ in episodes]
+        episode_ids = [self.reflection_episode_id(episode) for episode in episodes]
+        remaining = [len(episode.observations) for episode in episodes]
+        cursors = [0] * len(episodes)
+        pending = deque(i for i, n in enumerate(remaining) if n > 0)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(episodes)
+        
+        for i, n in enumerate(remaining):
+            if n == 0:
+                results[i] = workers[i]._episode_result(episodes[i])
+                if on_result:
+                    on_result(i, results[i])
+        
+        while pending:
+            batch = []
+            while pending and len(batch) < batch_size:
+                i = pending.popleft()
+                batch.append((i, cursors[i]))
+                cursors[i] += 1
+                if cursors[i] < len(episodes[i].observations):
+                    pending.append(i)
+            
+            requests = []
+            for i, t in batch:
+                episode = episodes[i]
+                requests.append(ActionRequest(
+                    goal=episode.goal,
+                    observation=episode.observations[t],
+                    prompt=workers[i]._render(episode.goal, episode.observations[t])
+                ))
+            with measure() as call:
+                predictions = self.llm_provider.generate_actions_batch(requests)
+            # Per-request usage is not separable within a batch, so each step gets an equal share
+            share = call.share(len(requests))
+            
+            steps = []
+            for (i, t), predicted_action in zip(batch, predictions):
+                if isinstance(predicted_action, ProviderError):
+                    step = workers[i]._record_failure(
+                        episodes[i].observations[t], episodes[i].ground_truth_actions[t], predicted_action, share
+                    )
+                else:
+                    step = workers[i]._record_step(
+                        episodes[i].observations[t], predicted_action, episodes[i].ground_truth_actions[t], share
+                    )
+                steps.append((i, t, step))
+            
+            if self.reflection_pipeline is not None:
+                for i, t, step in steps:
+                    self.reflection_pipeline.submit(episodes[i].goal, episodes[i].observations[t], step, t,
+                                                    episode_ids[i])
+            elif self.enable_reflection:
+                self._reflect_batch(episodes, workers, [s for s in steps if not s[2].failed])
+            
+            for i, _, _ in steps:
+                remaining[i] -= 1
+                if remaining[i] == 0:
+                    results[i] = workers[i]._episode_result(episodes[i])
+                    if on_result:
+                        on_result(i, results[i])
+        
+        for episode_id, worker in zip(episode_ids, workers):
+            self.reflection_history.extend(
+                dict(r, episode_id=episode_id) for r in worker.reflection_history
+            )
+        return results
+    
+    def _reflect_batch(self, episodes: List[Episode], workers: List["AndroidWorldAgent"], steps: List[Any]):
+        """Generate reflections for a scored micro-batch as one provider batch."""
+        requests = [
+            ActionRequest(
+                goal=episodes[i].goal,
+                observation=episodes[i].observations[t],
+                prompt=self._reflection_prompt(episodes[i].goal, episodes[i].observations[t], step)
+            )
+            for i, t, step in steps
+        ]
+        with measure() as call, free_text():
+            try:
+                responses = self.llm_provider.generate_actions_batch(requests)
+            except Exception as e:
+                responses = [f"Reflection generation failed: {e}"] * len(requests)
+        share = call.share(len(requests)) if requests else call
+        for (i, t, step), response in zip(steps, responses):
+            if isinstance(response, ProviderError):
+                response = f"Reflection generation failed: {response}"
+            workers[i].reflection_history.append(self._reflection_record(response, step, t, share))
+    
+    def _render(self, goal: str, observation: Dict[str, Any]) -> str:
+        return self._compiled_prompt.render(goal, observation)
+    
+    def _episode_result(self, episode: Episode) -> Dict[str, Any]:
+        correct_steps = sum(1 for step in self.step_history if step.is_correct)
+        failed_steps = sum(1 for step in self.step_history if step.failed)
+        total_steps = len(episode.observations)
+        # Failed provider calls produced no action, so they are left out of the accuracy
+        scored_steps = total_steps - failed_steps
         return {
             "episode_id": episode.task_name,
             "goal": episode.goal,
             "total_steps": total_steps,
             "correct_steps": correct_steps,
-            "step_accuracy": correct_steps / total_steps if total_steps > 0 else 0,
+            "failed_steps": failed_steps,
+            "step_accuracy": correct_steps / scored_steps if scored_steps > 0 else 0,
             "steps": self.step_history
         }
     def get_metrics(self) -> Dict[str, float]:
         if not self.step_history:
             return {"step_accuracy": 0.0}
         correct_steps = sum(1 for step in self.step_history if step.is_correct)
+        failed_steps = sum(1 for step in self.step_history if step.failed)
         total_steps = len(self.step_history)
+        scored_steps = total_steps - failed_steps
         return {
-            "step_accuracy": correct_steps / total_steps,
+            "step_accuracy": correct_steps / scored_steps if scored_steps > 0 else 0.0,
             "total_steps": total_steps,
-            "correct_steps": correct_steps
+            "correct_steps": correct_steps,
+            "failed_steps": failed_steps
         }
 
 def load_episode_from_json(path: str) -> Episode:
     with open(path, "r") as f:
         data = json.load(f)
-    return Episode(
-        goal=data["goal"],
-        observations=data["observations"],
-        ground_truth_actions=data["ground_truth_actions"],
-        task_name=data.get("task_name", "unknown"),
-        params=data.get("params", {})
-    )
+    return episode_from_dict(data)
 
 DEFAULT_PROMPT_TEMPLATE = (
     "Goal: {goal}\n"
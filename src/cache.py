@@ -0,0 +1,228 @@
+"""
+Persistent, content-addressed response cache for LLM providers.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+from .agent import ActionRequest, LLMProvider, ProviderError, ProviderWrapper
+
+DEFAULT_CACHE_PATH = ".cache/llm_responses.sqlite"
+
+def request_key(request: Dict[str, Any]) -> str:
+    """Hash a provider request description into a stable cache key."""
+    payload = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters for a response cache."""
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+class ResponseCache:
+    """SQLite-backed store of provider responses keyed by request hash.
+
+    Entries older than `ttl_seconds` are treated as misses and removed. When the
+    store grows past `max_entries`, the least recently used entries are evicted.
+    The database runs in WAL mode so several processes can share one cache file.
+
+    Hits are read-only: access times older than `touch_interval` seconds are
+    refreshed in memory and written in bulk, on the next `set`, every
+    `touch_batch` touches and on `close`, so LRU order is exact to within that
+    interval.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: Optional[int] = 100_000,
+                 ttl_seconds: Optional[float] = None, touch_interval: float = 60.0, touch_batch: int = 256):
+        if max_entries is not None and max_entries < 1:
+            raise ValueError("max_entries must be at least 1.")
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.touch_interval = touch_interval
+        self.touch_batch = touch_batch
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        # key -> access time not yet written to the database
+        self._touched: Dict[str, float] = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        self.purge_expired()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at, accessed_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self._is_expired(row[1], now):
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._count -= 1
+                self.stats.evictions += 1
+                row = None
+            if row is None:
+                self.stats.misses += 1
+                return None
+            if now - row[2] > self.touch_interval:
+                self._touched[key] = now
+                if len(self._touched) >= self.touch_batch:
+                    self._flush_touches()
+                    self._conn.commit()
+            self.stats.hits += 1
+            return row[0]
+
+    def set(self, key: str, response: str):
+        """Store a response, evicting least recently used entries if the cache is full."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            if cursor.rowcount == 0:
+                self._conn.execute(
+                    "UPDATE responses SET response = ?, created_at = ?, accessed_at = ? WHERE key = ?",
+                    (response, now, now, key)
+                )
+            else:
+                self._count += 1
+            self._touched.pop(key, None)
+            self._flush_touches()
+            self.stats.writes += 1
+            if self.max_entries is not None and self._count > self.max_entries:
+                self._evict_lru(self._count - self.max_entries)
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """Remove all entries older than the TTL and return how many were removed."""
+        if self.ttl_seconds is None:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._conn.commit()
+            removed = max(cursor.rowcount, 0)
+            self.stats.evictions += removed
+            self._count -= removed
+            return removed
+
+    def clear(self):
+        """Remove every cached response."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._touched.clear()
+            self._count = 0
+
+    def close(self):
+        with self._lock:
+            self._flush_touches()
+            self._conn.commit()
+            self._conn.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _flush_touches(self):
+        if self._touched:
+            self._conn.executemany("UPDATE responses SET accessed_at = ? WHERE key = ?",
+                                   [(accessed_at, key) for key, accessed_at in self._touched.items()])
+            self._touched.clear()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _evict_lru(self, overflow: int):
+        # Evict a little more than needed so a full cache doesn't evict on every write
+        batch = overflow + max(1, self.max_entries // 100)
+        cursor = self._conn.execute(
+            "DELETE FROM responses WHERE key IN "
+            "(SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)", (batch,)
+        )
+        removed = max(cursor.rowcount, 0)
+        self._count -= removed
+        self.stats.evictions += removed
+
+class CachedProvider(ProviderWrapper):
+    """Wraps any LLMProvider and serves repeated requests from a ResponseCache.
+
+    Keys are derived from the wrapped provider's `describe_request`, which covers
+    the model, rendered messages and sampling options. Errors are never cached:
+    failed calls raise before anything is stored, and responses equal to the
+    provider's FALLBACK_ACTION are skipped since they may stand in for a failure.
+    """
+
+    def __init__(self, provider: LLMProvider, cache: Optional[ResponseCache] = None):
+        super().__init__(provider)
+        self.cache = cache if cache is not None else ResponseCache()
+
+    @property
+    def stats(self) -> CacheStats:
+        return self.cache.stats
+
+    def generate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        key = request_key(self.describe_request(goal, observation, prompt_template))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        response = self.provider.generate_action(goal, observation, prompt_template)
+        self._store(key, response)
+        return response
+
+    async def agenerate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        key = request_key(self.describe_request(goal, observation, prompt_template))
+        # SQLite calls block, so they run off the event loop
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            return cached
+        response = await self.provider.agenerate_action(goal, observation, prompt_template)
+        await asyncio.to_thread(self._store, key, response)
+        return response
+
+    def generate_actions_batch(self, requests: List[ActionRequest]) -> List[Union[str, ProviderError]]:
+        """Serve cached requests directly and forward only the misses as one batch."""
+        keys = [request_key(self.describe_request(r.goal, r.observation, r.prompt)) for r in requests]
+        responses: List[Union[str, ProviderError, None]] = [self.cache.get(key) for key in keys]
+        misses = [i for i, response in enumerate(responses) if response is None]
+        if misses:
+            fresh = self.provider.generate_actions_batch([requests[i] for i in misses])
+            for i, response in zip(misses, fresh):
+                responses[i] = response
+                if not isinstance(response, ProviderError):
+                    self._store(keys[i], response)
+        return responses
+
+    def _store(self, key: str, response: str):
+        if response != self.provider.FALLBACK_ACTION:
+            self.cache.set(key, response)
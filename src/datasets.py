@@ -0,0 +1,158 @@
+"""
+Packed, memory-mapped episode datasets.
+
+A packed file holds many episodes with an offset index, so episode N is found
+in O(1) without reading the others:
+
+    header   MAGIC (8 bytes) | episode count (u64) | index offset (u64)
+    record   metadata length (u32) | metadata JSON | observation JSON blobs
+    index    count + 1 record offsets (u64), the last one marking the end
+
+All integers are little-endian. The metadata JSON holds `goal`,
+`ground_truth_actions`, `task_name`, `params`, the distinct `apps` of the
+episode and `observation_ends`, the end offset of each observation blob
+relative to the end of the metadata. Observations are only decoded when
+accessed.
+"""
+
+import hashlib
+import json
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Union
+
+from .agent import Episode, intern_observations
+
+MAGIC = b"AWEPACK1"
+HEADER = struct.Struct("<8sQQ")
+META_LENGTH = struct.Struct("<I")
+OFFSET = struct.Struct("<Q")
+
+class LazyObservations(Sequence):
+    """Observation list of a packed episode, decoding each entry on first access."""
+
+    def __init__(self, buffer: mmap.mmap, start: int, ends: List[int]):
+        self._buffer = buffer
+        self._start = start
+        self._ends = ends
+        self._decoded: Dict[int, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    def digest(self) -> str:
+        """SHA-256 of the raw observation blobs, computed without decoding them."""
+        end = self._ends[-1] if self._ends else 0
+        return hashlib.sha256(self._buffer[self._start:self._start + end]).hexdigest()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self._ends)
+        if not 0 <= index < len(self._ends):
+            raise IndexError("observation index out of range")
+        # Memoized so repeated access returns the same dict, as with a plain list
+        observation = self._decoded.get(index)
+        if observation is None:
+            begin = self._start + (self._ends[index - 1] if index else 0)
+            observation = intern_observations([json.loads(self._buffer[begin:self._start + self._ends[index]])])[0]
+            self._decoded[index] = observation
+        return observation
+
+class EpisodeStore:
+    """Read-only view of a packed episode file, opened via mmap."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, self._index_offset = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a packed episode file.")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _record(self, index: int):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("episode index out of range")
+        (start,) = OFFSET.unpack_from(self._buffer, self._index_offset + OFFSET.size * index)
+        (meta_length,) = META_LENGTH.unpack_from(self._buffer, start)
+        meta_start = start + META_LENGTH.size
+        metadata = json.loads(self._buffer[meta_start:meta_start + meta_length])
+        return metadata, meta_start + meta_length
+
+    def metadata(self, index: int) -> Dict[str, Any]:
+        """Decode only the metadata of episode `index` (no observations)."""
+        return self._record(index)[0]
+
+    def __getitem__(self, index: int) -> Episode:
+        metadata, observations_start = self._record(index)
+        return Episode(
+            goal=metadata["goal"],
+            observations=LazyObservations(self._buffer, observations_start, metadata["observation_ends"]),
+            ground_truth_actions=metadata["ground_truth_actions"],
+            task_name=metadata["task_name"],
+            params=metadata["params"]
+        )
+
+    def __iter__(self) -> Iterator[Episode]:
+        for index in range(self._count):
+            yield self[index]
+
+    def close(self):
+        """Unmap the file; episodes read from the store can no longer decode observations."""
+        self._buffer.close()
+
+    def __enter__(self) -> "EpisodeStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _encode_record(data: Union[Episode, Dict[str, Any]]) -> bytes:
+    if isinstance(data, Episode):
+        data = {"goal": data.goal, "observations": data.observations, "ground_truth_actions": data.ground_truth_actions,
+                "task_name": data.task_name, "params": data.params}
+    blobs = [json.dumps(o, ensure_ascii=False, separators=(",", ":")).encode("utf-8") for o in data["observations"]]
+    ends = []
+    position = 0
+    for blob in blobs:
+        position += len(blob)
+        ends.append(position)
+    metadata = json.dumps({
+        "goal": data["goal"],
+        "ground_truth_actions": data["ground_truth_actions"],
+        "task_name": data.get("task_name", "unknown"),
+        "params": data.get("params", {}),
+        "apps": list(dict.fromkeys(o.get("app", "Unknown") for o in data["observations"])),
+        "observation_ends": ends
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return META_LENGTH.pack(len(metadata)) + metadata + b"".join(blobs)
+
+def pack_episodes(episodes: Iterable[Union[Episode, Dict[str, Any]]], path: str) -> int:
+    """Write Episodes or episode dicts (JSON episode schema) to a packed file; returns the count.
+
+    Use `src.sources.iter_episodes` to read them from JSON, JSONL or packed files.
+    """
+    offsets = array("Q")
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 0, 0))
+        for data in episodes:
+            offsets.append(f.tell())
+            f.write(_encode_record(data))
+        index_offset = f.tell()
+        offsets.append(index_offset)
+        if sys.byteorder == "big":
+            offsets.byteswap()
+        f.write(offsets.tobytes())
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, len(offsets) - 1, index_offset))
+    return len(offsets) - 1
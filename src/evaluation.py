@@ -2,14 +2,18 @@
 Evaluation metrics and analysis for Android World agent performance.
 """
 
-import json
-import pandas as pd
-from typing import Dict, List, Any, Optional
+import numpy as np
+from array import array
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Sequence
 from dataclasses import dataclass, asdict
 from datetime import datetime
-import matplotlib.pyplot as plt
-import seaborn as sns
-from collections import defaultdict, Counter
+
+from .metrics_table import StepTable
+from .serialization import load_results, save_results
+from .sink import read_log
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 @dataclass
 class EvaluationMetrics:
@@ -33,165 +37,278 @@ class EvaluationMetrics:
     common_errors: List[Dict[str, Any]]
     error_patterns: Dict[str, int]
     
+    # Steps whose provider call failed; they are excluded from the accuracies
+    failed_steps: int = 0
+    
     # Timing metrics (if available)
     average_response_time: Optional[float] = None
     total_evaluation_time: Optional[float] = None
     
+    # Provider call latency per step (seconds) and throughput (if measured)
+    latency_p50: Optional[float] = None
+    latency_p95: Optional[float] = None
+    latency_p99: Optional[float] = None
+    average_queue_time: Optional[float] = None
+    steps_per_second: Optional[float] = None
+    
+    # Token usage and estimated cost in USD (cost only if the model has a known price)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    estimated_cost: Optional[float] = None
+    
     # Self-reflection metrics
     reflection_quality_score: Optional[float] = None
     learning_improvement: Optional[float] = None
 
+def build_metrics(total_episodes: int, total_steps: int, correct_steps: int, successful_episodes: int,
+                  task_accuracy: Dict[str, float], app_accuracy: Dict[str, float],
+                  common_errors: List[Dict[str, Any]], error_patterns: Dict[str, int],
+                  failed_steps: int = 0, latencies: Optional[Sequence[float]] = None,
+                  queue_times: Optional[Sequence[float]] = None, prompt_tokens: int = 0,
+                  completion_tokens: int = 0, cost: Optional[float] = None,
+                  evaluation_time: Optional[float] = None) -> EvaluationMetrics:
+    """Derive the rate metrics from raw counts and assemble EvaluationMetrics.
+    
+    `latencies` and `queue_times` hold one value per measured step;
+    `evaluation_time` is the wall time of the run, used for throughput.
+    """
+    scored_steps = total_steps - failed_steps
+    latency_stats = {}
+    if latencies is not None and len(latencies):
+        latencies = np.asarray(latencies, dtype=np.float64)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]).tolist()
+        latency_stats = {"average_response_time": float(latencies.mean()),
+                         "latency_p50": p50, "latency_p95": p95, "latency_p99": p99}
+    if queue_times is not None and len(queue_times):
+        latency_stats["average_queue_time"] = float(np.mean(queue_times))
+    if evaluation_time:
+        latency_stats["steps_per_second"] = total_steps / evaluation_time
+    return EvaluationMetrics(
+        total_episodes=total_episodes,
+        total_steps=total_steps,
+        correct_steps=correct_steps,
+        step_accuracy=correct_steps / scored_steps if scored_steps > 0 else 0.0,
+        successful_episodes=successful_episodes,
+        episode_success_rate=successful_episodes / total_episodes if total_episodes > 0 else 0.0,
+        average_steps_per_episode=total_steps / total_episodes if total_episodes > 0 else 0.0,
+        task_accuracy=task_accuracy,
+        app_accuracy=app_accuracy,
+        common_errors=common_errors,
+        error_patterns=error_patterns,
+        failed_steps=failed_steps,
+        total_evaluation_time=evaluation_time,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        estimated_cost=cost,
+        **latency_stats
+    )
+
+class MetricsAccumulator:
+    """Running counts behind EvaluationMetrics, updated as episode results arrive.
+    
+    Results are buffered and folded into the counts `block_size` at a time
+    through a StepTable, the same aggregation `calculate_metrics(recompute=True)`
+    runs over all results, so the two cannot drift apart. `snapshot` only
+    divides the running counts (and takes latency percentiles over a compact
+    array of one float per step), so metrics can be taken at any point of a
+    long run. `common_errors` keeps the first `error_sample_size` incorrect
+    steps; `error_patterns` counts all of them. Accumulators from separate runs
+    can be combined with `merge`.
+    """
+    
+    def __init__(self, block_size: int = 256, error_sample_size: int = 100):
+        if block_size < 1:
+            raise ValueError("block_size must be at least 1.")
+        self.block_size = block_size
+        self.error_sample_size = error_sample_size
+        self.total_episodes = 0
+        self.total_steps = 0
+        self.correct_steps = 0
+        self.failed_steps = 0
+        self.successful_episodes = 0
+        self.task_accuracy_sums: Dict[str, float] = {}
+        self.task_episodes: Dict[str, int] = {}
+        self.app_correct: Dict[str, int] = {}
+        self.app_steps: Dict[str, int] = {}
+        self.error_patterns: Dict[str, int] = {}
+        self.common_errors: List[Dict[str, Any]] = []
+        self.latencies = array('d')
+        self.queue_times = array('d')
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost: Optional[float] = None
+        self._pending: List[Dict[str, Any]] = []
+    
+    def __len__(self) -> int:
+        """Number of episode results added so far."""
+        return self.total_episodes + len(self._pending)
+    
+    def add(self, result: Dict[str, Any]):
+        """Add one episode result; results are folded into the counts a block at a time."""
+        self._pending.append(result)
+        if len(self._pending) >= self.block_size:
+            self._fold()
+    
+    def _fold(self):
+        if self._pending:
+            table = StepTable(self._pending)
+            self._pending = []
+            self.add_table(table)
+    
+    def add_table(self, table: StepTable):
+        """Fold the aggregates of a step table into the running counts."""
+        self._fold()
+        self.total_episodes += table.num_episodes
+        self.total_steps += int(table.episode_steps.sum())
+        self.correct_steps += int(table.episode_correct.sum())
+        self.failed_steps += int(table.episode_failed.sum())
+        self.successful_episodes += int(np.count_nonzero((table.episode_accuracy == 1.0) & (table.episode_failed == 0)))
+        for task, (total, episodes) in table.task_totals().items():
+            self.task_accuracy_sums[task] = self.task_accuracy_sums.get(task, 0.0) + total
+            self.task_episodes[task] = self.task_episodes.get(task, 0) + episodes
+        for app, (correct, steps) in table.app_totals().items():
+            self.app_correct[app] = self.app_correct.get(app, 0) + correct
+            self.app_steps[app] = self.app_steps.get(app, 0) + steps
+        for pattern, count in table.error_patterns().items():
+            self.error_patterns[pattern] = self.error_patterns.get(pattern, 0) + count
+        room = self.error_sample_size - len(self.common_errors)
+        if room > 0:
+            self.common_errors.extend(table.common_errors(limit=room))
+        telemetry = table.telemetry()
+        self.latencies.frombytes(np.ascontiguousarray(telemetry['latencies']).tobytes())
+        self.queue_times.frombytes(np.ascontiguousarray(telemetry['queue_times']).tobytes())
+        self.prompt_tokens += telemetry['prompt_tokens']
+        self.completion_tokens += telemetry['completion_tokens']
+        if telemetry['cost'] is not None:
+            self.cost = (self.cost or 0.0) + telemetry['cost']
+    
+    def merge(self, other: "MetricsAccumulator"):
+        """Add another accumulator's counts to this one, as if its results came after ours."""
+        self._fold()
+        other._fold()
+        self.total_episodes += other.total_episodes
+        self.total_steps += other.total_steps
+        self.correct_steps += other.correct_steps
+        self.failed_steps += other.failed_steps
+        self.successful_episodes += other.successful_episodes
+        for counts, other_counts in (
+            (self.task_accuracy_sums, other.task_accuracy_sums),
+            (self.task_episodes, other.task_episodes),
+            (self.app_correct, other.app_correct),
+            (self.app_steps, other.app_steps),
+            (self.error_patterns, other.error_patterns)
+        ):
+            for key, value in other_counts.items():
+                counts[key] = counts.get(key, 0) + value
+        self.common_errors.extend(other.common_errors[:max(0, self.error_sample_size - len(self.common_errors))])
+        self.latencies.extend(other.latencies)
+        self.queue_times.extend(other.queue_times)
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        if other.cost is not None:
+            self.cost = (self.cost or 0.0) + other.cost
+    
+    def snapshot(self, evaluation_time: Optional[float] = None) -> EvaluationMetrics:
+        """Return the metrics for everything added so far."""
+        self._fold()
+        return build_metrics(
+            total_episodes=self.total_episodes,
+            total_steps=self.total_steps,
+            correct_steps=self.correct_steps,
+            successful_episodes=self.successful_episodes,
+            task_accuracy={task: total / self.task_episodes[task]
+                           for task, total in self.task_accuracy_sums.items()},
+            app_accuracy={app: self.app_correct[app] / steps for app, steps in self.app_steps.items()},
+            common_errors=list(self.common_errors),
+            error_patterns=dict(self.error_patterns),
+            failed_steps=self.failed_steps,
+            latencies=np.frombuffer(self.latencies, dtype=np.float64) if self.latencies else None,
+            queue_times=np.frombuffer(self.queue_times, dtype=np.float64) if self.queue_times else None,
+            prompt_tokens=self.prompt_tokens,
+            completion_tokens=self.completion_tokens,
+            cost=self.cost,
+            evaluation_time=evaluation_time
+        )
+
 class EvaluationAnalyzer:
-    """Analyzes agent performance and generates comprehensive reports."""
+    """Analyzes agent performance and generates comprehensive reports.
+    
+    With `keep_results=False` only the running metrics are kept: counts per
+    task, app and error pattern, a fixed-size error sample, and two floats per
+    step for the latency percentiles. Results are then expected to live in a
+    result log (see src.sink) rather than in `self.results`.
     
-    def __init__(self):
+    Set `evaluation_time` to the wall time of the run to get throughput metrics.
+    """
+    
+    def __init__(self, keep_results: bool = True):
         self.results: List[Dict[str, Any]] = []
+        self.keep_results = keep_results
         self.error_analysis: Dict[str, Any] = {}
+        self.accumulator = MetricsAccumulator()
+        self.evaluation_time: Optional[float] = None
+        self._step_table: Optional[StepTable] = None
         
     def add_episode_result(self, episode_result: Dict[str, Any]):
         """Add a single episode result for analysis."""
-        self.results.append(episode_result)
+        if self.keep_results:
+            self.results.append(episode_result)
+        self.accumulator.add(episode_result)
     
     def add_batch_results(self, results: List[Dict[str, Any]]):
         """Add multiple episode results for analysis."""
-        self.results.extend(results)
-    
-    def calculate_metrics(self) -> EvaluationMetrics:
-        """Calculate comprehensive evaluation metrics."""
-        if not self.results:
-            return EvaluationMetrics(
-                total_episodes=0, total_steps=0, correct_steps=0, step_accuracy=0.0,
-                successful_episodes=0, episode_success_rate=0.0, average_steps_per_episode=0.0,
-                task_accuracy={}, app_accuracy={}, common_errors=[], error_patterns={}
-            )
-        
-        # Basic metrics
-        total_episodes = len(self.results)
-        total_steps = sum(r['total_steps'] for r in self.results)
-        correct_steps = sum(r['correct_steps'] for r in self.results)
-        step_accuracy = correct_steps / total_steps if total_steps > 0 else 0.0
-        
-        # Episode-level metrics
-        successful_episodes = sum(1 for r in self.results if r['step_accuracy'] == 1.0)
-        episode_success_rate = successful_episodes / total_episodes if total_episodes > 0 else 0.0
-        average_steps_per_episode = total_steps / total_episodes if total_episodes > 0 else 0.0
-        
-        # Task-specific metrics
-        task_accuracy = self._calculate_task_accuracy()
-        app_accuracy = self._calculate_app_accuracy()
-        
-        # Error analysis
-        common_errors, error_patterns = self._analyze_errors()
-        
-        return EvaluationMetrics(
-            total_episodes=total_episodes,
-            total_steps=total_steps,
-            correct_steps=correct_steps,
-            step_accuracy=step_accuracy,
-            successful_episodes=successful_episodes,
-            episode_success_rate=episode_success_rate,
-            average_steps_per_episode=average_steps_per_episode,
-            task_accuracy=task_accuracy,
-            app_accuracy=app_accuracy,
-            common_errors=common_errors,
-            error_patterns=error_patterns
-        )
+        for result in results:
+            self.add_episode_result(result)
     
-    def _calculate_task_accuracy(self) -> Dict[str, float]:
-        """Calculate accuracy per task type."""
-        task_results = defaultdict(list)
+    def calculate_metrics(self, recompute: bool = False) -> EvaluationMetrics:
+        """Calculate comprehensive evaluation metrics.
         
-        for result in self.results:
-            task_name = result.get('episode_id', 'unknown')
-            task_results[task_name].append(result['step_accuracy'])
+        By default this is a snapshot of the running accumulator. With
+        `recompute=True` the metrics are rebuilt from the stored results using
+        the vectorized step table.
+        """
+        self._sync_accumulator()
+        if not recompute:
+            return self.accumulator.snapshot(self.evaluation_time)
         
-        return {task: sum(accuracies) / len(accuracies) 
-                for task, accuracies in task_results.items()}
+        # The same aggregation as the running accumulator, over all stored results at once
+        accumulator = MetricsAccumulator(error_sample_size=self.accumulator.error_sample_size)
+        accumulator.add_table(self.step_table())
+        return accumulator.snapshot(self.evaluation_time)
     
-    def _calculate_app_accuracy(self) -> Dict[str, float]:
-        """Calculate accuracy per app."""
-        app_results = defaultdict(list)
-        
-        for result in self.results:
-            for step in result.get('steps', []):
-                # Handle both dict and AgentStep objects
-                if hasattr(step, 'observation'):
-                    # AgentStep object
-                    app = step.observation.get('app', 'Unknown')
-                    app_results[app].append(1 if step.is_correct else 0)
-                else:
-                    # Dictionary
-                    app = step['observation'].get('app', 'Unknown')
-                    app_results[app].append(1 if step['is_correct'] else 0)
-        
-        return {app: sum(accuracies) / len(accuracies) if accuracies else 0.0
-                for app, accuracies in app_results.items()}
+    def _sync_accumulator(self):
+        # Results appended to self.results directly have not been accumulated yet
+        for result in self.results[len(self.accumulator):]:
+            self.accumulator.add(result)
     
-    def _analyze_errors(self) -> tuple[List[Dict[str, Any]], Dict[str, int]]:
-        """Analyze common errors and patterns."""
-        errors = []
-        error_patterns = Counter()
-        
-        for result in self.results:
-            for step in result.get('steps', []):
-                # Handle both dict and AgentStep objects
-                if hasattr(step, 'is_correct'):
-                    # AgentStep object
-                    if not step.is_correct:
-                        error = {
-                            'episode_id': result.get('episode_id', 'unknown'),
-                            'goal': result.get('goal', ''),
-                            'observation': step.observation,
-                            'predicted': step.predicted_action,
-                            'ground_truth': step.ground_truth_action,
-                            'app': step.observation.get('app', 'Unknown')
-                        }
-                        errors.append(error)
-                        
-                        # Analyze error patterns
-                        pattern = self._classify_error_pattern(step)
-                        error_patterns[pattern] += 1
-                else:
-                    # Dictionary
-                    if not step['is_correct']:
-                        error = {
-                            'episode_id': result.get('episode_id', 'unknown'),
-                            'goal': result.get('goal', ''),
-                            'observation': step['observation'],
-                            'predicted': step['predicted_action'],
-                            'ground_truth': step['ground_truth_action'],
-                            'app': step['observation'].get('app', 'Unknown')
-                        }
-                        errors.append(error)
-                        
-                        # Analyze error patterns
-                        pattern = self._classify_error_pattern(step)
-                        error_patterns[pattern] += 1
+    def merge(self, other: "EvaluationAnalyzer"):
+        """Fold another analyzer's results and running metrics into this one.
         
-        return errors, dict(error_patterns)
-    
-    def _classify_error_pattern(self, step: Dict[str, Any]) -> str:
-        """Classify the type of error made."""
-        # Handle both dict and AgentStep objects
-        if hasattr(step, 'predicted_action'):
-            # AgentStep object
-            predicted = step.predicted_action.lower()
-            ground_truth = step.ground_truth_action.lower()
-        else:
-            # Dictionary
-            predicted = step['predicted_action'].lower()
-            ground_truth = step['ground_truth_action'].lower()
-        
-        if 'click' in predicted and 'click' in ground_truth:
-            return "Wrong Element Clicked"
-        elif 'type' in predicted and 'type' in ground_truth:
-            return "Wrong Text Typed"
-        elif 'click' in predicted and 'type' in ground_truth:
-            return "Wrong Action Type (Click vs Type)"
-        elif 'type' in predicted and 'click' in ground_truth:
-            return "Wrong Action Type (Type vs Click)"
-        else:
-            return "Format Error"
+        Used to combine the analyzers of separate worker processes; the other
+        analyzer's results are appended after ours. An analyzer that keeps its
+        results can only merge one that kept them too, since its stored results
+        must account for every accumulated episode.
+        """
+        if self.keep_results and not other.keep_results:
+            raise ValueError("Cannot merge an analyzer created with keep_results=False into one that keeps results.")
+        self._sync_accumulator()
+        other._sync_accumulator()
+        if self.keep_results:
+            self.results.extend(other.results)
+        self.accumulator.merge(other.accumulator)
+    
+    def add_results_from_log(self, path: str):
+        """Add every episode result recorded in a result log, streaming it line by line."""
+        for _, result in read_log(path):
+            self.add_episode_result(result)
+    
+    def step_table(self) -> StepTable:
+        """Return the columnar step table for the current results, building it if needed."""
+        if not self.keep_results:
+            raise ValueError("The step table needs the stored results; create the analyzer with keep_results=True.")
+        if self._step_table is None or self._step_table.num_episodes != len(self.results):
+            self._step_table = StepTable(self.results)
+        return self._step_table
     
     def generate_report(self, output_path: Optional[str] = None) -> str:
         """Generate a comprehensive evaluation report."""
@@ -209,7 +326,26 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 - **Successful Episodes**: {metrics.successful_episodes}
 - **Episode Success Rate**: {metrics.episode_success_rate:.2%}
 - **Average Steps per Episode**: {metrics.average_steps_per_episode:.1f}
-
+"""
+        if metrics.failed_steps:
+            report += f"- **Failed Steps** (provider errors, not scored): {metrics.failed_steps}\n"
+        
+        if metrics.average_response_time is not None:
+            report += f"""
+## Latency and Throughput
+- **Mean Step Latency**: {metrics.average_response_time:.3f}s
+- **Latency p50 / p95 / p99**: {metrics.latency_p50:.3f}s / {metrics.latency_p95:.3f}s / {metrics.latency_p99:.3f}s
+"""
+            if metrics.average_queue_time is not None:
+                report += f"- **Mean Queue Time**: {metrics.average_queue_time:.3f}s\n"
+            if metrics.steps_per_second is not None:
+                report += (f"- **Throughput**: {metrics.steps_per_second:.2f} steps/s "
+                           f"over {metrics.total_evaluation_time:.1f}s\n")
+            report += f"- **Tokens**: {metrics.prompt_tokens} prompt, {metrics.completion_tokens} completion\n"
+            if metrics.estimated_cost is not None:
+                report += f"- **Estimated Cost**: ${metrics.estimated_cost:.4f}\n"
+        
+        report += f"""
 ## Task-Specific Performance
 """
         
@@ -253,13 +389,25 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         return report
     
     def save_results(self, output_path: str):
-        """Save detailed results to JSON file."""
-        with open(output_path, 'w') as f:
-            json.dump(self.results, f, indent=2, default=str)
+        """Save detailed results to JSON file.
+        
+        Steps are written as structured records that reference a per-episode
+        observation table; see src.serialization for the format.
+        """
+        save_results(self.results, output_path)
+    
+    @classmethod
+    def from_results_file(cls, path: str) -> "EvaluationAnalyzer":
+        """Create an analyzer from a results file written by save_results."""
+        analyzer = cls()
+        analyzer.add_batch_results(load_results(path))
+        return analyzer
     
     def create_visualizations(self, output_dir: str = "evaluation_plots"):
         """Create visualization plots for the evaluation results."""
         import os
+        # Plotting libraries take about a second to import, so only runs that plot pay for them
+        import matplotlib.pyplot as plt
         os.makedirs(output_dir, exist_ok=True)
         
         metrics = self.calculate_metrics()
@@ -305,7 +453,7 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         plt.savefig(f"{output_dir}/evaluation_summary.png", dpi=300, bbox_inches='tight')
         plt.close()
 
-def compare_agents(agent_results: Dict[str, List[Dict[str, Any]]]) -> pd.DataFrame:
+def compare_agents(agent_results: Dict[str, List[Dict[str, Any]]]) -> "pd.DataFrame":
     """Compare performance across different agents or configurations."""
     comparison_data = []
     
@@ -322,4 +470,5 @@ def compare_agents(agent_results: Dict[str, List[Dict[str, Any]]]) -> pd.DataFra
             'Average Steps per Episode': metrics.average_steps_per_episode
         })
     
+    import pandas as pd
     return pd.DataFrame(comparison_data) 
\ No newline at end of file
@@ -0,0 +1,57 @@
+"""
+Deferred imports of heavy optional dependencies.
+"""
+
+import importlib
+import importlib.util
+import threading
+from types import ModuleType
+from typing import Optional
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access.
+
+    Vendor SDKs and plotting libraries take hundreds of milliseconds to import,
+    which every CLI run and worker process would otherwise pay up front even
+    when they are never used. `available` checks whether the module is
+    installed without importing it.
+    """
+
+    def __init__(self, name: str, package: Optional[str] = None):
+        self._name = name
+        # Distribution to mention in the error when the module is missing
+        self._package = package or name.split(".")[0]
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        if self._module is not None:
+            return True
+        try:
+            return importlib.util.find_spec(self._name) is not None
+        except ModuleNotFoundError:
+            # find_spec imports the parent package of dotted names
+            return False
+
+    def load(self) -> ModuleType:
+        """Import the module now (if needed) and return it."""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    try:
+                        self._module = importlib.import_module(self._name)
+                    except ImportError as e:
+                        raise ImportError(f"{self._package} package is not installed.") from e
+        return self._module
+
+    def __getattr__(self, attribute: str):
+        return getattr(self.load(), attribute)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
+
+def lazy_import(name: str, package: Optional[str] = None) -> LazyModule:
+    """Return a LazyModule for `name`; nothing is imported until it is used."""
+    return LazyModule(name, package)
@@ -0,0 +1,168 @@
+"""
+Columnar step table for vectorized evaluation metrics.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .actions import classify_error
+from .serialization import step_fields, step_telemetry
+
+def _codes_by_first_appearance(labels: List[str], first_seen: np.ndarray) -> Tuple[List[str], np.ndarray]:
+    """Encode labels as integer codes ordered by where each label first appears."""
+    categories: Dict[str, int] = {}
+    codes = np.empty(len(labels), dtype=np.int32)
+    for position in np.argsort(first_seen, kind="stable"):
+        codes[position] = categories.setdefault(labels[position], len(categories))
+    return list(categories), codes
+
+class StepTable:
+    """Per-episode and per-step columns built from episode results in one pass.
+
+    Task, app and action strings are stored as integer codes into the `tasks`,
+    `apps` and `actions` lists (in first-appearance order), so every aggregate
+    is a NumPy group-by over dense codes instead of a walk over step objects.
+    Steps whose provider call failed are kept in the columns but left out of
+    the accuracy and error aggregates.
+    """
+
+    def __init__(self, results: List[Dict[str, Any]]):
+        self.results = results
+        task_codes: Dict[str, int] = {}
+        app_codes: Dict[str, int] = {}
+        action_codes: Dict[str, int] = {}
+
+        episode_task, episode_steps, episode_correct, episode_failed, episode_accuracy = [], [], [], [], []
+        step_counts, step_app, step_predicted, step_ground_truth, step_correct, step_failed = [], [], [], [], [], []
+        # Telemetry rows of (latency, queue_time, prompt_tokens, completion_tokens, cost); None where unmeasured
+        step_telemetry_rows = []
+
+        for result in results:
+            episode_task.append(task_codes.setdefault(result.get('episode_id', 'unknown'), len(task_codes)))
+            episode_steps.append(result['total_steps'])
+            episode_correct.append(result['correct_steps'])
+            episode_failed.append(result.get('failed_steps', 0))
+            episode_accuracy.append(result['step_accuracy'])
+            steps = result.get('steps', [])
+            step_counts.append(len(steps))
+            for step in steps:
+                observation, predicted, ground_truth, is_correct, error = step_fields(step)
+                step_app.append(app_codes.setdefault(observation.get('app', 'Unknown'), len(app_codes)))
+                step_predicted.append(action_codes.setdefault(predicted, len(action_codes)))
+                step_ground_truth.append(action_codes.setdefault(ground_truth, len(action_codes)))
+                step_correct.append(is_correct)
+                step_failed.append(error is not None)
+                step_telemetry_rows.append(step_telemetry(step))
+
+        self.tasks = list(task_codes)
+        self.apps = list(app_codes)
+        self.actions = list(action_codes)
+
+        self.episode_task = np.array(episode_task, dtype=np.int32)
+        self.episode_steps = np.array(episode_steps, dtype=np.int64)
+        self.episode_correct = np.array(episode_correct, dtype=np.int64)
+        self.episode_failed = np.array(episode_failed, dtype=np.int64)
+        self.episode_accuracy = np.array(episode_accuracy, dtype=np.float64)
+
+        # Step columns are grouped by episode, so the episode column is a repeat of episode indices
+        step_counts = np.array(step_counts, dtype=np.int64)
+        self.step_offsets = np.concatenate(([0], np.cumsum(step_counts)[:-1])).astype(np.int64)
+        self.step_episode = np.repeat(np.arange(len(results)), step_counts)
+        self.step_app = np.array(step_app, dtype=np.int32)
+        self.step_predicted = np.array(step_predicted, dtype=np.int64)
+        self.step_ground_truth = np.array(step_ground_truth, dtype=np.int64)
+        self.step_correct = np.array(step_correct, dtype=bool)
+        self.step_failed = np.array(step_failed, dtype=bool)
+        # NaN marks steps without a measurement
+        telemetry = np.array(step_telemetry_rows, dtype=np.float64).reshape(-1, 5)
+        (self.step_latency, self.step_queue_time, self.step_prompt_tokens,
+         self.step_completion_tokens, self.step_cost) = telemetry.T
+
+    @property
+    def num_episodes(self) -> int:
+        return len(self.episode_task)
+
+    def task_totals(self) -> Dict[str, Tuple[float, int]]:
+        """Sum of episode step accuracies and number of episodes per task."""
+        totals = np.bincount(self.episode_task, weights=self.episode_accuracy, minlength=len(self.tasks))
+        counts = np.bincount(self.episode_task, minlength=len(self.tasks))
+        return dict(zip(self.tasks, zip(totals.tolist(), counts.tolist())))
+
+    def task_accuracy(self) -> Dict[str, float]:
+        """Mean episode step accuracy per task."""
+        return {task: total / count for task, (total, count) in self.task_totals().items()}
+
+    def app_totals(self) -> Dict[str, Tuple[int, int]]:
+        """Correct and scored steps per app, in order of first scored step."""
+        scored = ~self.step_failed
+        step_app = self.step_app[scored]
+        correct = np.bincount(step_app, weights=self.step_correct[scored], minlength=len(self.apps))
+        counts = np.bincount(step_app, minlength=len(self.apps))
+        apps, first_seen = np.unique(step_app, return_index=True)
+        ordered = apps[np.argsort(first_seen, kind="stable")]
+        return dict(zip((self.apps[app] for app in ordered.tolist()),
+                        zip(correct[ordered].astype(np.int64).tolist(), counts[ordered].tolist())))
+
+    def app_accuracy(self) -> Dict[str, float]:
+        """Fraction of correct steps per app, over scored steps, in order of first scored step."""
+        return {app: correct / count for app, (correct, count) in self.app_totals().items()}
+
+    def error_patterns(self) -> Dict[str, int]:
+        """Count incorrect steps per error pattern, in order of first occurrence.
+
+        Only distinct (predicted, ground truth) pairs are classified; the counts
+        are then a single bincount over the per-step pattern codes.
+        """
+        pattern_codes, patterns = self._error_pattern_codes()
+        counts = np.bincount(pattern_codes, minlength=len(patterns))
+        return dict(zip(patterns, counts.tolist()))
+
+    def common_errors(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Describe the incorrect (scored) steps in result order, at most `limit` of them."""
+        incorrect = np.flatnonzero(self._incorrect())[:limit]
+        results, actions = self.results, self.actions
+        errors = []
+        episodes = self.step_episode[incorrect]
+        for episode, position, predicted, ground_truth in zip(
+            episodes.tolist(),
+            (incorrect - self.step_offsets[episodes]).tolist(),
+            self.step_predicted[incorrect].tolist(),
+            self.step_ground_truth[incorrect].tolist()
+        ):
+            result = results[episode]
+            observation = step_fields(result['steps'][position])[0]
+            errors.append({
+                'episode_id': result.get('episode_id', 'unknown'),
+                'goal': result.get('goal', ''),
+                'observation': observation,
+                'predicted': actions[predicted],
+                'ground_truth': actions[ground_truth],
+                'app': observation.get('app', 'Unknown')
+            })
+        return errors
+
+    def telemetry(self) -> Dict[str, Any]:
+        """Latency samples and usage totals, as build_metrics keyword arguments."""
+        measured_cost = self.step_cost[~np.isnan(self.step_cost)]
+        return {
+            'latencies': self.step_latency[~np.isnan(self.step_latency)],
+            'queue_times': self.step_queue_time[~np.isnan(self.step_queue_time)],
+            'prompt_tokens': int(np.nansum(self.step_prompt_tokens)),
+            'completion_tokens': int(np.nansum(self.step_completion_tokens)),
+            'cost': float(measured_cost.sum()) if len(measured_cost) else None
+        }
+
+    def _incorrect(self) -> np.ndarray:
+        return ~self.step_correct & ~self.step_failed
+
+    def _error_pattern_codes(self) -> Tuple[np.ndarray, List[str]]:
+        incorrect = self._incorrect()
+        pairs = self.step_predicted[incorrect] * len(self.actions) + self.step_ground_truth[incorrect]
+        unique_pairs, first_seen, inverse = np.unique(pairs, return_index=True, return_inverse=True)
+        labels = [
+            classify_error(self.actions[pair // len(self.actions)], self.actions[pair % len(self.actions)])
+            for pair in unique_pairs.tolist()
+        ]
+        patterns, label_codes = _codes_by_first_appearance(labels, first_seen)
+        return label_codes[inverse.reshape(-1)], patterns
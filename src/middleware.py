@@ -0,0 +1,307 @@
+"""
+Rate limiting, adaptive concurrency and retries for LLM providers.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from .agent import LLMProvider, ProviderError, ProviderWrapper
+from .telemetry import estimate_text_tokens, record_queue_time
+
+# Status codes worth retrying; 429 and the overload codes also mean "slow down"
+THROTTLE_STATUS_CODES = {429, 503, 529}
+RETRYABLE_STATUS_CODES = {408, 409, 500, 502, 503, 504, 529, 429}
+# Transport errors of the httpx-based SDKs (openai, anthropic, ollama), matched by name
+TRANSIENT_ERROR_NAMES = {"TransportError", "TimeoutException", "APIConnectionError", "APITimeoutError"}
+
+# (retryable, throttled, retry_after) for a provider failure
+Failure = Tuple[bool, bool, Optional[float]]
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def classify_exception(exc: BaseException) -> Optional[Failure]:
+    """Classify a provider exception, or return None if it is not a provider failure.
+
+    HTTP status codes come from the SDK exception's `status_code`; a
+    ProviderError is classified by its cause when it has one.
+    """
+    if isinstance(exc, ProviderError):
+        if exc.__cause__ is not None:
+            return classify_exception(exc.__cause__) or (exc.retryable, exc.throttled, exc.retry_after)
+        return exc.retryable, exc.throttled, exc.retry_after
+    status_code = getattr(exc, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in RETRYABLE_STATUS_CODES, status_code in THROTTLE_STATUS_CODES, _retry_after(exc)
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True, False, None
+    if TRANSIENT_ERROR_NAMES.intersection(cls.__name__ for cls in type(exc).__mro__):
+        return True, False, None
+    return None
+
+def estimate_tokens(prompt: str, completion_tokens: int) -> int:
+    """Rough token count of a request: ~4 characters per prompt token plus the completion budget."""
+    return estimate_text_tokens(prompt) + completion_tokens
+
+class TokenBucket:
+    """Token bucket refilled at `rate_per_minute`, holding at most `capacity` tokens.
+
+    `reserve` always succeeds but may leave the bucket in debt; the caller then
+    waits for the returned number of seconds, so concurrent callers queue up in
+    reservation order instead of polling.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive.")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """Take `amount` tokens and return how many seconds to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class AdaptiveConcurrency:
+    """Limit on in-flight requests, tuned by additive increase / multiplicative decrease.
+
+    Every success raises the limit by 1/limit (about +1 per window of `limit`
+    requests) and every throttled response multiplies it by `decrease`, so the
+    limit settles just below the point where the backend starts pushing back.
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 64, decrease: float = 0.5):
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.in_flight = 0
+        self._condition = threading.Condition()
+        # (loop, future) of coroutines parked in aacquire, woken in FIFO order
+        self._async_waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def aacquire(self):
+        """Wait for a slot without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._condition:
+                    remaining = deque(w for w in self._async_waiters if w[1] is not waiter)
+                    if len(remaining) == len(self._async_waiters):
+                        # Woken but cancelled before taking the slot: pass the wakeup on
+                        self._wake_async_waiters()
+                    self._async_waiters = remaining
+                raise
+
+    def _wake_async_waiters(self):
+        # Called with the condition held; wakes one waiter per free slot
+        for _ in range(min(int(self.limit) - self.in_flight, len(self._async_waiters))):
+            loop, waiter = self._async_waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_set_waiter, waiter)
+            except RuntimeError:
+                # Loop already closed; its waiter can never run
+                continue
+
+    def release(self):
+        """Free a slot."""
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+            self._wake_async_waiters()
+
+    def adapt(self, success: bool = True, throttled: bool = False):
+        """Adapt the limit to the outcome of a request."""
+        with self._condition:
+            if throttled:
+                self.limit = max(float(self.minimum), self.limit * self.decrease)
+            elif success:
+                self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+            self._wake_async_waiters()
+
+def _set_waiter(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter, honoring server retry-after hints."""
+    max_retries: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(self.max_delay, retry_after) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+@dataclass
+class ResilienceStats:
+    """Counters of a ResilientProvider."""
+    calls: int = 0
+    retries: int = 0
+    throttled: int = 0
+    failures: int = 0
+    concurrency_limit: float = 0.0
+
+class ResilientProvider(ProviderWrapper):
+    """Wraps an LLMProvider with rate limits, adaptive concurrency and retries.
+
+    Requests are held back by optional requests-per-minute and tokens-per-minute
+    buckets, then by an AIMD concurrency limit that shrinks on throttling (429
+    and overload responses). Retryable failures are retried with jittered
+    exponential backoff; a call that still fails raises ProviderError, which the
+    agent records as a failed step. Exceptions that are not provider failures
+    (e.g. bugs) propagate unchanged.
+
+    Batch requests each go through this wrapper's generate_action, so they are
+    limited and retried too; at most `max_batch_concurrency` of them, which
+    follows the current concurrency limit, run at once.
+    """
+
+    def __init__(self, provider: LLMProvider, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, max_concurrency: int = 32,
+                 initial_concurrency: int = 4, max_retries: int = 3, base_delay: float = 0.5,
+                 max_delay: float = 30.0, completion_tokens: int = 64):
+        super().__init__(provider)
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrency(initial=initial_concurrency, maximum=max_concurrency)
+        self.retry = RetryPolicy(max_retries=max_retries, base_delay=base_delay, max_delay=max_delay)
+        self.completion_tokens = completion_tokens
+        self._stats = ResilienceStats()
+        self._stats_lock = threading.Lock()
+
+    @property
+    def max_batch_concurrency(self) -> int:
+        return max(1, int(self.concurrency.limit))
+
+    @property
+    def resilience_stats(self) -> ResilienceStats:
+        with self._stats_lock:
+            return ResilienceStats(self._stats.calls, self._stats.retries, self._stats.throttled,
+                                   self._stats.failures, self.concurrency.limit)
+
+    def _rate_delay(self, prompt_template: str) -> float:
+        delay = 0.0
+        if self.request_bucket:
+            delay = self.request_bucket.reserve(1)
+        if self.token_bucket:
+            delay = max(delay, self.token_bucket.reserve(estimate_tokens(prompt_template, self.completion_tokens)))
+        return delay
+
+    def _count(self, **increments: int):
+        with self._stats_lock:
+            for name, value in increments.items():
+                setattr(self._stats, name, getattr(self._stats, name) + value)
+
+    def _handle_failure(self, exc: Exception, attempt: int) -> float:
+        """Account for a failed attempt; return the backoff delay or raise if giving up."""
+        failure = classify_exception(exc)
+        if failure is None:
+            raise exc
+        retryable, throttled, retry_after = failure
+        self.concurrency.adapt(success=False, throttled=throttled)
+        self._count(throttled=int(throttled))
+        if not retryable or attempt >= self.retry.max_retries:
+            self._count(failures=1)
+            raise ProviderError(
+                f"{type(self.provider).__name__} call failed after {attempt + 1} attempt(s): {exc}",
+                retryable=retryable, throttled=throttled, retry_after=retry_after
+            ) from exc
+        self._count(retries=1)
+        return self.retry.delay(attempt, retry_after)
+
+    def generate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        self._count(calls=1)
+        attempt = 0
+        while True:
+            # Rate-limit waits, concurrency waits and backoff are reported as queue time
+            waited = time.perf_counter()
+            delay = self._rate_delay(prompt_template)
+            if delay:
+                time.sleep(delay)
+            self.concurrency.acquire()
+            record_queue_time(time.perf_counter() - waited)
+            try:
+                response = self.provider.generate_action(goal, observation, prompt_template)
+            except Exception as e:
+                error = e
+            else:
+                error = None
+            finally:
+                # Also runs on KeyboardInterrupt, which the except above lets through
+                self.concurrency.release()
+            if error is None:
+                self.concurrency.adapt(success=True)
+                return response
+            backoff = self._handle_failure(error, attempt)
+            time.sleep(backoff)
+            record_queue_time(backoff)
+            attempt += 1
+
+    async def agenerate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        self._count(calls=1)
+        attempt = 0
+        while True:
+            waited = time.perf_counter()
+            delay = self._rate_delay(prompt_template)
+            if delay:
+                await asyncio.sleep(delay)
+            await self.concurrency.aacquire()
+            record_queue_time(time.perf_counter() - waited)
+            try:
+                response = await self.provider.agenerate_action(goal, observation, prompt_template)
+            except Exception as e:
+                error = e
+            else:
+                error = None
+            finally:
+                # Also runs on cancellation, which the except above lets through
+                self.concurrency.release()
+            if error is None:
+                self.concurrency.adapt(success=True)
+                return response
+            backoff = self._handle_failure(error, attempt)
+            await asyncio.sleep(backoff)
+            record_queue_time(backoff)
+            attempt += 1
@@ -0,0 +1,454 @@
+"""
+Local stand-in LLM server for load-testing the harness without a model.
+
+Speaks the Ollama chat API (`/api/chat`, `/api/tags`) as well as the OpenAI
+chat-completions (`/v1/chat/completions`) and Anthropic messages
+(`/v1/messages`) shapes, so every provider can be pointed at it with its
+`base_url`. Run it standalone with `python -m src.mock_server`.
+"""
+
+import argparse
+import ast
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .offline import heuristic_action
+
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "normal", "lognormal", "exponential")
+
+# The step's goal and UI elements are the last ones in the prompt (few-shot examples come first)
+GOAL_PATTERN = re.compile(r"^Goal: (.*)$", re.MULTILINE)
+UI_ELEMENTS_PATTERN = re.compile(r"UI Elements: (\[.*\])")
+
+@dataclass
+class MockServerConfig:
+    """Behaviour of a MockLLMServer.
+
+    Latency: each request waits `latency_ms` drawn from `latency_distribution`;
+    `latency_jitter_ms` is the half-width (uniform), standard deviation (normal)
+    or, divided by `latency_ms`, the sigma (lognormal, where `latency_ms` is the
+    median). Streamed answers additionally wait `token_interval_ms` per chunk.
+
+    Throughput: at most `max_concurrency` requests are served at once and the
+    rest queue, like Ollama's parallel slots; with `max_queue`, requests beyond
+    that many waiting get 503. Requests over `requests_per_second` get 429 with
+    a Retry-After header.
+
+    Faults: `error_rate` of requests fail with 500, `throttle_rate` with 429, and
+    `timeout_rate` hang for `timeout_seconds` before the connection is dropped
+    without a response. `seed` makes latency and fault sampling reproducible.
+    """
+    model: str = "mock"
+    latency_distribution: str = "constant"
+    latency_ms: float = 0.0
+    latency_jitter_ms: float = 0.0
+    token_interval_ms: float = 0.0
+    max_concurrency: Optional[int] = None
+    max_queue: Optional[int] = None
+    requests_per_second: Optional[float] = None
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_seconds: float = 30.0
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{self.latency_distribution}'. "
+                             f"Available: {', '.join(LATENCY_DISTRIBUTIONS)}")
+        if self.error_rate + self.throttle_rate + self.timeout_rate > 1.0:
+            raise ValueError("error_rate, throttle_rate and timeout_rate must add up to at most 1.")
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """One request's latency in seconds."""
+        mean, spread = self.latency_ms / 1000, self.latency_jitter_ms / 1000
+        if mean <= 0 or self.latency_distribution == "constant":
+            value = mean
+        elif self.latency_distribution == "uniform":
+            value = rng.uniform(mean - spread, mean + spread)
+        elif self.latency_distribution == "normal":
+            value = rng.gauss(mean, spread)
+        elif self.latency_distribution == "lognormal":
+            value = rng.lognormvariate(math.log(mean), spread / mean)
+        else:
+            value = rng.expovariate(1 / mean)
+        return max(0.0, value)
+
+@dataclass
+class MockServerStats:
+    """Counters of a MockLLMServer."""
+    requests: int = 0
+    completed: int = 0
+    errors: int = 0
+    throttled: int = 0
+    timeouts: int = 0
+    overloaded: int = 0
+    max_in_flight: int = 0
+
+def mock_answer(prompt: str) -> str:
+    """Deterministic answer to a prompt: heuristic_action on its goal and UI elements."""
+    goals = GOAL_PATTERN.findall(prompt)
+    elements = UI_ELEMENTS_PATTERN.findall(prompt)
+    try:
+        ui_elements = tuple(str(e) for e in ast.literal_eval(elements[-1])) if elements else ()
+    except (ValueError, SyntaxError):
+        ui_elements = ()
+    return heuristic_action(goals[-1] if goals else "", ui_elements)
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def _chunks(text: str, size: int = 4) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+class MockLLMServer:
+    """Threaded HTTP server answering chat requests per a MockServerConfig.
+
+    Use as a context manager (or `start`/`stop`) to serve from a background
+    thread; `url` is the base URL for OllamaProvider and AnthropicProvider,
+    `openai_url` for OpenAIProvider. Port 0 picks a free port.
+    """
+
+    def __init__(self, config: Optional[MockServerConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockServerConfig()
+        self.stats = MockServerStats()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.config.max_concurrency) if self.config.max_concurrency else None
+        self._waiting = 0
+        self._in_flight = 0
+        self._allowance = self.config.requests_per_second or 0.0
+        self._allowance_updated = time.monotonic()
+        self._httpd = _HTTPServer((host, port), _Handler)
+        self._httpd.mock = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openai_url(self) -> str:
+        return f"{self.url}/v1"
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def _count(self, **increments: int):
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self.stats, name, getattr(self.stats, name) + value)
+
+    def _admit(self) -> Optional[float]:
+        """Apply the request rate cap; return a retry-after delay if the request is over it."""
+        rate = self.config.requests_per_second
+        if not rate:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(rate, self._allowance + (now - self._allowance_updated) * rate)
+            self._allowance_updated = now
+            if self._allowance < 1.0:
+                return (1.0 - self._allowance) / rate
+            self._allowance -= 1.0
+            return None
+
+    def _sample(self) -> Tuple[Optional[str], float]:
+        """The injected fault (if any) and latency of the next request."""
+        with self._lock:
+            draw = self._rng.random()
+            latency = self.config.sample_latency(self._rng)
+        fault = None
+        for name, rate in (("error", self.config.error_rate), ("throttle", self.config.throttle_rate),
+                           ("timeout", self.config.timeout_rate)):
+            if draw < rate:
+                fault = name
+                break
+            draw -= rate
+        return fault, latency
+
+    def _acquire_slot(self) -> bool:
+        if self._slots is None:
+            return True
+        with self._lock:
+            if self.config.max_queue is not None and self._waiting >= self.config.max_queue:
+                return False
+            self._waiting += 1
+        self._slots.acquire()
+        with self._lock:
+            self._waiting -= 1
+        return True
+
+    def _enter(self):
+        with self._lock:
+            self._in_flight += 1
+            self.stats.max_in_flight = max(self.stats.max_in_flight, self._in_flight)
+
+    def _leave(self):
+        with self._lock:
+            self._in_flight -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Load tests open many connections at once
+    request_queue_size = 256
+    mock: MockLLMServer
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so pooled clients reuse their connections
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; Nagle plus delayed ACKs would add ~40 ms to each response
+    disable_nagle_algorithm = True
+    server: _HTTPServer
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+    def _send_json(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, content_type: str, events: Iterator[str]):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        interval = self.server.mock.config.token_interval_ms / 1000
+        try:
+            for i, event in enumerate(events):
+                if interval and i:
+                    time.sleep(interval)
+                data = event.encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading early (streaming early stop)
+            self.close_connection = True
+
+    def do_GET(self):
+        mock = self.server.mock
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": mock.config.model, "model": mock.config.model}]})
+        elif self.path == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": mock.config.model, "object": "model"}]})
+        elif self.path == "/stats":
+            with mock._lock:
+                self._send_json(200, asdict(mock.stats))
+        elif self.path == "/":
+            self._send_json(200, {"status": "Mock LLM server is running"})
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        routes = {"/api/chat": "ollama", "/v1/chat/completions": "openai", "/v1/messages": "anthropic"}
+        api = routes.get(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if api is None:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, _error_body(api, "invalid_request_error", "Request body is not valid JSON"))
+            return
+
+        mock = self.server.mock
+        mock._count(requests=1)
+        retry_after = mock._admit()
+        fault, latency = mock._sample()
+        if retry_after is not None or fault == "throttle":
+            mock._count(throttled=1)
+            self._send_json(429, _error_body(api, "rate_limit_error", "Rate limit exceeded"),
+                            {"Retry-After": f"{retry_after or 1.0:.3f}"})
+            return
+        if not mock._acquire_slot():
+            mock._count(overloaded=1)
+            self._send_json(503, _error_body(api, "overloaded_error", "Server is overloaded"))
+            return
+        mock._enter()
+        try:
+            if fault == "timeout":
+                mock._count(timeouts=1)
+                time.sleep(mock.config.timeout_seconds)
+                self.close_connection = True
+                return
+            time.sleep(latency)
+            if fault == "error":
+                mock._count(errors=1)
+                self._send_json(500, _error_body(api, "api_error", "Injected server error"))
+                return
+            self._respond(api, request)
+            mock._count(completed=1)
+        finally:
+            mock._leave()
+
+    def _respond(self, api: str, request: Dict[str, Any]):
+        messages = request.get("messages") or []
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        answer = mock_answer(prompt)
+        model = request.get("model") or self.server.mock.config.model
+        usage = (_estimate_tokens(prompt), _estimate_tokens(answer))
+        stream = bool(request.get("stream"))
+        if api == "ollama":
+            # Ollama streams by default
+            stream = request.get("stream", True)
+            if stream:
+                self._send_stream("application/x-ndjson", _ollama_events(model, answer, usage))
+            else:
+                self._send_json(200, _ollama_message(model, answer, usage, done=True))
+        elif api == "openai":
+            if stream:
+                include_usage = bool((request.get("stream_options") or {}).get("include_usage"))
+                self._send_stream("text/event-stream", _openai_events(model, answer, usage if include_usage else None))
+            else:
+                self._send_json(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion", "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": answer},
+                                 "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": usage[0], "completion_tokens": usage[1],
+                              "total_tokens": usage[0] + usage[1]}
+                })
+        elif stream:
+            self._send_stream("text/event-stream", _anthropic_events(model, answer, usage))
+        else:
+            self._send_json(200, _anthropic_message(model, [{"type": "text", "text": answer}], usage, "end_turn"))
+
+def _error_body(api: str, kind: str, message: str) -> Dict[str, Any]:
+    if api == "openai":
+        return {"error": {"message": message, "type": kind}}
+    if api == "anthropic":
+        return {"type": "error", "error": {"type": kind, "message": message}}
+    return {"error": message}
+
+def _ollama_message(model: str, content: str, usage: Tuple[int, int], done: bool) -> Dict[str, Any]:
+    message = {
+        "model": model,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "message": {"role": "assistant", "content": content},
+        "done": done
+    }
+    if done:
+        message.update(done_reason="stop", prompt_eval_count=usage[0], eval_count=usage[1])
+    return message
+
+def _ollama_events(model: str, answer: str, usage: Tuple[int, int]) -> Iterator[str]:
+    for chunk in _chunks(answer):
+        yield json.dumps(_ollama_message(model, chunk, usage, done=False)) + "\n"
+    yield json.dumps(_ollama_message(model, "", usage, done=True)) + "\n"
+
+def _sse(data: Any, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {data if isinstance(data, str) else json.dumps(data)}\n\n"
+
+def _openai_events(model: str, answer: str, usage: Optional[Tuple[int, int]] = None) -> Iterator[str]:
+    completion_id, created = f"chatcmpl-{uuid.uuid4().hex}", int(time.time())
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+        return _sse({"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]})
+    for i, piece in enumerate(_chunks(answer)):
+        yield chunk({"role": "assistant", "content": piece} if i == 0 else {"content": piece})
+    yield chunk({}, "stop")
+    if usage is not None:
+        # stream_options.include_usage: a final chunk without choices carries the usage
+        yield _sse({"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [], "usage": {"prompt_tokens": usage[0], "completion_tokens": usage[1],
+                                             "total_tokens": usage[0] + usage[1]}})
+    yield _sse("[DONE]")
+
+def _anthropic_message(model: str, content: List[Dict[str, Any]], usage: Tuple[int, int],
+                       stop_reason: Optional[str]) -> Dict[str, Any]:
+    return {
+        "id": f"msg_{uuid.uuid4().hex}", "type": "message", "role": "assistant", "model": model,
+        "content": content, "stop_reason": stop_reason, "stop_sequence": None,
+        "usage": {"input_tokens": usage[0], "output_tokens": usage[1]}
+    }
+
+def _anthropic_events(model: str, answer: str, usage: Tuple[int, int]) -> Iterator[str]:
+    yield _sse({"type": "message_start", "message": _anthropic_message(model, [], (usage[0], 0), None)},
+               "message_start")
+    yield _sse({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+               "content_block_start")
+    for piece in _chunks(answer):
+        yield _sse({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}},
+                   "content_block_delta")
+    yield _sse({"type": "content_block_stop", "index": 0}, "content_block_stop")
+    yield _sse({"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": usage[1]}}, "message_delta")
+    yield _sse({"type": "message_stop"}, "message_stop")
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve deterministic LLM answers over the Ollama, OpenAI and Anthropic APIs.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=11434, help="Port to listen on (default: 11434, Ollama's)")
+    parser.add_argument("--model", default="mock", help="Model name reported by /api/tags (default: mock)")
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="constant",
+                        help="Shape of the per-request latency (default: constant)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean (median for lognormal) latency (default: 0)")
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0, help="Spread of the latency (default: 0)")
+    parser.add_argument("--token-interval-ms", type=float, default=0.0,
+                        help="Delay between streamed chunks (default: 0)")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="Requests served at once; the rest queue")
+    parser.add_argument("--max-queue", type=int, default=None, help="Queued requests beyond which 503 is returned")
+    parser.add_argument("--rps", type=float, default=None, help="Request rate above which 429 is returned")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests failing with 429")
+    parser.add_argument("--timeout-rate", type=float, default=0.0,
+                        help="Fraction of requests that hang and are then dropped")
+    parser.add_argument("--timeout-seconds", type=float, default=30.0, help="How long those requests hang (default: 30)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for latency and fault sampling")
+    args = parser.parse_args()
+
+    config = MockServerConfig(
+        model=args.model, latency_distribution=args.latency_distribution, latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms, token_interval_ms=args.token_interval_ms,
+        max_concurrency=args.max_concurrency, max_queue=args.max_queue, requests_per_second=args.rps,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate, timeout_rate=args.timeout_rate,
+        timeout_seconds=args.timeout_seconds, seed=args.seed
+    )
+    server = MockLLMServer(config, host=args.host, port=args.port)
+    print(f"🧪 Mock LLM server listening on {server.url}")
+    print(f"   Ollama/Anthropic base_url: {server.url}   OpenAI base_url: {server.openai_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {server.stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Deterministic offline provider for exercising the pipeline without a model.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+from .agent import LLMProvider
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+@lru_cache(maxsize=65536)
+def heuristic_action(goal: str, ui_elements: Tuple[str, ...]) -> str:
+    """Click the UI element sharing the most words with the goal (the first one on ties)."""
+    if not ui_elements:
+        return 'CLICK("Unknown")'
+    goal_words = set(WORD_PATTERN.findall(goal.lower()))
+    best = max(ui_elements, key=lambda element: len(goal_words.intersection(WORD_PATTERN.findall(element.lower()))))
+    return f'CLICK("{best}")'
+
+class HeuristicProvider(LLMProvider):
+    """Answers every request with heuristic_action; no network calls.
+
+    Responses depend only on the goal and UI elements, so runs are reproducible.
+    Everything else in the pipeline (prompt rendering, parsing, scoring,
+    reflection bookkeeping, metrics) runs as usual, which makes this provider
+    useful for measuring Python-side overhead.
+    """
+
+    def __init__(self, model: str = "heuristic"):
+        self.model = model
+
+    def generate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        return heuristic_action(goal, tuple(observation.get("ui_elements", [])))
@@ -0,0 +1,289 @@
+"""
+Multi-process episode evaluation with mergeable per-worker results.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Type, Union
+
+from .agent import AndroidWorldAgent, Episode, LLMProvider
+from .cache import CacheStats
+from .evaluation import EvaluationAnalyzer
+from .middleware import ResilienceStats
+from .runner import ConcurrentEpisodeRunner
+from .sink import ResultSink
+from .sources import EpisodeFilter, Shard, filter_episodes, iter_episodes
+
+@dataclass
+class AgentSpec:
+    """Picklable recipe for building an AndroidWorldAgent inside a worker process.
+
+    Providers hold network clients that cannot be sent to other processes, so
+    each worker constructs its own from `provider_class(**provider_options)`;
+    `provider_class` may also be a name from the providers registry, imported
+    only in the workers that use it.
+    With a `cache_path`, workers share the on-disk response cache. With
+    `resilience`, the provider is wrapped in a middleware.ResilientProvider
+    built from those options (inside the cache, so cache hits skip the limits).
+    With `reflection`, reflections run on a reflection.ReflectionPipeline built
+    from those options; a `sink_path` there gets a per-worker suffix. With a
+    `record_path`, every call the agent makes is appended to a trace there
+    (see src.replay), also with a per-worker suffix.
+    """
+    provider_class: Union[str, Type[LLMProvider]]
+    provider_options: Dict[str, Any] = field(default_factory=dict)
+    cache_path: Optional[str] = None
+    prompt_template: str = "enhanced"
+    enable_reflection: bool = False
+    prompt_layout: str = "standard"
+    resilience: Optional[Dict[str, Any]] = None
+    reflection: Optional[Dict[str, Any]] = None
+    record_path: Optional[str] = None
+
+    def build(self) -> AndroidWorldAgent:
+        provider_class = self.provider_class
+        if isinstance(provider_class, str):
+            from .providers import get_provider_class
+            provider_class = get_provider_class(provider_class)
+        provider = provider_class(**self.provider_options)
+        if self.resilience is not None:
+            from .middleware import ResilientProvider
+            provider = ResilientProvider(provider, **self.resilience)
+        if self.cache_path:
+            from .cache import CachedProvider, ResponseCache
+            provider = CachedProvider(provider, ResponseCache(self.cache_path))
+        if self.record_path:
+            from .replay import RecordingProvider
+            provider = RecordingProvider(provider, self.record_path)
+        pipeline = None
+        if self.reflection is not None:
+            from .reflection import ReflectionPipeline
+            pipeline = ReflectionPipeline(provider, **self.reflection)
+        return AndroidWorldAgent(
+            provider,
+            prompt_template=self.prompt_template,
+            enable_reflection=self.enable_reflection,
+            prompt_layout=self.prompt_layout,
+            reflection_pipeline=pipeline
+        )
+
+@dataclass
+class WorkerTask:
+    """Everything one worker process needs to run its shard."""
+    worker: int
+    agent_spec: AgentSpec
+    shard: Shard
+    # Either in-memory episodes already sharded by the parent, or sources to stream
+    episodes: Optional[List[Union[Episode, Dict[str, Any]]]] = None
+    sources: Optional[Sequence[str]] = None
+    task_names: Optional[List[str]] = None
+    apps: Optional[List[str]] = None
+    threads: int = 4
+    backend: str = "thread"
+    log_path: Optional[str] = None
+    resume: bool = False
+    keep_results: bool = True
+
+@dataclass
+class WorkerReport:
+    """What a worker process sends back to the parent."""
+    worker: int
+    shard: Shard
+    analyzer: EvaluationAnalyzer
+    reflections: List[Dict[str, Any]]
+    skipped_episodes: int
+    elapsed: float
+    cache_stats: Optional[CacheStats] = None
+    resilience_stats: Optional[ResilienceStats] = None
+
+def run_worker(task: WorkerTask) -> WorkerReport:
+    """Run one shard in the current process (the process pool entry point)."""
+    start = time.perf_counter()
+    agent = task.agent_spec.build()
+    analyzer = EvaluationAnalyzer(keep_results=task.keep_results)
+
+    if task.sources is not None:
+        episodes = iter_episodes(task.sources, EpisodeFilter(shard=task.shard, task_names=task.task_names, apps=task.apps))
+    else:
+        episodes = task.episodes or []
+
+    sink = None
+    if task.log_path:
+        if task.resume:
+            analyzer.add_results_from_log(task.log_path)
+        sink = ResultSink(task.log_path)
+    runner = ConcurrentEpisodeRunner(agent, max_workers=task.threads, backend=task.backend,
+                                     sink=sink, resume=task.resume)
+    try:
+        runner.run(episodes, on_result=lambda index, result: analyzer.add_episode_result(result))
+    finally:
+        if sink is not None:
+            sink.close()
+        if agent.reflection_pipeline is not None:
+            agent.reflection_pipeline.close()
+        # After the reflections, which are recorded too
+        if task.agent_spec.record_path:
+            agent.llm_provider.close()
+    reflections = runner.reflection_history
+    if agent.reflection_pipeline is not None:
+        reflections = reflections + agent.reflection_pipeline.reflections
+
+    stats = getattr(agent.llm_provider, "stats", None)
+    return WorkerReport(
+        worker=task.worker,
+        shard=task.shard,
+        analyzer=analyzer,
+        reflections=reflections,
+        skipped_episodes=runner.skipped_episodes,
+        elapsed=time.perf_counter() - start,
+        cache_stats=stats if isinstance(stats, CacheStats) else None,
+        resilience_stats=getattr(agent.llm_provider, "resilience_stats", None)
+    )
+
+class ProcessEpisodeRunner:
+    """Partitions episodes across worker processes and merges their results.
+
+    Each process builds its own agent from `agent_spec` and runs its share of
+    the episodes on a ConcurrentEpisodeRunner with `threads_per_process`
+    workers, so the Python-side work (prompt rendering, parsing, scoring,
+    metrics) is spread over several cores instead of contending for one GIL.
+
+    Worker p of P takes shard (i + N*p, N*P) of the stream, where (i, N) is the
+    shard of the given filter (0/1 if none), so process sharding composes with
+    machine sharding. With `log_dir`, every worker appends to its own result
+    log there; `resume=True` skips episodes already in those logs, which needs
+    the same number of processes as the interrupted run.
+    """
+
+    def __init__(self, agent_spec: AgentSpec, processes: Optional[int] = None, threads_per_process: int = 4,
+                 backend: str = "thread", log_dir: Optional[str] = None, resume: bool = False,
+                 keep_results: bool = True):
+        processes = processes or os.cpu_count() or 1
+        if processes < 1:
+            raise ValueError("processes must be at least 1.")
+        if resume and log_dir is None:
+            raise ValueError("resume requires a log_dir.")
+        self.agent_spec = agent_spec
+        self.processes = processes
+        self.threads_per_process = threads_per_process
+        self.backend = backend
+        self.log_dir = log_dir
+        self.resume = resume
+        self.keep_results = keep_results
+        self.reports: List[WorkerReport] = []
+        self.reflection_history: List[Dict[str, Any]] = []
+
+    def log_paths(self) -> List[str]:
+        """Paths of the per-worker result logs (empty without a log_dir)."""
+        if self.log_dir is None:
+            return []
+        return [os.path.join(self.log_dir, f"results-worker{w}of{self.processes}.jsonl") for w in range(self.processes)]
+
+    def _worker_path(self, path: str, worker: int) -> str:
+        # Workers must not append to the same file; the suffix goes before e.g. ".jsonl.gz"
+        directory, name = os.path.split(path)
+        stem, dot, extension = name.partition(".")
+        return os.path.join(directory, f"{stem}-worker{worker}of{self.processes}{dot}{extension}")
+
+    def _worker_spec(self, worker: int) -> AgentSpec:
+        spec = self.agent_spec
+        reflection = spec.reflection
+        if reflection and reflection.get("sink_path"):
+            spec = replace(spec, reflection=dict(reflection, sink_path=self._worker_path(reflection["sink_path"], worker)))
+        if spec.record_path:
+            spec = replace(spec, record_path=self._worker_path(spec.record_path, worker))
+        return spec
+
+    def _tasks(self, episodes: Optional[Iterable[Union[Episode, Dict[str, Any]]]], sources: Optional[Sequence[str]],
+               episode_filter: EpisodeFilter) -> List[WorkerTask]:
+        base_index, base_count = episode_filter.shard or (0, 1)
+        log_paths = self.log_paths()
+        if episodes is not None:
+            episodes = list(episodes)
+        tasks = []
+        for worker in range(self.processes):
+            shard = (base_index + base_count * worker, base_count * self.processes)
+            worker_filter = EpisodeFilter(shard=shard, task_names=episode_filter.task_names, apps=episode_filter.apps)
+            tasks.append(WorkerTask(
+                worker=worker,
+                agent_spec=self._worker_spec(worker),
+                shard=shard,
+                episodes=list(filter_episodes(episodes, worker_filter)) if episodes is not None else None,
+                sources=sources,
+                task_names=sorted(episode_filter.task_names) if episode_filter.task_names else None,
+                apps=sorted(episode_filter.apps) if episode_filter.apps else None,
+                threads=self.threads_per_process,
+                backend=self.backend,
+                log_path=log_paths[worker] if log_paths else None,
+                resume=self.resume,
+                keep_results=self.keep_results
+            ))
+        return tasks
+
+    def run(self, episodes: Optional[Iterable[Union[Episode, Dict[str, Any]]]] = None,
+            sources: Optional[Sequence[str]] = None, episode_filter: Optional[EpisodeFilter] = None,
+            on_report: Optional[Callable[[WorkerReport], None]] = None) -> EvaluationAnalyzer:
+        """Run all episodes across the worker processes and return the merged analyzer.
+
+        Pass in-memory `episodes` (partitioned here and sent to the workers) or
+        episode `sources` (streamed by each worker). `on_report` is called in
+        the parent as each worker finishes. Merged results are grouped by worker.
+        """
+        if (episodes is None) == (sources is None):
+            raise ValueError("Pass exactly one of episodes or sources.")
+        if self.log_dir:
+            os.makedirs(self.log_dir, exist_ok=True)
+        start = time.perf_counter()
+        tasks = self._tasks(episodes, sources, episode_filter or EpisodeFilter())
+
+        reports: List[Optional[WorkerReport]] = [None] * len(tasks)
+        with ProcessPoolExecutor(max_workers=self.processes) as pool:
+            futures = [pool.submit(run_worker, task) for task in tasks]
+            for future in as_completed(futures):
+                report = future.result()
+                reports[report.worker] = report
+                if on_report:
+                    on_report(report)
+
+        self.reports = reports
+        merged = EvaluationAnalyzer(keep_results=self.keep_results)
+        for report in reports:
+            merged.merge(report.analyzer)
+            self.reflection_history.extend(report.reflections)
+        if not self.resume:
+            # Resumed analyzers also hold results of earlier runs, so their throughput is unknown
+            merged.evaluation_time = time.perf_counter() - start
+        return merged
+
+    @property
+    def skipped_episodes(self) -> int:
+        return sum(report.skipped_episodes for report in self.reports)
+
+    @property
+    def cache_stats(self) -> Optional[CacheStats]:
+        """Response cache counters summed over all workers, if a cache was used."""
+        stats = [report.cache_stats for report in self.reports if report.cache_stats is not None]
+        if not stats:
+            return None
+        return CacheStats(
+            hits=sum(s.hits for s in stats),
+            misses=sum(s.misses for s in stats),
+            writes=sum(s.writes for s in stats),
+            evictions=sum(s.evictions for s in stats)
+        )
+
+    @property
+    def resilience_stats(self) -> Optional[ResilienceStats]:
+        """Retry and throttling counters summed over all workers (the limit is averaged)."""
+        stats = [report.resilience_stats for report in self.reports if report.resilience_stats is not None]
+        if not stats:
+            return None
+        return ResilienceStats(
+            calls=sum(s.calls for s in stats),
+            retries=sum(s.retries for s in stats),
+            throttled=sum(s.throttled for s in stats),
+            failures=sum(s.failures for s in stats),
+            concurrency_limit=sum(s.concurrency_limit for s in stats) / len(stats)
+        )
@@ -1,4 +1,5 @@
-from typing import Dict, Any, List
+import string
+from typing import Dict, Any, List, Optional, Tuple
 
 # Few-shot examples for better prompting
 FEW_SHOT_EXAMPLES = [
@@ -90,6 +91,61 @@ Based on this reasoning, my action should be:
 
 Action: CLICK("<element>") or TYPE("<element>", "<text>")"""
 
+# Prefix-cache-friendly variants: the static instructions and few-shot block come
+# first and the per-step goal/observation last, so consecutive steps share a long
+# identical prompt prefix that the model server can keep in its KV cache.
+ENHANCED_PREFIX_TEMPLATE = """You are an Android agent that can perform actions on mobile apps. Your goal is to help users accomplish tasks by interacting with UI elements.
+
+Here are some examples of how to respond:
+
+{examples}
+
+Based on the goal and available UI elements below, what is the next best action? 
+
+Respond in exactly this format:
+CLICK("<element>") or TYPE("<element>", "<text>")
+
+Think step by step:
+1. What is the goal?
+2. What UI elements are available?
+3. Which element should I interact with to progress toward the goal?
+4. What type of interaction is needed (click or type)?
+
+Goal: {goal}
+Current Observation:
+- App: {app}
+- UI Elements: {ui_elements}
+
+Action:"""
+
+COT_PREFIX_TEMPLATE = """You are an Android agent that needs to think through problems step by step.
+
+For the goal and observation below, let me think through this step by step:
+
+1. **Goal Analysis**: What am I trying to accomplish?
+2. **Context Understanding**: What app am I in and what options do I have?
+3. **Strategy Planning**: What's the logical next step toward my goal?
+4. **Action Selection**: Which UI element should I interact with and how?
+
+Based on this reasoning, my action should be in the format:
+CLICK("<element>") or TYPE("<element>", "<text>")
+
+Goal: {goal}
+Observation:
+- App: {app}
+- UI Elements: {ui_elements}
+
+Action:"""
+
+SIMPLE_PREFIX_TEMPLATE = (
+    "What is the next best action? Respond in the format:\n"
+    "CLICK(\"<element>\") or TYPE(\"<element>\", \"<text>\")\n"
+    "Goal: {goal}\n"
+    "Observation:\n"
+    "- App: {app}\n"
+    "- UI Elements: {ui_elements}"
+)
+
 def format_few_shot_examples() -> str:
     """Format few-shot examples for the prompt."""
     formatted_examples = []
@@ -102,28 +158,91 @@ def format_few_shot_examples() -> str:
         )
     return "\n".join(formatted_examples)
 
-def render_prompt(goal: str, observation: Dict[str, Any], template: str = "enhanced") -> str:
-    """Render a prompt with the given template type."""
-    if template == "enhanced":
-        return ENHANCED_PROMPT_TEMPLATE.format(
-            examples=format_few_shot_examples(),
-            goal=goal,
-            app=observation.get("app", "Unknown"),
-            ui_elements=observation.get("ui_elements", [])
-        )
-    elif template == "cot":
-        return COT_PROMPT_TEMPLATE.format(
-            goal=goal,
-            app=observation.get("app", "Unknown"),
-            ui_elements=observation.get("ui_elements", [])
-        )
-    else:
-        # Default simple template
-        return DEFAULT_PROMPT_TEMPLATE.format(
-            goal=goal,
-            app=observation.get("app", "Unknown"),
-            ui_elements=observation.get("ui_elements", [])
-        )
+# Per-step fields every action template must reference
+STEP_FIELDS = ("goal", "app", "ui_elements")
+
+class CompiledTemplate:
+    """A prompt template parsed once, with its static fields pre-rendered.
+    
+    Placeholders are checked when the template is compiled: every name must be a
+    step field or a static value, and every step field must be used. Static
+    values such as the few-shot block are substituted up front, so `render` only
+    splices goal/app/ui_elements between precomputed literal chunks.
+    """
+    
+    def __init__(self, template: str, static_values: Optional[Dict[str, Any]] = None):
+        static_values = static_values or {}
+        formatter = string.Formatter()
+        literals: List[str] = []
+        fields: List[Tuple[str, Optional[str], str]] = []
+        buffer = []
+        used = set()
+        
+        for literal, field, spec, conversion in formatter.parse(template):
+            buffer.append(literal)
+            if field is None:
+                continue
+            if field in static_values:
+                value = formatter.convert_field(static_values[field], conversion)
+                buffer.append(formatter.format_field(value, spec))
+            elif field in STEP_FIELDS:
+                literals.append("".join(buffer))
+                buffer = []
+                fields.append((field, conversion, spec))
+            else:
+                raise ValueError(f"Unknown placeholder '{{{field}}}' in prompt template.")
+            used.add(field)
+        literals.append("".join(buffer))
+        
+        missing = [f for f in STEP_FIELDS if f not in used]
+        if missing:
+            raise ValueError(f"Prompt template is missing placeholders: {', '.join(missing)}")
+        
+        self.template = template
+        self._literals = literals
+        self._fields = fields
+        self._plain = all(conversion is None and not spec for _, conversion, spec in fields)
+    
+    @property
+    def static_prefix(self) -> str:
+        """Text before the first per-step field; identical for every step."""
+        return self._literals[0]
+    
+    def render(self, goal: str, observation: Dict[str, Any]) -> str:
+        values = {
+            "goal": goal,
+            "app": observation.get("app", "Unknown"),
+            "ui_elements": observation.get("ui_elements", [])
+        }
+        literals = self._literals
+        parts = [literals[0]]
+        if self._plain:
+            for i, (field, _, _) in enumerate(self._fields, 1):
+                parts.append(str(values[field]))
+                parts.append(literals[i])
+        else:
+            formatter = string.Formatter()
+            for i, (field, conversion, spec) in enumerate(self._fields, 1):
+                value = formatter.convert_field(values[field], conversion)
+                parts.append(formatter.format_field(value, spec))
+                parts.append(literals[i])
+        return "".join(parts)
+
+# Prompt layouts: "standard" keeps the original templates, "prefix" orders content
+# so that everything static forms a shared prefix ahead of the per-step fields
+PROMPT_LAYOUTS = ("standard", "prefix")
+
+def get_compiled_template(template: str = "enhanced", layout: str = "standard") -> CompiledTemplate:
+    """Return the compiled template for a template type, defaulting to the simple one."""
+    if layout not in PROMPT_LAYOUTS:
+        raise ValueError(f"Unknown prompt layout '{layout}'. Expected one of {PROMPT_LAYOUTS}.")
+    templates = PREFIX_TEMPLATES if layout == "prefix" else COMPILED_TEMPLATES
+    return templates.get(template, templates["simple"])
+
+def render_prompt(goal: str, observation: Dict[str, Any], template: str = "enhanced",
+                  layout: str = "standard") -> str:
+    """Render a prompt with the given template type and layout."""
+    return get_compiled_template(template, layout).render(goal, observation)
 
 def render_reflection_prompt(goal: str, observation: Dict[str, Any], action_taken: str, 
                            ground_truth: str, was_correct: bool) -> str:
@@ -144,4 +263,17 @@ DEFAULT_PROMPT_TEMPLATE = (
     "- UI Elements: {ui_elements}\n"
     "What is the next best action? Respond in the format:\n"
     "CLICK(\"<element>\") or TYPE(\"<element>\", \"<text>\")"
-)
\ No newline at end of file
+)
+
+# Compile every template at import so placeholder errors surface at load time
+COMPILED_TEMPLATES = {
+    "enhanced": CompiledTemplate(ENHANCED_PROMPT_TEMPLATE, static_values={"examples": format_few_shot_examples()}),
+    "cot": CompiledTemplate(COT_PROMPT_TEMPLATE),
+    "simple": CompiledTemplate(DEFAULT_PROMPT_TEMPLATE)
+}
+
+PREFIX_TEMPLATES = {
+    "enhanced": CompiledTemplate(ENHANCED_PREFIX_TEMPLATE, static_values={"examples": format_few_shot_examples()}),
+    "cot": CompiledTemplate(COT_PREFIX_TEMPLATE),
+    "simple": CompiledTemplate(SIMPLE_PREFIX_TEMPLATE)
+}
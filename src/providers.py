@@ -0,0 +1,40 @@
+"""
+Registry of LLM providers by name, imported on first use.
+"""
+
+import importlib
+from typing import Any, Dict, List, Type, Union
+
+from .agent import LLMProvider
+
+# name -> "module:attribute" (modules relative to this package) or a provider class
+PROVIDERS: Dict[str, Union[str, Type[LLMProvider]]] = {
+    "ollama": ".agent:OllamaProvider",
+    "openai": ".agent:OpenAIProvider",
+    "anthropic": ".agent:AnthropicProvider",
+    "heuristic": ".offline:HeuristicProvider",
+    "replay": ".replay:ReplayProvider",
+}
+
+def register_provider(name: str, target: Union[str, Type[LLMProvider]]):
+    """Make a provider available by name, as a class or a lazily imported "module:attribute" path."""
+    PROVIDERS[name] = target
+
+def provider_names() -> List[str]:
+    return sorted(PROVIDERS)
+
+def get_provider_class(name: str) -> Type[LLMProvider]:
+    """Resolve a registered provider name to its class, importing its module if needed."""
+    try:
+        target = PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown provider '{name}'. Available: {', '.join(provider_names())}")
+    if isinstance(target, str):
+        module_name, attribute = target.split(":")
+        target = getattr(importlib.import_module(module_name, package=__package__), attribute)
+        PROVIDERS[name] = target
+    return target
+
+def create_provider(name: str, **options: Any) -> LLMProvider:
+    """Construct a registered provider; options are passed to its constructor."""
+    return get_provider_class(name)(**options)
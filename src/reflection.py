@@ -0,0 +1,168 @@
+"""
+Background self-reflection, decoupled from action prediction.
+"""
+
+import hashlib
+import json
+import queue
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .agent import AgentStep, LLMProvider, free_text
+from .prompts import render_reflection_prompt
+from .telemetry import CallTelemetry, measure
+
+@dataclass
+class ReflectionStats:
+    """Counters of a ReflectionPipeline."""
+    submitted: int = 0
+    sampled_out: int = 0
+    completed: int = 0
+    failed: int = 0
+
+def reflection_record(reflection_response: str, step: AgentStep, step_index: int,
+                      call: Optional[CallTelemetry] = None) -> Dict[str, Any]:
+    """The record stored for one reflection, with the telemetry of its provider call if measured."""
+    record = {
+        'step_index': step_index,
+        'reflection': reflection_response,
+        'was_correct': step.is_correct,
+        'timestamp': datetime.now().isoformat()
+    }
+    if call is not None:
+        record.update((name, value) for name, value in call.fields().items() if value is not None)
+    return record
+
+class ReflectionPipeline:
+    """Generates step reflections on a background worker pool.
+
+    The agent submits each scored step and moves on; `workers` threads drain
+    the queue and call the provider, so reflections never add to step
+    latency. `only_incorrect` reflects only on wrong steps, and `sample_rate`
+    keeps that fraction of steps, chosen by a hash of (episode, step) so the
+    same steps are picked on every run and in every process. Finished
+    reflections are kept in `reflections` (unless `keep_reflections=False`)
+    and appended to the JSONL file at `sink_path`.
+
+    `close` waits for the queue to drain; it is called on exiting a `with` block.
+    """
+
+    def __init__(self, provider: LLMProvider, workers: int = 2, max_queue: int = 1024,
+                 only_incorrect: bool = False, sample_rate: float = 1.0,
+                 sink_path: Optional[str] = None, keep_reflections: bool = True):
+        if workers < 1:
+            raise ValueError("workers must be at least 1.")
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1.")
+        self.provider = provider
+        self.only_incorrect = only_incorrect
+        self.sample_rate = sample_rate
+        self.sink_path = sink_path
+        self.keep_reflections = keep_reflections
+        self.reflections: List[Dict[str, Any]] = []
+        self.stats = ReflectionStats()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._sink = open(sink_path, "a", encoding="utf-8") if sink_path else None
+        self._threads = [threading.Thread(target=self._work, name=f"reflection-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+        self._closed = False
+
+    def __enter__(self) -> "ReflectionPipeline":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def sampled(self, step: AgentStep, step_index: int, episode_id: Optional[str] = None) -> bool:
+        """Whether a step should be reflected on."""
+        if step.failed or (self.only_incorrect and step.is_correct):
+            return False
+        if self.sample_rate >= 1.0:
+            return True
+        digest = hashlib.blake2b(f"{episode_id}:{step_index}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") / 2 ** 64 < self.sample_rate
+
+    def submit(self, goal: str, observation: Dict[str, Any], step: AgentStep, step_index: int,
+               episode_id: Optional[str] = None, block: bool = True) -> bool:
+        """Queue a reflection on `step` if it is sampled.
+
+        Blocks while the queue is full, unless `block=False`, in which case
+        nothing is queued and False is returned.
+        """
+        if self._closed:
+            raise RuntimeError("ReflectionPipeline is closed.")
+        if not self.sampled(step, step_index, episode_id):
+            with self._lock:
+                self.stats.sampled_out += 1
+            return True
+        job = {"goal": goal, "observation": observation, "step": step, "step_index": step_index,
+               "episode_id": episode_id}
+        try:
+            self._queue.put(job, block=block)
+        except queue.Full:
+            return False
+        with self._lock:
+            self.stats.submitted += 1
+        return True
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                self._reflect(job)
+            except Exception:
+                # A dead worker would leave close() blocked on a full queue, so a bad job only counts as failed
+                with self._lock:
+                    self.stats.failed += 1
+
+    def _reflect(self, job: Dict[str, Any]):
+        step = job["step"]
+        prompt = render_reflection_prompt(
+            goal=job["goal"],
+            observation=job["observation"],
+            action_taken=step.predicted_action,
+            ground_truth=step.ground_truth_action,
+            was_correct=step.is_correct
+        )
+        failed = False
+        with measure() as call, free_text():
+            try:
+                response = self.provider.generate_action(job["goal"], job["observation"], prompt)
+            except Exception as e:
+                response = f"Reflection generation failed: {e}"
+                failed = True
+        record = reflection_record(response, step, job["step_index"], call)
+        if job["episode_id"] is not None:
+            record["episode_id"] = job["episode_id"]
+        self._store(record, failed)
+
+    def _store(self, record: Dict[str, Any], failed: bool):
+        with self._lock:
+            if self._sink is not None:
+                self._sink.write(json.dumps(record, default=str) + "\n")
+                self._sink.flush()
+            if self.keep_reflections:
+                self.reflections.append(record)
+            if failed:
+                self.stats.failed += 1
+            else:
+                self.stats.completed += 1
+
+    def close(self):
+        """Finish every queued reflection, stop the workers and close the sink."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self._sink is not None:
+            self._sink.close()
@@ -0,0 +1,255 @@
+"""
+Record provider calls to trace files and replay them without inference.
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, TextIO, Union
+
+from .agent import LLMProvider, ProviderError, ProviderWrapper
+from .cache import request_key
+from .telemetry import CallTelemetry, measure, record_queue_time, record_usage
+
+TRACE_VERSION = 1
+
+def trace_key(goal: str, observation: Dict[str, Any], prompt: str) -> str:
+    """Key of a call in a trace.
+
+    Unlike cache keys it does not depend on the provider, so a trace recorded
+    with any provider can be served by a ReplayProvider.
+    """
+    return request_key({"goal": goal, "observation": observation, "prompt": prompt})
+
+def _open_trace(path: str, mode: str) -> TextIO:
+    # A .gz suffix selects gzip; appending adds a new gzip member, which readers handle transparently
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+def read_trace(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the records of a trace file, headers included.
+
+    A torn final line or gzip member left by a crash is ignored.
+    """
+    with _open_trace(path, "r") as f:
+        try:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                yield json.loads(line)
+        except EOFError:
+            return
+
+class RecordingProvider(ProviderWrapper):
+    """Wraps an LLMProvider and appends every call to a JSONL trace file.
+
+    Each record holds the call's trace key, the response (or the ProviderError
+    it raised), its latency and token usage. Requests are stored only as their
+    key unless `include_requests=True`, which keeps traces compact; a path
+    ending in `.gz` is written gzip-compressed. Records are buffered and
+    flushed every `flush_every` calls and on `close`.
+
+    Wrap the provider the agent calls, outside any cache or retry middleware,
+    so the trace holds exactly the responses the agent saw.
+    """
+
+    def __init__(self, provider: LLMProvider, path: str, flush_every: int = 256, include_requests: bool = False):
+        if flush_every < 1:
+            raise ValueError("flush_every must be at least 1.")
+        super().__init__(provider)
+        self.path = path
+        self.flush_every = flush_every
+        self.include_requests = include_requests
+        self.records = 0
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = _open_trace(path, "a")
+        # Every recording session starts with a header; a file may hold several
+        self._buffer.append(json.dumps({
+            "trace": TRACE_VERSION,
+            "provider": type(provider).__name__,
+            "model": getattr(provider, "model", None),
+            "created": datetime.now().isoformat()
+        }) + "\n")
+
+    def generate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        with measure() as call:
+            try:
+                response = self.provider.generate_action(goal, observation, prompt_template)
+            except ProviderError as e:
+                error, response = e, None
+            else:
+                error = None
+        return self._finish(goal, observation, prompt_template, response, error, call)
+
+    async def agenerate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        with measure() as call:
+            try:
+                response = await self.provider.agenerate_action(goal, observation, prompt_template)
+            except ProviderError as e:
+                error, response = e, None
+            else:
+                error = None
+        return self._finish(goal, observation, prompt_template, response, error, call)
+
+    def _finish(self, goal: str, observation: Dict[str, Any], prompt: str, response: Optional[str],
+                error: Optional[ProviderError], call: CallTelemetry) -> str:
+        """Record the call, pass its telemetry on to the caller's scope, then return or raise."""
+        record_usage(call.prompt_tokens, call.completion_tokens, cost=call.cost)
+        record_queue_time(call.queue_time)
+        record: Dict[str, Any] = {"key": trace_key(goal, observation, prompt)}
+        if error is None:
+            record["response"] = response
+        else:
+            record.update(error=str(error), retryable=error.retryable, throttled=error.throttled)
+        record["latency"] = round(call.latency, 6)
+        for name in ("prompt_tokens", "completion_tokens", "cost"):
+            value = getattr(call, name)
+            if value is not None:
+                record[name] = value
+        if self.include_requests:
+            record["request"] = {"goal": goal, "observation": observation, "prompt": prompt}
+        self._write(json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n")
+        if error is not None:
+            raise error
+        return response
+
+    def _write(self, line: str):
+        with self._lock:
+            if self._file.closed:
+                raise RuntimeError("RecordingProvider is closed.")
+            self._buffer.append(line)
+            self.records += 1
+            if len(self._buffer) >= self.flush_every:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        self._file.write("".join(self._buffer))
+        self._file.flush()
+        self._buffer.clear()
+
+    def close(self):
+        """Write buffered records and close the trace file."""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._flush_locked()
+            self._file.close()
+
+    def __enter__(self) -> "RecordingProvider":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class TraceMissError(LookupError):
+    """A replayed request that is not in the trace."""
+
+@dataclass
+class ReplayStats:
+    """Counters of a ReplayProvider."""
+    hits: int = 0
+    misses: int = 0
+
+class ReplayProvider(LLMProvider):
+    """Serves the responses recorded by RecordingProvider, with no inference.
+
+    Calls are matched by trace key. A request recorded several times is answered
+    with its recordings in order, cycling through them when they run out.
+    Recorded ProviderErrors are raised again, so failed steps are reproduced,
+    and recorded token usage and cost are reported to telemetry.
+
+    With `reproduce_latency`, each call waits its recorded latency divided by
+    `speed`; otherwise it is served at memory speed. Requests missing from the
+    traces go to `fallback` if given, otherwise they raise TraceMissError.
+    """
+    def __init__(self, path: Union[str, Sequence[str]], reproduce_latency: bool = False, speed: float = 1.0,
+                 fallback: Optional[LLMProvider] = None, model: Optional[str] = None):
+        if speed <= 0:
+            raise ValueError("speed must be positive.")
+        self.paths = [path] if isinstance(path, str) else list(path)
+        self.reproduce_latency = reproduce_latency
+        self.speed = speed
+        self.fallback = fallback
+        self.model = model
+        self.replay_stats = ReplayStats()
+        self._records: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        for trace_path in self.paths:
+            self._load(trace_path)
+
+    def _load(self, path: str):
+        for record in read_trace(path):
+            if "trace" in record:
+                if record["trace"] > TRACE_VERSION:
+                    raise ValueError(f"{path} is a version {record['trace']} trace; "
+                                     f"this version reads up to {TRACE_VERSION}.")
+                self.model = self.model or record.get("model")
+                continue
+            self._records.setdefault(record.pop("key"), []).append(record)
+
+    @property
+    def max_batch_concurrency(self) -> int:
+        # Served from memory, a batch only needs threads to overlap waits or fallback calls
+        return 64 if self.reproduce_latency or self.fallback is not None else 1
+
+    async def aclose(self):
+        if self.fallback is not None:
+            await self.fallback.aclose()
+
+    def __len__(self) -> int:
+        return sum(len(records) for records in self._records.values())
+
+    def _lookup(self, goal: str, observation: Dict[str, Any], prompt: str) -> Optional[Dict[str, Any]]:
+        key = trace_key(goal, observation, prompt)
+        with self._lock:
+            records = self._records.get(key)
+            if not records:
+                self.replay_stats.misses += 1
+                if self.fallback is None:
+                    raise TraceMissError(f"No recorded response for request {key[:12]} (goal: {goal!r}).")
+                return None
+            self.replay_stats.hits += 1
+            index = self._cursors.get(key, 0)
+            self._cursors[key] = index + 1
+        return records[index % len(records)]
+
+    def _serve(self, record: Dict[str, Any]) -> str:
+        record_usage(record.get("prompt_tokens"), record.get("completion_tokens"), cost=record.get("cost"))
+        if "error" in record:
+            raise ProviderError(record["error"], retryable=record.get("retryable", False),
+                                throttled=record.get("throttled", False))
+        return record["response"]
+
+    def generate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        record = self._lookup(goal, observation, prompt_template)
+        if record is None:
+            return self.fallback.generate_action(goal, observation, prompt_template)
+        if self.reproduce_latency:
+            time.sleep(record.get("latency", 0.0) / self.speed)
+        return self._serve(record)
+
+    async def agenerate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        record = self._lookup(goal, observation, prompt_template)
+        if record is None:
+            return await self.fallback.agenerate_action(goal, observation, prompt_template)
+        if self.reproduce_latency:
+            await asyncio.sleep(record.get("latency", 0.0) / self.speed)
+        return self._serve(record)
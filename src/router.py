@@ -0,0 +1,190 @@
+"""
+Routing of provider calls across a pool of backend providers.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Sequence
+
+from .agent import LLMProvider, ProviderError
+from .middleware import classify_exception
+
+STRATEGIES = ("least_outstanding", "latency")
+
+@dataclass
+class BackendStats:
+    """Counters and latency of one backend of a RouterProvider."""
+    name: str
+    requests: int = 0
+    errors: int = 0
+    outstanding: int = 0
+    total_latency: float = 0.0
+    # Exponentially weighted moving average of successful call latency (seconds)
+    ewma_latency: Optional[float] = None
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+
+    @property
+    def mean_latency(self) -> Optional[float]:
+        successes = self.requests - self.errors
+        return self.total_latency / successes if successes > 0 else None
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests > 0 else 0.0
+
+    @property
+    def ejected(self) -> bool:
+        return self.ejected_until > time.monotonic()
+
+class RouterProvider(LLMProvider):
+    """Dispatches each call to one of several backend providers.
+
+    `strategy="least_outstanding"` picks the backend with the fewest requests in
+    flight; `"latency"` weights that count by the backend's moving-average
+    latency (the pool's average until it has a sample, scaled up by failures
+    in a row), so faster servers take a larger share. A backend that fails
+    `failure_threshold` calls in a row is ejected for `ejection_time` seconds
+    (if every backend is ejected, all of them are used again). A failed call is
+    retried on the next-best backend, up to `max_attempts` backends in total;
+    when all of them fail the last error is raised as ProviderError.
+
+    The backends are assumed to serve the same model: requests are described,
+    and therefore cached, as the first backend would describe them.
+    """
+
+    def __init__(self, backends: Sequence[LLMProvider], strategy: str = "least_outstanding",
+                 names: Optional[Sequence[str]] = None, failure_threshold: int = 3,
+                 ejection_time: float = 30.0, max_attempts: Optional[int] = None,
+                 latency_smoothing: float = 0.3):
+        if not backends:
+            raise ValueError("RouterProvider needs at least one backend.")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown routing strategy '{strategy}'. Choose from: {', '.join(STRATEGIES)}")
+        if names is None:
+            names = [f"{type(b).__name__}:{getattr(b, 'model', i)}#{i}" for i, b in enumerate(backends)]
+        self.backends = list(backends)
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.ejection_time = ejection_time
+        self.max_attempts = max_attempts or len(self.backends)
+        self.latency_smoothing = latency_smoothing
+        self.model = getattr(self.backends[0], "model", None)
+        self._stats = [BackendStats(name=name) for name in names]
+        self._lock = threading.Lock()
+
+    @property
+    def max_batch_concurrency(self) -> int:
+        return sum(backend.max_batch_concurrency for backend in self.backends)
+
+    def describe_request(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> Dict[str, Any]:
+        return self.backends[0].describe_request(goal, observation, prompt_template)
+
+    async def aclose(self):
+        for backend in self.backends:
+            await backend.aclose()
+
+    def backend_stats(self) -> List[BackendStats]:
+        """Snapshot of every backend's counters, in backend order."""
+        with self._lock:
+            return [replace(stats) for stats in self._stats]
+
+    def _pool_latency(self) -> float:
+        """Mean moving-average latency of the backends sampled so far (0.0 if none)."""
+        samples = [stats.ewma_latency for stats in self._stats if stats.ewma_latency is not None]
+        return sum(samples) / len(samples) if samples else 0.0
+
+    def _score(self, stats: BackendStats, pool_latency: float = 0.0) -> float:
+        if self.strategy == "latency":
+            # Unsampled backends are assumed to be as fast as the pool's average, so
+            # they get probed without being preferred over backends known to be fast;
+            # every failure in a row adds that much again
+            latency = stats.ewma_latency if stats.ewma_latency is not None else pool_latency
+            return (stats.outstanding + 1) * latency * (1 + stats.consecutive_failures)
+        return stats.outstanding
+
+    def _acquire(self, tried: List[int]) -> Optional[int]:
+        """Pick the best backend not tried yet and count the request as outstanding."""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [i for i in range(len(self.backends)) if i not in tried]
+            if not candidates:
+                return None
+            healthy = [i for i in candidates if self._stats[i].ejected_until <= now]
+            pool_latency = self._pool_latency()
+            # Ties go to the backend with the fewest requests so far, which spreads load evenly
+            index = min(healthy or candidates,
+                        key=lambda i: (self._score(self._stats[i], pool_latency), self._stats[i].requests))
+            stats = self._stats[index]
+            stats.outstanding += 1
+            stats.requests += 1
+            return index
+
+    def _release(self, index: int, latency: float, failed: bool):
+        with self._lock:
+            stats = self._stats[index]
+            stats.outstanding -= 1
+            if failed:
+                stats.errors += 1
+                stats.consecutive_failures += 1
+                if stats.consecutive_failures >= self.failure_threshold:
+                    stats.ejected_until = time.monotonic() + self.ejection_time
+                return
+            stats.consecutive_failures = 0
+            stats.ejected_until = 0.0
+            stats.total_latency += latency
+            if stats.ewma_latency is None:
+                stats.ewma_latency = latency
+            else:
+                stats.ewma_latency += self.latency_smoothing * (latency - stats.ewma_latency)
+
+    def _failover(self, index: int, error: Exception):
+        """Record a failed attempt, re-raising errors that are not provider failures (bugs)."""
+        if classify_exception(error) is None:
+            with self._lock:
+                self._stats[index].outstanding -= 1
+            raise error
+        self._release(index, 0.0, failed=True)
+
+    def generate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        tried: List[int] = []
+        last_error: Optional[Exception] = None
+        while len(tried) < self.max_attempts:
+            index = self._acquire(tried)
+            if index is None:
+                break
+            tried.append(index)
+            start = time.perf_counter()
+            try:
+                response = self.backends[index].generate_action(goal, observation, prompt_template)
+            except Exception as e:
+                self._failover(index, e)
+                last_error = e
+                continue
+            self._release(index, time.perf_counter() - start, failed=False)
+            return response
+        raise self._exhausted(tried, last_error) from last_error
+
+    async def agenerate_action(self, goal: str, observation: Dict[str, Any], prompt_template: str) -> str:
+        tried: List[int] = []
+        last_error: Optional[Exception] = None
+        while len(tried) < self.max_attempts:
+            index = self._acquire(tried)
+            if index is None:
+                break
+            tried.append(index)
+            start = time.perf_counter()
+            try:
+                response = await self.backends[index].agenerate_action(goal, observation, prompt_template)
+            except Exception as e:
+                self._failover(index, e)
+                last_error = e
+                continue
+            self._release(index, time.perf_counter() - start, failed=False)
+            return response
+        raise self._exhausted(tried, last_error) from last_error
+
+    def _exhausted(self, tried: List[int], last_error: Optional[Exception]) -> ProviderError:
+        names = ", ".join(self._stats[i].name for i in tried)
+        return ProviderError(f"All backends failed ({names}): {last_error}")
@@ -0,0 +1,233 @@
+"""
+Concurrent episode execution for Android World agent evaluation.
+"""
+
+import asyncio
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .agent import AndroidWorldAgent, Episode
+from .sink import ResultSink, keyed_episodes
+
+EpisodeInput = Union[Episode, Dict[str, Any]]
+ResultCallback = Callable[[int, Dict[str, Any]], None]
+
+class ConcurrentEpisodeRunner:
+    """Runs many episodes in flight at once with isolated per-episode agent state.
+
+    Each episode is executed by a clone of the template agent, so `step_history`
+    and `reflection_history` never leak between episodes. Results are returned in
+    input order regardless of completion order.
+
+    The "thread" backend runs blocking `run_episode` calls on a thread pool. The
+    "asyncio" backend drives `arun_episode` coroutines on a single event loop, so
+    `max_workers` bounds in-flight episodes without one thread per request. The
+    "batch" backend hands the episodes to `AndroidWorldAgent.run_episodes_batched`
+    with `max_workers` as the micro-batch size.
+
+    With a `sink`, every result is appended to its log as soon as the episode
+    finishes and is not kept in memory; `run` then returns None, and results
+    reach the caller only through `on_result` and the log. With `resume=True`,
+    episodes already recorded in that log are skipped. `elapsed` holds the
+    wall time of the last run.
+    """
+
+    BACKENDS = ("thread", "asyncio", "batch")
+    # The batch backend takes episodes from the stream this many micro-batches at a time
+    BATCH_WINDOW = 64
+
+    def __init__(self, agent: AndroidWorldAgent, max_workers: int = 4, backend: str = "thread",
+                 sink: Optional[ResultSink] = None, resume: bool = False):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}'. Expected one of {self.BACKENDS}.")
+        if resume and sink is None:
+            raise ValueError("resume requires a result sink.")
+        self.agent = agent
+        self.max_workers = max_workers
+        self.backend = backend
+        self.sink = sink
+        self.resume = resume
+        self.skipped_episodes = 0
+        self.elapsed: Optional[float] = None
+        self.reflection_history: List[Dict[str, Any]] = []
+
+    def run(self, episodes: Iterable[EpisodeInput], on_result: Optional[ResultCallback] = None) -> Optional[List[Dict[str, Any]]]:
+        """Run all episodes and return their results in input order (None with a sink).
+
+        `episodes` may be any iterable, including a streaming episode source; the
+        backends pull only a window of episodes ahead of the ones in flight.
+        `on_result(index, result)` is invoked from the calling thread as each
+        episode finishes, in completion order; `index` is the input position.
+        """
+        start = time.perf_counter()
+        episode_iter, on_result = self._prepare(episodes, on_result)
+        if self.backend == "batch":
+            results = self._run_batched(episode_iter, on_result)
+        else:
+            if self.backend == "asyncio":
+                outcomes = asyncio.run(self._run_asyncio_and_close(episode_iter, on_result))
+            else:
+                outcomes = self._run_threads(episode_iter, on_result)
+            results = self._collect(outcomes)
+        if self.sink is not None:
+            self.sink.flush()
+        self.elapsed = time.perf_counter() - start
+        return results
+
+    def _prepare(self, episodes: Iterable[EpisodeInput], on_result: Optional[ResultCallback]) -> Tuple[Iterator[Episode], Optional[ResultCallback]]:
+        """Lazily resolve the episodes to run and wrap on_result to record into the sink."""
+        episode_iter = (self._to_episode(e) for e in episodes)
+        self.skipped_episodes = 0
+        if self.sink is None:
+            return episode_iter, on_result
+
+        # Run index -> (input position, log key), dropped once the result is recorded
+        pending: Dict[int, Tuple[int, str]] = {}
+
+        def select() -> Iterator[Episode]:
+            for position, (key, episode) in enumerate(keyed_episodes(episode_iter)):
+                if self.resume and key in self.sink.recorded_keys:
+                    self.skipped_episodes += 1
+                    continue
+                pending[position - self.skipped_episodes] = (position, key)
+                yield episode
+
+        def record(index: int, result: Dict[str, Any]):
+            position, key = pending.pop(index)
+            self.sink.write(key, result)
+            if on_result:
+                on_result(position, result)
+
+        return select(), record
+
+    def _collect(self, outcomes: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]) -> Optional[List[Dict[str, Any]]]:
+        if self.sink is not None:
+            # Nothing was kept; the results are in the log
+            return None
+        results = []
+        for result, reflections in outcomes:
+            results.append(result)
+            self.reflection_history.extend(reflections)
+        return results
+
+    def _to_episode(self, episode: EpisodeInput) -> Episode:
+        if isinstance(episode, Episode):
+            return episode
+        return self.agent.load_episode(episode)
+
+    def _run_one(self, episode: Episode) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Run one episode on an isolated agent clone."""
+        worker = self.agent.clone()
+        result = worker.run_episode(episode)
+        reflections = self._tag_reflections(worker, episode)
+        return result, reflections
+
+    def _tag_reflections(self, worker: AndroidWorldAgent, episode: Episode) -> List[Dict[str, Any]]:
+        if not worker.reflection_history:
+            return []
+        episode_id = worker.reflection_episode_id(episode)
+        return [dict(r, episode_id=episode_id) for r in worker.reflection_history]
+
+    def _finish(self, outcomes: Dict[int, Tuple[Dict[str, Any], List[Dict[str, Any]]]], index: int,
+                outcome: Tuple[Dict[str, Any], List[Dict[str, Any]]], on_result: Optional[ResultCallback]):
+        """Hand a finished episode to on_result, keeping it only when there is no sink to hold it."""
+        if self.sink is None:
+            outcomes[index] = outcome
+        else:
+            self.reflection_history.extend(outcome[1])
+        if on_result:
+            on_result(index, outcome[0])
+
+    def _run_batched(self, episodes: Iterator[Episode], on_result: Optional[ResultCallback]) -> Optional[List[Dict[str, Any]]]:
+        results: List[Dict[str, Any]] = []
+        offset = 0
+        while True:
+            # A window of episodes at a time keeps memory bounded on long streams
+            window = list(islice(episodes, self.max_workers * self.BATCH_WINDOW))
+            if not window:
+                break
+            worker = self.agent.clone()
+            window_results = worker.run_episodes_batched(
+                window, batch_size=self.max_workers,
+                on_result=(lambda index, result, offset=offset: on_result(offset + index, result)) if on_result else None
+            )
+            if self.sink is None:
+                results.extend(window_results)
+            self.reflection_history.extend(worker.reflection_history)
+            offset += len(window)
+        return results if self.sink is None else None
+
+    def _run_threads(self, episodes: Iterator[Episode], on_result: Optional[ResultCallback]) -> List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        outcomes: Dict[int, Tuple[Dict[str, Any], List[Dict[str, Any]]]] = {}
+        indexed = enumerate(episodes)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            def submit(count: int):
+                for index, episode in islice(indexed, count):
+                    futures[executor.submit(self._run_one, episode)] = index
+
+            futures: Dict[Any, int] = {}
+            submit(self.max_workers * 2)
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._finish(outcomes, futures.pop(future), future.result(), on_result)
+                submit(len(done))
+        return [outcomes[i] for i in range(len(outcomes))]
+
+    async def _arun_one(self, episode: Episode, semaphore: asyncio.Semaphore) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Coroutine variant of _run_one, bounded by the shared semaphore."""
+        async with semaphore:
+            worker = self.agent.clone()
+            result = await worker.arun_episode(episode)
+        reflections = self._tag_reflections(worker, episode)
+        return result, reflections
+
+    async def arun(self, episodes: Iterable[EpisodeInput], on_result: Optional[ResultCallback] = None) -> Optional[List[Dict[str, Any]]]:
+        """Coroutine variant of run for callers that already own an event loop.
+
+        Await `agent.llm_provider.aclose()` before that loop ends to close the
+        provider's async clients.
+        """
+        start = time.perf_counter()
+        episode_iter, on_result = self._prepare(episodes, on_result)
+        results = self._collect(await self._run_asyncio(episode_iter, on_result))
+        if self.sink is not None:
+            self.sink.flush()
+        self.elapsed = time.perf_counter() - start
+        return results
+
+    async def _run_asyncio_and_close(self, episodes: Iterator[Episode], on_result: Optional[ResultCallback]) -> List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        # The provider's async clients belong to this loop, so close them before asyncio.run closes it
+        try:
+            return await self._run_asyncio(episodes, on_result)
+        finally:
+            await self.agent.llm_provider.aclose()
+
+    async def _run_asyncio(self, episodes: Iterator[Episode], on_result: Optional[ResultCallback]) -> List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        semaphore = asyncio.Semaphore(self.max_workers)
+        outcomes: Dict[int, Tuple[Dict[str, Any], List[Dict[str, Any]]]] = {}
+        indexed = enumerate(episodes)
+        tasks: Dict[asyncio.Future, int] = {}
+
+        def submit(count: int):
+            for index, episode in islice(indexed, count):
+                tasks[asyncio.ensure_future(self._arun_one(episode, semaphore))] = index
+
+        try:
+            submit(self.max_workers * 2)
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    self._finish(outcomes, tasks.pop(task), task.result(), on_result)
+                submit(len(done))
+        except BaseException:
+            # Stop the episodes still in flight and wait for them, so none outlives the run
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return [outcomes[i] for i in range(len(outcomes))]
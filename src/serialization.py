@@ -0,0 +1,103 @@
+"""
+Structured serialization of episode results.
+
+Each serialized episode carries its distinct observations once, in an
+`observations` table, and every step refers to its observation by index.
+Observations are compared by content, so a screen the agent sees on several
+steps is stored once:
+
+    {"episode_id": ..., "goal": ..., "total_steps": ..., "correct_steps": ...,
+     "step_accuracy": ..., "observations": [{"app": ..., "ui_elements": [...]}, ...],
+     "steps": [{"observation_id": 0, "predicted_action": ..., "ground_truth_action": ...,
+                "is_correct": true}, ...]}
+
+Steps whose provider call failed also carry an "error" message, and steps
+with telemetry carry its measured fields (see TELEMETRY_FIELDS).
+"""
+
+import json
+import sys
+from typing import Any, Dict, Iterable, List
+
+from .agent import AgentStep
+
+# Per-step telemetry written only when measured
+TELEMETRY_FIELDS = ('latency', 'queue_time', 'prompt_tokens', 'completion_tokens', 'cost')
+
+def step_fields(step: Any):
+    """Return (observation, predicted, ground_truth, is_correct, error) for an AgentStep or step dict."""
+    if isinstance(step, AgentStep):
+        return step.observation, step.predicted_action, step.ground_truth_action, step.is_correct, step.error
+    return (step['observation'], step['predicted_action'], step['ground_truth_action'], step['is_correct'],
+            step.get('error'))
+
+def step_telemetry(step: Any):
+    """Return (latency, queue_time, prompt_tokens, completion_tokens, cost) for an AgentStep or step dict."""
+    if isinstance(step, AgentStep):
+        return step.latency, step.queue_time, step.prompt_tokens, step.completion_tokens, step.cost
+    return tuple(step.get(name) for name in TELEMETRY_FIELDS)
+
+def serialize_episode_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert an episode result into plain JSON-compatible data."""
+    serialized = {key: value for key, value in result.items() if key != 'steps'}
+    observations: List[Dict[str, Any]] = []
+    # Identity is checked first so a dict shared by several steps is encoded once
+    ids_by_identity: Dict[int, int] = {}
+    ids_by_content: Dict[str, int] = {}
+    steps = []
+    for step in result.get('steps', []):
+        observation, predicted, ground_truth, is_correct, error = step_fields(step)
+        observation_id = ids_by_identity.get(id(observation))
+        if observation_id is None:
+            content = json.dumps(observation, sort_keys=True, separators=(',', ':'), default=str)
+            observation_id = ids_by_content.get(content)
+            if observation_id is None:
+                observation_id = ids_by_content[content] = len(observations)
+                observations.append(observation)
+            ids_by_identity[id(observation)] = observation_id
+        serialized_step = {
+            'observation_id': observation_id,
+            'predicted_action': predicted,
+            'ground_truth_action': ground_truth,
+            'is_correct': is_correct
+        }
+        if error is not None:
+            serialized_step['error'] = error
+        for name, value in zip(TELEMETRY_FIELDS, step_telemetry(step)):
+            if value is not None:
+                serialized_step[name] = value
+        steps.append(serialized_step)
+    serialized['observations'] = observations
+    serialized['steps'] = steps
+    return serialized
+
+def deserialize_episode_result(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Rebuild an episode result with AgentStep objects from serialized data."""
+    result = {key: value for key, value in data.items() if key not in ('steps', 'observations')}
+    observations = data.get('observations', [])
+    for observation in observations:
+        if isinstance(observation.get('app'), str):
+            observation['app'] = sys.intern(observation['app'])
+    result['steps'] = [
+        AgentStep(
+            observation=observations[step['observation_id']],
+            predicted_action=step['predicted_action'],
+            ground_truth_action=step['ground_truth_action'],
+            is_correct=step['is_correct'],
+            error=step.get('error'),
+            **{name: step[name] for name in TELEMETRY_FIELDS if name in step}
+        )
+        for step in data.get('steps', [])
+    ]
+    return result
+
+def save_results(results: Iterable[Dict[str, Any]], output_path: str):
+    """Write episode results to a JSON file in the structured format."""
+    with open(output_path, 'w') as f:
+        json.dump([serialize_episode_result(r) for r in results], f, indent=2)
+
+def load_results(path: str) -> List[Dict[str, Any]]:
+    """Load episode results written by save_results."""
+    with open(path) as f:
+        data = json.load(f)
+    return [deserialize_episode_result(episode) for episode in data]
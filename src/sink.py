@@ -0,0 +1,136 @@
+"""
+Append-only JSONL log of episode results, used for crash-safe resume.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
+
+from .agent import Episode
+from .cache import request_key
+from .serialization import deserialize_episode_result, serialize_episode_result
+
+def episode_key(episode: Episode) -> str:
+    """Content-hash an episode into a stable log key.
+
+    Packed episodes (src.datasets) are keyed on the digest of their raw
+    observation bytes, so skipping them on resume decodes no observations.
+    Their keys therefore differ from those of the same episode loaded from JSON.
+    """
+    key = {
+        "goal": episode.goal,
+        "ground_truth_actions": episode.ground_truth_actions,
+        "task_name": episode.task_name,
+        "params": episode.params
+    }
+    digest = getattr(episode.observations, "digest", None)
+    if digest is not None:
+        key["observations_digest"] = digest()
+    else:
+        key["observations"] = list(episode.observations)
+    return request_key(key)
+
+def keyed_episodes(episodes: Iterable[Episode]) -> Iterator[Tuple[str, Episode]]:
+    """Lazily pair each episode with its log key.
+
+    Repeated identical episodes get an ordinal suffix ("<hash>#1", "<hash>#2", ...)
+    so every occurrence is recorded and resumed separately.
+    """
+    seen: Dict[str, int] = {}
+    for episode in episodes:
+        key = episode_key(episode)
+        count = seen.get(key, 0)
+        seen[key] = count + 1
+        yield (f"{key}#{count}" if count else key), episode
+
+def read_log(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (key, result) pairs from a result log, one line at a time.
+
+    A torn final line left by a crash is ignored.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            record = json.loads(line)
+            yield record["key"], deserialize_episode_result(record["result"])
+
+class ResultSink:
+    """Appends each finished episode to a JSONL log, flushing in batches.
+
+    Every line is `{"key": <episode key>, "result": <serialized episode result>}`
+    in the format of src.serialization. Lines are buffered and written, flushed
+    and fsynced every `flush_every` results and on `close`, so a crash loses at
+    most one batch. `recorded_keys` holds the keys already in the log when it
+    was opened plus everything written since, which is what resume skips.
+    """
+
+    def __init__(self, path: str, flush_every: int = 16):
+        if flush_every < 1:
+            raise ValueError("flush_every must be at least 1.")
+        self.path = path
+        self.flush_every = flush_every
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.recorded_keys: Set[str] = self._scan_keys()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _scan_keys(self) -> Set[str]:
+        """Collect recorded keys and cut off a torn final line before appending."""
+        keys: Set[str] = set()
+        if not os.path.exists(self.path):
+            return keys
+        valid_bytes = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                keys.add(json.loads(line)["key"])
+                valid_bytes += len(line)
+        if valid_bytes != os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_bytes)
+        return keys
+
+    def write(self, key: str, result: Dict[str, Any]):
+        """Queue one episode result; the batch is flushed once it is full."""
+        line = json.dumps({"key": key, "result": serialize_episode_result(result)}, ensure_ascii=False)
+        with self._lock:
+            self._buffer.append(line + "\n")
+            self.recorded_keys.add(key)
+            if len(self._buffer) >= self.flush_every:
+                self._flush_locked()
+
+    def flush(self):
+        """Write buffered results and sync them to disk."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        self._file.write("".join(self._buffer))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._buffer.clear()
+
+    def close(self):
+        """Flush outstanding results and close the log."""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._flush_locked()
+            self._file.close()
+
+    def __enter__(self) -> "ResultSink":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
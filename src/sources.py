@@ -0,0 +1,128 @@
+"""
+Streaming episode sources with deterministic sharding and filtering.
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple, Union
+
+from .agent import Episode, episode_from_dict
+from .datasets import MAGIC, EpisodeStore
+
+EPISODE_EXTENSIONS = (".json", ".jsonl", ".pack")
+
+Shard = Tuple[int, int]
+
+def parse_shard(spec: str) -> Shard:
+    """Parse an "i/N" shard spec (0-based i) into (i, N)."""
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{spec}'. Expected the form i/N, e.g. 0/4.")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{spec}'. Need 0 <= i < N.")
+    return index, count
+
+class EpisodeFilter:
+    """Selects episodes by shard, task name and app.
+
+    Sharding is round-robin over the position of each episode in the source
+    stream, so processes given the same sources and shard count split the
+    corpus without overlap. Positions are counted before the task/app filters
+    are applied, which lets sources skip decoding episodes of other shards.
+    """
+
+    def __init__(self, shard: Optional[Shard] = None, task_names: Optional[Iterable[str]] = None,
+                 apps: Optional[Iterable[str]] = None):
+        self.shard = shard
+        self.task_names = set(task_names) if task_names else None
+        self.apps = set(apps) if apps else None
+
+    def in_shard(self, position: int) -> bool:
+        return self.shard is None or position % self.shard[1] == self.shard[0]
+
+    def accepts(self, task_name: str, apps: Iterable[str]) -> bool:
+        """Apply the task/app filters; an episode matches if it visits any selected app."""
+        if self.task_names is not None and task_name not in self.task_names:
+            return False
+        if self.apps is not None and self.apps.isdisjoint(apps):
+            return False
+        return True
+
+    def accepts_dict(self, data: Dict[str, Any]) -> bool:
+        return self.accepts(data.get("task_name", "unknown"),
+                            (o.get("app", "Unknown") for o in data.get("observations", [])))
+
+def _source_files(source: str) -> Iterator[str]:
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(EPISODE_EXTENSIONS):
+                    yield os.path.join(root, name)
+    else:
+        yield source
+
+def _is_packed(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def _raw_episodes(path: str) -> Iterator[Union[str, Dict[str, Any]]]:
+    """Yield undecoded JSONL lines or decoded episode dicts from one JSON(L) file."""
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield line
+        return
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    # A .json file holds either one episode or a list of episodes
+    yield from (data if isinstance(data, list) else [data])
+
+def iter_episodes(sources: Union[str, Sequence[str]], episode_filter: Optional[EpisodeFilter] = None) -> Iterator[Episode]:
+    """Stream Episodes from JSON, JSONL and packed files, or directories of them.
+
+    Directories are walked in sorted order so every process sees the same
+    episode positions. Episodes outside the shard are skipped before they are
+    decoded; the task/app filters use packed metadata where available.
+    """
+    if isinstance(sources, str):
+        sources = [sources]
+    episode_filter = episode_filter or EpisodeFilter()
+    position = 0
+    for source in sources:
+        for path in _source_files(source):
+            if _is_packed(path):
+                # Not closed here: yielded episodes may still be running and need the mapping
+                store = EpisodeStore(path)
+                for index in range(len(store)):
+                    selected = episode_filter.in_shard(position)
+                    position += 1
+                    if not selected:
+                        continue
+                    metadata = store.metadata(index)
+                    if episode_filter.accepts(metadata["task_name"], metadata["apps"]):
+                        yield store[index]
+                continue
+            for raw in _raw_episodes(path):
+                selected = episode_filter.in_shard(position)
+                position += 1
+                if not selected:
+                    continue
+                data = json.loads(raw) if isinstance(raw, str) else raw
+                if episode_filter.accepts_dict(data):
+                    yield episode_from_dict(data)
+
+def filter_episodes(episodes: Iterable[Union[Episode, Dict[str, Any]]],
+                    episode_filter: EpisodeFilter) -> Iterator[Union[Episode, Dict[str, Any]]]:
+    """Apply sharding and filters to episodes that are already in memory."""
+    for position, episode in enumerate(episodes):
+        if not episode_filter.in_shard(position):
+            continue
+        if isinstance(episode, Episode):
+            apps = (o.get("app", "Unknown") for o in episode.observations)
+            if episode_filter.accepts(episode.task_name, apps):
+                yield episode
+        elif episode_filter.accepts_dict(episode):
+            yield episode
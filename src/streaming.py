@@ -0,0 +1,46 @@
+"""
+Incremental action parsing for streamed model output.
+"""
+
+from typing import Optional
+
+from .actions import ACTION_PATTERN, action_from_match
+
+class StreamingActionParser:
+    """Consumes streamed text chunks and reports the first complete action.
+
+    `feed` returns the canonical action string as soon as one has been fully
+    parsed, so callers can cancel generation without waiting for the rest of the
+    completion. Action responses are capped at a few dozen tokens, so the buffer
+    is rescanned from the first position where an action could still start.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.action: Optional[str] = None
+        self._scan_from = 0
+
+    def feed(self, chunk: Optional[str]) -> Optional[str]:
+        """Append a chunk and return the parsed action once it is complete."""
+        if self.action is not None:
+            return self.action
+        if not chunk:
+            return None
+        self.buffer += chunk
+
+        match = ACTION_PATTERN.search(self.buffer, self._scan_from)
+        if match is None:
+            self._advance_scan_position()
+            return None
+        self.action = action_from_match(match).format()
+        return self.action
+
+    def _advance_scan_position(self):
+        # Text before the first unresolved "C"/"T" can never begin an action
+        upper = self.buffer.upper()
+        starts = [i for i in (upper.find("CLICK", self._scan_from), upper.find("TYPE", self._scan_from)) if i >= 0]
+        if starts:
+            self._scan_from = min(starts)
+        else:
+            # Keep a tail that may hold a keyword split across chunks
+            self._scan_from = max(self._scan_from, len(self.buffer) - len("CLICK") + 1)
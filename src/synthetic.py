@@ -0,0 +1,153 @@
+"""
+Seeded synthetic episode corpora for scale testing.
+"""
+
+import json
+import math
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+APPS = ["Settings", "Chrome", "Gmail", "Camera", "Maps", "Messages", "Clock", "Files", "Contacts", "Calendar",
+        "Photos", "YouTube", "Slack", "Spotify", "Calculator", "Play Store", "Phone", "Drive", "Keep", "Home"]
+# UI element names are single words and two-word combinations of these
+WORDS = ["Apps", "Search", "Battery", "Send", "Wi-Fi", "Display", "New", "Message", "Capture", "Alarm", "Share",
+         "Settings", "Open", "Close", "Back", "Next", "Done", "Cancel", "Save", "Delete", "Edit", "Add", "Menu",
+         "Profile", "Account", "Notifications", "Sound", "Privacy", "Storage", "Network", "Bluetooth", "Location",
+         "Gallery", "Video", "Photo", "Contact", "Call", "Timer", "Stopwatch", "Folder", "Download", "Upload",
+         "Install", "Uninstall", "Update", "Filter", "Sort", "Home", "Inbox", "Compose", "Reply", "Forward",
+         "Archive", "Star", "Label", "Event", "Reminder", "Note", "Playlist", "Text Input"]
+VERBS = ["Use", "Open", "Tap", "Select", "Go to", "Find"]
+TEXTS = ["Hello John!", "weather today", "7:00 AM", "alice@example.com", "pizza near me", "Meeting notes", "42"]
+
+@dataclass
+class SyntheticConfig:
+    """Distributions of a synthetic corpus.
+
+    Episode lengths and UI-element counts are log-normal with the given median
+    and sigma, clipped to [min, max] (sigma 0 gives the median every time), so
+    most screens are small while a few carry hundreds of elements. Apps are
+    drawn by `app_weights` (uniform by default); each step moves to another app
+    with probability `app_switch_rate`. `type_ratio` of the ground-truth
+    actions are TYPE, the rest CLICK.
+    """
+    apps: Sequence[str] = tuple(APPS)
+    app_weights: Optional[Sequence[float]] = None
+    app_switch_rate: float = 0.3
+    steps_median: float = 8.0
+    steps_sigma: float = 0.5
+    steps_min: int = 1
+    steps_max: int = 50
+    ui_elements_median: float = 12.0
+    ui_elements_sigma: float = 0.8
+    ui_elements_min: int = 1
+    ui_elements_max: int = 400
+    type_ratio: float = 0.2
+    task_count: int = 116
+
+    def __post_init__(self):
+        if self.app_weights is not None and len(self.app_weights) != len(self.apps):
+            raise ValueError("app_weights needs one weight per app.")
+        if not 0.0 <= self.type_ratio <= 1.0:
+            raise ValueError("type_ratio must be between 0 and 1.")
+        if not 1 <= self.steps_min <= self.steps_max:
+            raise ValueError("Need 1 <= steps_min <= steps_max.")
+        if not 1 <= self.ui_elements_min <= self.ui_elements_max:
+            raise ValueError("Need 1 <= ui_elements_min <= ui_elements_max.")
+
+def element_vocabulary() -> List[str]:
+    """Every UI element name the generator can emit."""
+    names = list(WORDS)
+    names.extend(f"{first} {second}" for first in WORDS for second in WORDS if first != second)
+    return names
+
+def _clipped_lognormal(rng: random.Random, median: float, sigma: float, minimum: int, maximum: int) -> int:
+    value = median if sigma <= 0 else math.exp(rng.gauss(math.log(median), sigma))
+    return min(maximum, max(minimum, round(value)))
+
+class EpisodeGenerator:
+    """Generates episode dicts in the JSON episode schema from a seed.
+
+    The same seed and config always yield the same corpus. Episodes are built
+    one at a time, so corpora of any size can be streamed to disk.
+    """
+
+    def __init__(self, config: Optional[SyntheticConfig] = None, seed: int = 0):
+        self.config = config or SyntheticConfig()
+        self.rng = random.Random(seed)
+        # Screens are windows of a shuffled vocabulary: distinct elements for one
+        # random draw each, where sampling them one by one would dominate the runtime
+        self.vocabulary = element_vocabulary()
+        self.rng.shuffle(self.vocabulary)
+        # Cumulative weights let choices() skip re-summing them on every call
+        weights = self.config.app_weights or [1.0] * len(self.config.apps)
+        self._app_cum_weights = [sum(weights[:i + 1]) for i in range(len(weights))]
+
+    def _app(self) -> str:
+        return self.rng.choices(self.config.apps, cum_weights=self._app_cum_weights)[0]
+
+    def episode(self, steps: Optional[int] = None) -> Dict[str, Any]:
+        """The next episode, with `steps` steps or a length drawn from the config."""
+        config, rng = self.config, self.rng
+        if steps is None:
+            steps = _clipped_lognormal(rng, config.steps_median, config.steps_sigma, config.steps_min, config.steps_max)
+        vocabulary_size = len(self.vocabulary)
+        observations: List[Dict[str, Any]] = []
+        actions: List[str] = []
+        targets: List[str] = []
+        app = self._app()
+        first_app = app
+        for _ in range(steps):
+            if rng.random() < config.app_switch_rate:
+                app = self._app()
+            count = min(vocabulary_size, _clipped_lognormal(rng, config.ui_elements_median, config.ui_elements_sigma,
+                                                            config.ui_elements_min, config.ui_elements_max))
+            start = int(rng.random() * (vocabulary_size - count + 1))
+            ui_elements = self.vocabulary[start:start + count]
+            target = ui_elements[int(rng.random() * count)]
+            if rng.random() < config.type_ratio:
+                actions.append(f'TYPE("{target}", "{rng.choice(TEXTS)}")')
+            else:
+                actions.append(f'CLICK("{target}")')
+            observations.append({"app": app, "ui_elements": ui_elements})
+            targets.append(target)
+        return {
+            "goal": f"{rng.choice(VERBS)} {' then '.join(targets[:3])} in {first_app}",
+            "observations": observations,
+            "ground_truth_actions": actions,
+            "task_name": f"task_{rng.randrange(config.task_count)}",
+            "params": {}
+        }
+
+    def episodes(self, count: Optional[int] = None, total_steps: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield `count` episodes, or episodes until exactly `total_steps` steps (the last one is shortened)."""
+        if count is None and total_steps is None:
+            raise ValueError("Give a number of episodes or of steps.")
+        emitted_episodes = emitted_steps = 0
+        while count is None or emitted_episodes < count:
+            if total_steps is not None and emitted_steps >= total_steps:
+                return
+            episode = self.episode()
+            if total_steps is not None and emitted_steps + len(episode["observations"]) > total_steps:
+                keep = total_steps - emitted_steps
+                episode["observations"] = episode["observations"][:keep]
+                episode["ground_truth_actions"] = episode["ground_truth_actions"][:keep]
+            emitted_episodes += 1
+            emitted_steps += len(episode["observations"])
+            yield episode
+
+def synthetic_episodes(count: Optional[int] = None, config: Optional[SyntheticConfig] = None, seed: int = 0,
+                       total_steps: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Stream seeded synthetic episodes; see EpisodeGenerator.episodes."""
+    return EpisodeGenerator(config, seed).episodes(count, total_steps)
+
+def write_jsonl(output: TextIO, episodes: Iterator[Dict[str, Any]]) -> Tuple[int, int]:
+    """Write episodes to a JSONL stream, one per line; returns (episodes, steps) written."""
+    episode_count = step_count = 0
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    for episode in episodes:
+        output.write(encode(episode))
+        output.write("\n")
+        episode_count += 1
+        step_count += len(episode["observations"])
+    return episode_count, step_count
@@ -0,0 +1,118 @@
+"""
+Per-call latency, queue time, token usage and cost telemetry.
+
+The agent opens a `measure()` scope around every provider call. Providers and
+middleware report into whichever scope is current (`record_usage`,
+`record_queue_time`) without having it passed to them, since the scope lives
+in a context variable that follows the call through wrappers, awaits and
+batch worker threads.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# USD per million (prompt, completion) tokens; extend with set_model_price
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4-turbo-preview": (10.0, 30.0),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4o": (5.0, 15.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-3.5-turbo": (0.5, 1.5),
+    "claude-3-opus-20240229": (15.0, 75.0),
+    "claude-3-sonnet-20240229": (3.0, 15.0),
+    "claude-3-haiku-20240307": (0.25, 1.25),
+}
+
+def set_model_price(model: str, prompt_per_million: float, completion_per_million: float):
+    """Register or override the price of a model, in USD per million tokens."""
+    MODEL_PRICES[model] = (prompt_per_million, completion_per_million)
+
+def estimate_cost(model: Optional[str], prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Estimated USD cost of a call, or None if the model has no known price."""
+    prices = MODEL_PRICES.get(model) if model else None
+    if prices is None:
+        return None
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1e6
+
+@dataclass
+class CallTelemetry:
+    """What was measured for one provider call (or one batch of calls)."""
+    latency: Optional[float] = None
+    queue_time: float = 0.0
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cost: Optional[float] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add_usage(self, prompt_tokens: int, completion_tokens: int, cost: Optional[float]):
+        with self._lock:
+            self.prompt_tokens = (self.prompt_tokens or 0) + prompt_tokens
+            self.completion_tokens = (self.completion_tokens or 0) + completion_tokens
+            if cost is not None:
+                self.cost = (self.cost or 0.0) + cost
+
+    def add_queue_time(self, seconds: float):
+        with self._lock:
+            self.queue_time += seconds
+
+    def fields(self) -> Dict[str, Any]:
+        """The measurements as AgentStep keyword arguments."""
+        return {
+            "latency": self.latency,
+            "queue_time": self.queue_time,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost": self.cost
+        }
+
+    def share(self, count: int) -> "CallTelemetry":
+        """One of `count` equal shares of a batch measurement; the latency is the whole batch's."""
+        def split(value):
+            return None if value is None else value / count
+        prompt_tokens, completion_tokens = split(self.prompt_tokens), split(self.completion_tokens)
+        return CallTelemetry(
+            latency=self.latency,
+            queue_time=self.queue_time / count,
+            prompt_tokens=None if prompt_tokens is None else round(prompt_tokens),
+            completion_tokens=None if completion_tokens is None else round(completion_tokens),
+            cost=split(self.cost)
+        )
+
+_current_call: ContextVar[Optional[CallTelemetry]] = ContextVar("current_call", default=None)
+
+@contextmanager
+def measure() -> Iterator[CallTelemetry]:
+    """Time the enclosed provider call and collect the usage reported during it."""
+    call = CallTelemetry()
+    token = _current_call.set(call)
+    start = time.perf_counter()
+    try:
+        yield call
+    finally:
+        call.latency = time.perf_counter() - start
+        _current_call.reset(token)
+
+def estimate_text_tokens(text: str) -> int:
+    """Rough token count of text: ~4 characters per token."""
+    return len(text) // 4
+
+def record_usage(prompt_tokens: Optional[int], completion_tokens: Optional[int], model: Optional[str] = None,
+                 cost: Optional[float] = None):
+    """Report token usage of the current call; the cost is estimated from `model` unless given."""
+    call = _current_call.get()
+    if call is None or prompt_tokens is None:
+        return
+    completion_tokens = completion_tokens or 0
+    if cost is None:
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+    call.add_usage(prompt_tokens, completion_tokens, cost)
+
+def record_queue_time(seconds: float):
+    """Report time the current call spent waiting before it was sent (rate limits, backoff)."""
+    call = _current_call.get()
+    if call is not None and seconds > 0:
+        call.add_queue_time(seconds)
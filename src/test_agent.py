@@ -1,6 +1,7 @@
-from agent import AndroidWorldAgent, OpenAIProvider
-from prompts import render_prompt, DEFAULT_PROMPT_TEMPLATE
-from agent import load_episode_from_json
+# Run from the repository root with: python -m src.test_agent
+from src.agent import AndroidWorldAgent, OpenAIProvider
+from src.prompts import render_prompt, DEFAULT_PROMPT_TEMPLATE
+from src.agent import load_episode_from_json
 
 # Load a sample episode
 episode = load_episode_from_json("episodes/sample_episode.json")
@@ -11,6 +11,20 @@ import time
 from src.agent import OllamaProvider, AndroidWorldAgent, Episode
 from src.prompts import render_prompt, ENHANCED_PROMPT_TEMPLATE, COT_PROMPT_TEMPLATE
 from src.evaluation import EvaluationAnalyzer
+from src.runner import ConcurrentEpisodeRunner
+from src.cache import CachedProvider, ResponseCache, DEFAULT_CACHE_PATH
+from src.sink import ResultSink
+from src.sources import EpisodeFilter, filter_episodes, iter_episodes
+from src.parallel import AgentSpec, ProcessEpisodeRunner
+from src.providers import get_provider_class
+
+# Constructor options of providers for the comprehensive evaluation; any name
+# in the providers registry can be selected, with its default options otherwise
+PROVIDER_OPTIONS = {
+    "ollama": {"model": "gemma3:12b-it-qat"}
+}
+# Providers whose generations can be streamed and stopped at the first complete action
+STREAMING_PROVIDERS = {"ollama", "openai", "anthropic"}
 
 def create_test_episodes():
     """Create multiple test episodes for comprehensive evaluation."""
@@ -522,8 +536,42 @@ def test_self_reflection():
         print(f"Error testing reflection: {e}")
         return None
 
-def run_comprehensive_evaluation():
-    """Run comprehensive evaluation with all features."""
+def run_comprehensive_evaluation(max_workers=4, backend="thread", cache_path=DEFAULT_CACHE_PATH,
+                                 prompt_layout="standard", stream=False, results_log=None, resume=False,
+                                 episode_sources=None, shard=None, task_names=None, apps=None,
+                                 provider="ollama", processes=1, max_retries=3, requests_per_minute=None,
+                                 tokens_per_minute=None, ollama_hosts=None, reflection_workers=2,
+                                 reflection_sample_rate=1.0, reflect_only_incorrect=False, record_trace=None,
+                                 replay_traces=None, replay_latency=False):
+    """Run comprehensive evaluation with all features.
+    
+    Episodes run concurrently on `max_workers` workers using the given
+    runner backend ("thread", "asyncio" or "batch"). Model responses are served from
+    the on-disk cache at `cache_path` when available; pass None to disable it.
+    `prompt_layout="prefix"` uses the prefix-cache-friendly prompt templates and
+    `stream=True` stops each generation as soon as a complete action is parsed.
+    Each finished episode is appended to the JSONL log at `results_log` (by
+    default `data/results.jsonl` in the run directory); with `resume=True`
+    episodes already recorded there are skipped.
+    Episodes are streamed from `episode_sources` (JSON/JSONL/packed files or
+    directories) when given, otherwise the built-in test episodes are used;
+    `shard=(i, N)`, `task_names` and `apps` select a subset of them.
+    `provider` names an entry of the providers registry. With `processes > 1` the episodes
+    are partitioned across worker processes, each running `max_workers`
+    workers and appending to its own log in the directory of `results_log`.
+    Provider calls are retried up to `max_retries` times and held to the
+    optional `requests_per_minute` / `tokens_per_minute` limits (per process);
+    calls that still fail are counted as failed steps. `ollama_hosts` lists
+    Ollama servers to spread requests over (default: the local one).
+    Reflections are generated in the background by `reflection_workers`
+    threads per process, on a `reflection_sample_rate` fraction of the steps
+    (only incorrect ones with `reflect_only_incorrect`), and appended to
+    reflections/reflections.jsonl in the run directory.
+    With `record_trace`, every model call is recorded to that trace file (a
+    per-worker file with `processes > 1`). With `replay_traces`, responses are
+    served from those traces instead of a model, without cache or retries, and
+    at their recorded latency with `replay_latency`.
+    """
     print("\n=== Comprehensive Evaluation ===\n")
     
     # Create results structure
@@ -542,25 +590,121 @@ def run_comprehensive_evaluation():
     
     print(f"📁 Results will be saved to: {results_dir}")
     
-    # Initialize evaluation analyzer
-    analyzer = EvaluationAnalyzer()
+    # Initialize evaluation analyzer; results stream to the results log, so only running metrics are kept
+    analyzer = EvaluationAnalyzer(keep_results=False)
     
     # Test with enhanced prompting
     try:
-        provider = OllamaProvider(model="gemma3:12b-it-qat")
-        agent = AndroidWorldAgent(provider, prompt_template="enhanced", enable_reflection=True)
+        resilience = {"max_retries": max_retries, "requests_per_minute": requests_per_minute,
+                      "tokens_per_minute": tokens_per_minute, "initial_concurrency": max_workers}
+        if replay_traces:
+            # The trace already holds the outcome of every call, retries included
+            provider = "replay"
+            cache_path = None
+            resilience = None
+        get_provider_class(provider)  # fail early on an unknown name
+        provider_options = dict(PROVIDER_OPTIONS.get(provider, {}))
+        if provider in STREAMING_PROVIDERS:
+            provider_options["stream"] = stream
+        if provider == "ollama" and ollama_hosts:
+            provider_options["base_url"] = list(ollama_hosts)
+        if provider == "replay":
+            provider_options.update(path=list(replay_traces or []), reproduce_latency=replay_latency)
+            print(f"⏯️  Replaying model responses from: {', '.join(replay_traces or [])}")
+        reflections_path = f"{results_dir}/reflections/reflections.jsonl"
+        reflection = {"workers": reflection_workers, "sample_rate": reflection_sample_rate,
+                      "only_incorrect": reflect_only_incorrect, "sink_path": reflections_path,
+                      "keep_reflections": False}
+        agent_spec = AgentSpec(provider, provider_options, cache_path=cache_path, prompt_template="enhanced",
+                               enable_reflection=True, prompt_layout=prompt_layout, resilience=resilience,
+                               reflection=reflection, record_path=record_trace)
         
-        episodes = create_test_episodes()
+        episode_filter = EpisodeFilter(shard=shard, task_names=task_names, apps=apps)
+        results_log = results_log or f"{results_dir}/data/results.jsonl"
+        shard_note = f" (shard {shard[0]}/{shard[1]})" if shard else ""
+        cache_stats = None
+        prompt_cache = None
+        resilience_stats = None
         
-        for episode_data in episodes:
-            print(f"Running episode: {episode_data['task_name']}")
-            episode = agent.load_episode(episode_data)
-            result = agent.run_episode(episode)
-            analyzer.add_episode_result(result)
+        if processes > 1:
+            log_dir = os.path.dirname(results_log) or "."
+            runner = ProcessEpisodeRunner(agent_spec, processes=processes, threads_per_process=max_workers,
+                                          backend=backend, log_dir=log_dir, resume=resume, keep_results=False)
+            print(f"Running episodes{shard_note} on {processes} processes with {max_workers} {backend} worker(s) each")
+            data_path = f"{log_dir}/results-worker*of{processes}.jsonl"
+            print(f"📝 Results logs: {data_path}")
+            
+            def report_worker(report):
+                print(f"Finished worker {report.worker}: {len(report.analyzer.accumulator)} episodes "
+                      f"in {report.elapsed:.1f}s")
+            
+            if episode_sources:
+                analyzer = runner.run(sources=episode_sources, episode_filter=episode_filter, on_report=report_worker)
+            else:
+                analyzer = runner.run(episodes=create_test_episodes(), episode_filter=episode_filter,
+                                      on_report=report_worker)
+            cache_stats = runner.cache_stats
+            resilience_stats = runner.resilience_stats
+        else:
+            agent = agent_spec.build()
+            llm_provider = agent.llm_provider
+            if cache_path:
+                print(f"🗄️  Response cache: {cache_path} ({len(llm_provider.cache)} entries)")
+            if hasattr(llm_provider, "check_health"):
+                for host, healthy in llm_provider.check_health().items():
+                    print(f"{'✅' if healthy else '⚠️ '} Ollama endpoint {host}: {'reachable' if healthy else 'unreachable'}")
+            
+            if episode_sources:
+                episodes = iter_episodes(episode_sources, episode_filter)
+            else:
+                episodes = filter_episodes(create_test_episodes(), episode_filter)
+            sink = ResultSink(results_log)
+            runner = ConcurrentEpisodeRunner(agent, max_workers=max_workers, backend=backend,
+                                             sink=sink, resume=resume)
+            print(f"Running episodes{shard_note} with {max_workers} {backend} worker(s)")
+            data_path = results_log
+            print(f"📝 Results log: {results_log}")
             
-            print(f"  Accuracy: {result['step_accuracy']:.2%}")
-            print(f"  Steps: {result['total_steps']}")
-            print(f"  Correct: {result['correct_steps']}")
+            def report_episode(index, result):
+                print(f"Finished episode: {result['episode_id']}")
+                print(f"  Accuracy: {result['step_accuracy']:.2%}")
+                print(f"  Steps: {result['total_steps']}")
+                print(f"  Correct: {result['correct_steps']}")
+            
+            try:
+                runner.run(episodes, on_result=report_episode)
+            finally:
+                sink.close()
+                # Wait for the background reflections still in the queue
+                agent.reflection_pipeline.close()
+                if record_trace:
+                    llm_provider.close()
+            reflection_stats = agent.reflection_pipeline.stats
+            print(f"🤔 Reflections: {reflection_stats.completed} written, {reflection_stats.failed} failed, "
+                  f"{reflection_stats.sampled_out} steps not sampled")
+            analyzer.add_results_from_log(results_log)
+            if not resume:
+                analyzer.evaluation_time = runner.elapsed
+            
+            if cache_path:
+                cache_stats = llm_provider.stats
+            if hasattr(llm_provider, "prompt_cache_summary"):
+                prompt_cache = llm_provider.prompt_cache_summary()
+            resilience_stats = getattr(llm_provider, "resilience_stats", None)
+        
+        if record_trace:
+            trace_note = f" (one file per worker: *-worker*of{processes})" if processes > 1 else ""
+            print(f"🎞️  Model calls recorded to: {record_trace}{trace_note}")
+        if runner.skipped_episodes:
+            print(f"⏭️  Skipped {runner.skipped_episodes} episode(s) already in the results log")
+        if cache_stats:
+            print(f"🗄️  Cache hits: {cache_stats.hits}, misses: {cache_stats.misses} ({cache_stats.hit_rate:.1%} hit rate)")
+        if prompt_cache:
+            print(f"🧠 Prompt tokens evaluated: {prompt_cache['prompt_eval_tokens']}, "
+                  f"KV-cached (est.): {prompt_cache['cached_tokens']} ({prompt_cache['cached_ratio']:.1%})")
+        if resilience_stats and (resilience_stats.retries or resilience_stats.failures):
+            print(f"🔁 Provider retries: {resilience_stats.retries} ({resilience_stats.throttled} throttled), "
+                  f"failed calls: {resilience_stats.failures}, concurrency limit: {resilience_stats.concurrency_limit:.1f}")
         
         # Generate comprehensive report
         print("\n=== Evaluation Report ===")
@@ -572,24 +716,25 @@ def run_comprehensive_evaluation():
         analyzer.generate_report(report_path)
         print(f"📄 Report saved to: {report_path}")
         
-        data_path = f"{results_dir}/data/metrics.json"
-        analyzer.save_results(data_path)
-        print(f"📊 Data saved to: {data_path}")
+        # Every episode result is already in the results log, in the save_results step format
+        print(f"📊 Episode results saved to: {data_path}")
+        
+        # Episodes are streamed from their sources, so counts come from the analyzer
+        metrics = analyzer.calculate_metrics()
         
         # Save summary metrics
-        summary_metrics = analyzer.calculate_metrics().__dict__
+        summary_metrics = metrics.__dict__
         summary_path = f"{results_dir}/data/summary_metrics.json"
         with open(summary_path, 'w') as f:
             import json
             json.dump(summary_metrics, f, indent=2)
         print(f"📈 Summary metrics saved to: {summary_path}")
         
-        # Save reflections if available
-        if hasattr(agent, 'reflection_history') and agent.reflection_history:
-            reflection_path = f"{results_dir}/reflections/reflections.json"
-            with open(reflection_path, 'w') as f:
-                json.dump(agent.reflection_history, f, indent=2, default=str)
-            print(f"🤔 Reflections saved to: {reflection_path}")
+        # Reflections were appended to JSONL files as they finished
+        if processes > 1:
+            print(f"🤔 Reflections saved to: {results_dir}/reflections/reflections-worker*of{processes}.jsonl")
+        else:
+            print(f"🤔 Reflections saved to: {reflections_path}")
         
         # Create visualizations (if matplotlib is available)
         try:
@@ -604,10 +749,18 @@ def run_comprehensive_evaluation():
         with open(log_path, 'w') as f:
             f.write(f"Android World Agent Evaluation Log\n")
             f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"Model: gemma3:12b-it-qat\n")
-            f.write(f"Prompt Template: enhanced\n")
-            f.write(f"Reflection Enabled: True\n")
-            f.write(f"Total Episodes: {len(episodes)}\n")
+            f.write(f"Model: {provider_options.get('model', provider)}\n")
+            f.write(f"Prompt Template: enhanced ({prompt_layout} layout)\n")
+            only_incorrect_note = ", incorrect steps only" if reflect_only_incorrect else ""
+            f.write(f"Reflection: background ({reflection_workers} worker(s), "
+                    f"sample rate {reflection_sample_rate:.0%}{only_incorrect_note})\n")
+            f.write(f"Workers: {max_workers} ({backend}) x {processes} process(es)\n")
+            if prompt_cache:
+                f.write(f"Prompt Tokens Evaluated: {prompt_cache['prompt_eval_tokens']}, "
+                        f"KV-Cached (est.): {prompt_cache['cached_tokens']}\n")
+            if cache_stats:
+                f.write(f"Response Cache: {cache_path} (hits: {cache_stats.hits}, misses: {cache_stats.misses})\n")
+            f.write(f"Total Episodes: {metrics.total_episodes}\n")
             f.write(f"Report: {report_path}\n")
             f.write(f"Data: {data_path}\n")
         
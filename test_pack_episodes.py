@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test that generator output packs into a dataset that reads back unchanged.
+"""
+
+import json
+import os
+import tempfile
+
+from src.datasets import EpisodeStore, pack_episodes
+from src.sources import iter_episodes
+from src.synthetic import synthetic_episodes, write_jsonl
+
+def test_pack_generator_output():
+    """Pack a synthetic JSONL corpus and compare every episode with the source."""
+
+    print("=== Testing Packing of Generator Output ===\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl_path = os.path.join(tmp, "synthetic.jsonl")
+        pack_path = os.path.join(tmp, "synthetic.pack")
+        with open(jsonl_path, "w", encoding="utf-8") as f:
+            episode_count, step_count = write_jsonl(f, synthetic_episodes(50, seed=7))
+
+        count = pack_episodes(iter_episodes(jsonl_path), pack_path)
+        print(f"Packed {count} episodes ({step_count} steps)")
+        assert count == episode_count == 50
+
+        with open(jsonl_path, encoding="utf-8") as f:
+            expected = [json.loads(line) for line in f]
+        with EpisodeStore(pack_path) as store:
+            assert len(store) == len(expected)
+            for index, data in enumerate(expected):
+                episode = store[index]
+                assert episode.goal == data["goal"]
+                assert episode.task_name == data["task_name"]
+                assert episode.ground_truth_actions == data["ground_truth_actions"]
+                assert list(episode.observations) == data["observations"]
+                assert store.metadata(index)["apps"] == list(dict.fromkeys(o["app"] for o in data["observations"]))
+
+        # Packed files are episode sources too, and repack to the same bytes
+        repacked_path = os.path.join(tmp, "repacked.pack")
+        assert pack_episodes(iter_episodes(pack_path), repacked_path) == count
+        with open(pack_path, "rb") as a, open(repacked_path, "rb") as b:
+            assert a.read() == b.read()
+
+    print("✅ Generator output packs and reads back unchanged.")
+
+if __name__ == "__main__":
+    test_pack_generator_output()